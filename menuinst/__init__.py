@@ -3,8 +3,6 @@
 import os
 from logging import basicConfig, getLogger
 
-from .api import _install_adapter as install
-
 try:
     from ._version import __version__
 except ImportError:
@@ -17,6 +15,17 @@ if os.environ.get("MENUINST_DEBUG"):
 __all__ = ["install", "__version__"]
 
 
+def __getattr__(name: str):
+    # menuinst.api (and the platform backend) are only imported when needed: the conda plugin
+    # imports this package for every conda command
+    if name == "install":
+        from .api import _install_adapter as install
+
+        globals()["install"] = install
+        return install
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Compatibility forwarders for menuinst v1.x (Windows only)
 if os.name == "nt":
     from ._vendor.apipkg import initpkg
@@ -24,6 +33,7 @@ if os.name == "nt":
     initpkg(
         __name__,
         exportdefs={
+            "install": "menuinst.api:_install_adapter",
             "win32": {
                 "dirs_src": "menuinst.platforms.win_utils.knownfolders:dirs_src",
             },
@@ -43,5 +53,5 @@ if os.name == "nt":
         # the exportdefs contents! If we want to keep something defined in this module, we MUST
         # make sure it's added in the 'attr' dictionary below.
         # __spec__ is needed for pyinstaller packaging
-        attr={"__version__": __version__, "install": install, "__spec__": __spec__},
+        attr={"__version__": __version__, "__spec__": __spec__},
     )
@@ -0,0 +1,111 @@
+"""
+Transaction actions registered by the conda plugin. Only imported when conda runs a transaction.
+"""
+
+from __future__ import annotations
+
+import json
+from logging import getLogger
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING
+
+from conda.base.context import context
+from conda.core.path_actions import Action
+
+from .api import sync
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+log = getLogger(__name__)
+
+
+def menu_sources(files: Iterable[str]) -> set[str]:
+    """
+    Names of the metadata files in ``Menu/`` among the ``files`` of a package,
+    as listed in its ``conda-meta`` record (paths relative to the prefix, with ``/``).
+    """
+    sources = set()
+    for file in files:
+        path = PurePosixPath(file)
+        if path.parent.as_posix() == "Menu" and path.suffix == ".json":
+            sources.add(path.name)
+    return sources
+
+
+def _linked_files(prefix: Path, prec) -> list[str]:
+    record = prefix / "conda-meta" / f"{prec.name}-{prec.version}-{prec.build}.json"
+    try:
+        return json.loads(record.read_text()).get("files", [])
+    except (OSError, ValueError) as exc:
+        log.debug("Could not read the files of %s: %s", record, exc)
+        return []
+
+
+class SyncShortcutsAction(Action):
+    """
+    Create, update and delete the shortcuts of the packages linked and unlinked by a
+    transaction. Only their ``Menu/*.json`` files are synced, in a single batch
+    (see ``menuinst.api.sync()``); the rest of the prefix is not scanned.
+
+    Shortcuts that are up to date (e.g. already created by conda itself) are skipped.
+    """
+
+    def __init__(
+        self,
+        transaction_context,
+        target_prefix,
+        unlink_precs,
+        link_precs,
+        remove_specs,
+        update_specs,
+        neutered_specs,
+    ):
+        self.transaction_context = transaction_context
+        self.target_prefix = target_prefix
+        self.unlink_precs = unlink_precs
+        self.link_precs = link_precs
+        self.remove_specs = remove_specs
+        self.update_specs = update_specs
+        self.neutered_specs = neutered_specs
+
+    def _included(self, prec) -> bool:
+        return not context.shortcuts_only or prec.name in context.shortcuts_only
+
+    def sources(self) -> list[str]:
+        "Names of the metadata files added, changed or deleted by the transaction"
+        prefix = Path(self.target_prefix)
+        sources = set()
+        for prec in self.unlink_precs or ():
+            if self._included(prec):
+                # unlinked records are read from conda-meta before the transaction
+                sources |= menu_sources(getattr(prec, "files", None) or ())
+        for prec in self.link_precs or ():
+            if self._included(prec):
+                sources |= menu_sources(_linked_files(prefix, prec))
+        return sorted(sources)
+
+    def verify(self):
+        self._verified = True
+
+    def execute(self):
+        if not context.shortcuts:
+            return
+        sources = self.sources()
+        if not sources:
+            return
+        try:
+            sync(
+                target_prefix=str(self.target_prefix),
+                base_prefix=context.root_prefix,
+                sources=sources,
+            )
+        except Exception as exc:
+            # a failed shortcut must not roll back the transaction
+            log.warning("Could not update the shortcuts of %s: %s", self.target_prefix, exc)
+
+    def reverse(self):
+        pass
+
+    def cleanup(self):
+        pass
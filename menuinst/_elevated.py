@@ -0,0 +1,292 @@
+"""
+Run functions in the elevated process started by ``menuinst.utils.elevate_as_needed()``.
+
+The caller writes a request to a JSON file and starts the worker as admin, with the SHA-256
+of the request on the command line::
+
+    python -m menuinst._elevated REQUEST RESPONSE SHA256
+
+The request names the functions to call and their arguments, and the environment
+variables to forward::
+
+    {
+      "version": 2,
+      "env": {"CONDA_PREFIX": "..."},
+      "calls": [{"module": "menuinst.api", "name": "_install_all",
+                 "args": [[{"__path__": ".../Menu/app.json"}]],
+                 "kwargs": {"target_prefix": "...", "_mode": "system"}}]
+    }
+
+The request file can be written by any process of the user while the caller waits for the
+elevation prompt, so the worker rejects a request whose hash does not match the command
+line, and only calls the ``ENTRY_POINTS`` of menuinst. For the same reason, the worker
+creates RESPONSE itself, and fails if something already exists at that path (e.g. a link to
+another file it would write to as admin).
+
+The worker writes one JSON line to RESPONSE per item of a batch (see ``report_items()``)
+and per call, as soon as they finish, so the caller can follow its progress::
+
+    {"index": 0, "item": 3, "result": [...], "error": null, "seconds": 0.05}
+    {"index": 0, "item": null, "result": [...], "error": null, "seconds": 0.25}
+
+Paths and tuples are preserved in arguments and results (see ``encode()``). Files are used
+instead of pipes because UAC does not let the caller connect to the elevated process on
+Windows, and they do not limit the size of the arguments like a command line would.
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from dataclasses import dataclass
+from hashlib import sha256
+from importlib import import_module
+from pathlib import Path, PurePath
+from typing import IO, Any, Callable, Iterable, Iterator, Mapping
+
+PROTOCOL_VERSION = 2
+
+#: The functions the worker accepts to call: those decorated with ``elevate_as_needed()``
+ENTRY_POINTS = frozenset(
+    {
+        ("menuinst.api", "install"),
+        ("menuinst.api", "remove"),
+        ("menuinst.api", "_install_all"),
+        ("menuinst.api", "_remove_all"),
+        ("menuinst.api", "sync"),
+        ("menuinst.api", "_install_adapter_all"),
+        ("menuinst.utils", "_test_elevation"),
+    }
+)
+
+# Set by run() while a call runs: writes the response of an item of a batch
+_item_reporter: ContextVar[Callable[[int, Any, str | None, float], None] | None] = ContextVar(
+    "menuinst_item_reporter", default=None
+)
+
+
+@dataclass(frozen=True)
+class Call:
+    module: str
+    name: str
+    args: tuple = ()
+    kwargs: Mapping[str, Any] | None = None
+
+    def __post_init__(self):
+        if (self.module, self.name) not in ENTRY_POINTS:
+            raise ValueError(f"{self.module}.{self.name} cannot be called in the elevated process")
+
+    @classmethod
+    def of(cls, func: Callable, *args, **kwargs) -> Call:
+        return cls(func.__module__, func.__name__, args, kwargs)
+
+    def function(self) -> Callable:
+        return getattr(import_module(self.module), self.name)
+
+
+@dataclass(frozen=True)
+class Response:
+    index: int
+    #: the position of the item in the batch, or None for the response of the whole call
+    item: int | None = None
+    result: Any = None
+    #: the formatted exception raised by the call, if it failed
+    error: str | None = None
+    seconds: float = 0.0
+
+
+def encode(value: Any) -> Any:
+    "Make ``value`` JSON serializable, tagging paths and tuples so that ``decode()`` restores them"
+    if isinstance(value, PurePath):
+        return {"__path__": str(value)}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot pass {value!r} to or from the elevated process")
+
+
+def decode(obj: dict) -> Any:
+    "``object_hook`` for ``json.load()``"
+    if obj.keys() == {"__path__"}:
+        return Path(obj["__path__"])
+    if obj.keys() == {"__tuple__"}:
+        return tuple(obj["__tuple__"])
+    return obj
+
+
+def write_request(path: os.PathLike, calls: Iterable[Call], env: Mapping[str, str]) -> str:
+    "Write the request to ``path`` and return its SHA-256, to pass to the worker"
+    request = {
+        "version": PROTOCOL_VERSION,
+        "env": dict(env),
+        "calls": [
+            {
+                "module": call.module,
+                "name": call.name,
+                "args": list(call.args),
+                "kwargs": dict(call.kwargs or {}),
+            }
+            for call in calls
+        ],
+    }
+    content = json.dumps(encode(request)).encode()
+    with open(path, "wb") as f:
+        f.write(content)
+    return sha256(content).hexdigest()
+
+
+def read_request(path: os.PathLike, digest: str) -> tuple[list[Call], dict[str, str]]:
+    """
+    Read the request, if its SHA-256 is ``digest``. Raises ``ValueError`` otherwise, or if
+    it calls functions other than the ``ENTRY_POINTS``.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    if not hmac.compare_digest(sha256(content).hexdigest(), digest):
+        raise ValueError(f"{path} was modified after the elevated process was started")
+    request = json.loads(content, object_hook=decode)
+    if request.get("version") != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported request version: {request.get('version')}")
+    calls = [
+        Call(call["module"], call["name"], tuple(call["args"]), call["kwargs"])
+        for call in request["calls"]
+    ]
+    return calls, request["env"]
+
+
+def follow_responses(
+    path: os.PathLike, finished: Callable[[], bool], interval: float = 0.1
+) -> Iterator[Response]:
+    """
+    Yield the responses as the worker writes them, until ``finished()`` returns True
+    and the rest of the file is read. Nothing is yielded if the worker never created it.
+    """
+    while True:
+        last = finished()
+        if os.path.exists(path):
+            break
+        if last:
+            return
+        time.sleep(interval)
+    with open(path) as f:
+        pending = ""
+        while True:
+            last = finished()
+            pending += f.read()
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield Response(**json.loads(line, object_hook=decode))
+            if last:
+                return
+            time.sleep(interval)
+
+
+def read_responses(path: os.PathLike) -> list[Response]:
+    "Responses written so far, in the order the calls and items finished"
+    return list(follow_responses(path, lambda: True))
+
+
+def report_items(function: Callable[[Any], Any]) -> Callable[[int, Any], Any]:
+    """
+    Wrap ``function``, which processes one item of a batch, so that the worker streams the
+    result and duration of each item to the caller. The wrapper also takes the position of
+    the item in the batch; outside of the worker, it only calls ``function``.
+    """
+    report = _item_reporter.get()
+    if report is None:
+        return lambda position, item: function(item)
+
+    def reported(position: int, item: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            result = function(item)
+        except Exception:
+            report(position, None, traceback.format_exc(), time.perf_counter() - start)
+            raise
+        report(position, result, None, time.perf_counter() - start)
+        return result
+
+    return reported
+
+
+def _create_response_file(path: os.PathLike) -> IO[str]:
+    "Create ``path`` for writing, without following or reusing anything already there"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+    return os.fdopen(os.open(path, flags, 0o644), "w")
+
+
+def run(calls: Iterable[Call], response_path: os.PathLike) -> bool:
+    """
+    Make the ``calls`` one after the other, writing their responses to ``response_path``,
+    which must not exist yet. Returns whether all of them succeeded.
+    """
+    success = True
+    lock = threading.Lock()
+    with _create_response_file(response_path) as f:
+
+        def write(response: dict[str, Any]):
+            with lock:
+                f.write(json.dumps(response) + "\n")
+                f.flush()
+
+        for index, call in enumerate(calls):
+
+            def report(item: int, result: Any, error: str | None, seconds: float):
+                try:
+                    result = encode(result)
+                except TypeError:
+                    # e.g. the markers of skipped items; the response of the call has them all
+                    result = None
+                write(
+                    {
+                        "index": index,
+                        "item": item,
+                        "result": result,
+                        "error": error,
+                        "seconds": seconds,
+                    }
+                )
+
+            token = _item_reporter.set(report)
+            start = time.perf_counter()
+            try:
+                result = call.function()(*call.args, **(call.kwargs or {}))
+                response = {"index": index, "item": None, "result": encode(result), "error": None}
+            except Exception:
+                success = False
+                response = {
+                    "index": index,
+                    "item": None,
+                    "result": None,
+                    "error": traceback.format_exc(),
+                }
+            finally:
+                _item_reporter.reset(token)
+            response["seconds"] = time.perf_counter() - start
+            write(response)
+    return success
+
+
+def main(argv: list[str] | None = None) -> int:
+    request_path, response_path, digest = sys.argv[1:] if argv is None else argv
+    calls, env = read_request(request_path, digest)
+    os.environ["_MENUINST_RECURSING"] = "1"
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    return 0 if run(calls, response_path) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
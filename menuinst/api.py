@@ -4,24 +4,39 @@ from __future__ import annotations
 
 import json
 import os
+import re
+import shutil
 import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from contextvars import copy_context
+from copy import deepcopy
+from datetime import datetime, timezone
+from hashlib import sha256
 from logging import getLogger
 from pathlib import Path
-from typing import Callable, Union
+from typing import Any, Callable, Iterable, Union
 
+from ._elevated import report_items
+from .plan import Plan, active_plan, planned, planning
 from .platforms import Menu, MenuItem
+from .platforms.base import SCHEMA_VERSION, platform_key
 from .utils import (
     DEFAULT_BASE_PREFIX,
     DEFAULT_PREFIX,
+    MenuinstToml,
+    _needs_admin,
     _UserOrSystem,
     elevate_as_needed,
-    read_menuinst_toml,
+    env_flag,
     user_is_admin,
-    write_menuinst_toml,
 )
+from .utils import needs_admin as _utils_needs_admin
 
 log = getLogger(__name__)
+# bump when the format of the files in the metadata cache changes
+_METADATA_CACHE_VERSION = "1"
 
 
 __all__ = [
@@ -29,6 +44,8 @@ __all__ = [
     "remove",
     "install_all",
     "remove_all",
+    "sync",
+    "needs_admin",
 ]
 
 
@@ -46,24 +63,35 @@ def record_shortcuts(
     source: str,
     paths: list[os.PathLike],
     distribution_name: str | None = None,
+    fingerprint: str | None = None,
+    mode: _UserOrSystem | None = None,
+    menu: str | None = None,
 ) -> None:
-    """Record created shortcuts to menuinst.toml."""
+    """Record created shortcuts to menuinst.toml.
+
+    Entries previously recorded for ``source`` are replaced. Each shortcut is recorded
+    with its size, and ``source`` with ``fingerprint``, ``mode``, the time of
+    recording (see ``_unchanged_shortcuts()``) and the name of its ``menu``, so
+    ``sync()`` can remove the menu along with the shortcuts after the file is gone.
+    """
     if not paths:
         return
 
-    data = read_menuinst_toml(prefix)
-
-    # Write distribution_name only to base prefix, and only if not already set
-    if prefix.samefile(base_prefix) and distribution_name:
-        data.setdefault("distribution_name", distribution_name)
-
-    # Append shortcuts
-    shortcuts = data.setdefault("shortcuts", [])
-    for path in paths:
-        shortcuts.append({"source": source, "path": str(path)})
-
     try:
-        write_menuinst_toml(prefix, data)
+        with MenuinstToml.edit(prefix) as toml:
+            # Write distribution_name only to base prefix, and only if not already set
+            if prefix.samefile(base_prefix) and distribution_name:
+                toml.data.setdefault("distribution_name", distribution_name)
+                toml.mark_dirty()
+
+            toml.record(
+                source,
+                map(_output_record, paths),
+                hash=fingerprint,
+                mode=mode,
+                timestamp=datetime.now(timezone.utc).replace(microsecond=0),
+                menu=menu,
+            )
     except PermissionError:
         log.debug(
             "Cannot write menuinst.toml to %s (permission denied). "
@@ -73,28 +101,10 @@ def record_shortcuts(
 
 
 def remove_shortcut_records(prefix: Path, source: str) -> None:
-    """Remove shortcut entries matching source from menuinst.toml.
-
-    TODO: Use the recorded paths as the source of truth for shortcut removal,
-    instead of recomputing paths from menu JSON metadata. This would handle
-    cases where shortcuts were moved or the menu JSON changed.
-    """
-    data = read_menuinst_toml(prefix)
-    if not data:
-        return
-
-    shortcuts = data.get("shortcuts", [])
-    if not shortcuts:
-        return
-
-    # Filter out entries matching this source
-    filtered = [s for s in shortcuts if s.get("source") != source]
-    if len(filtered) == len(shortcuts):
-        return  # Nothing was removed
-
-    data["shortcuts"] = filtered
+    """Remove shortcut entries matching source from menuinst.toml."""
     try:
-        write_menuinst_toml(prefix, data)
+        with MenuinstToml.edit(prefix) as toml:
+            toml.forget(source)
     except PermissionError:
         log.debug(
             "Cannot update menuinst.toml at %s (permission denied).",
@@ -102,6 +112,65 @@ def remove_shortcut_records(prefix: Path, source: str) -> None:
         )
 
 
+def _output_record(path: os.PathLike) -> dict[str, Any]:
+    """
+    Path, size and modification time of a created shortcut, to tell whether it was modified
+    since it was recorded. Directories (e.g. macOS apps) only have a path.
+    """
+    record = {"path": str(path)}
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return record
+    if not os.path.isdir(path):
+        record["size"] = stat.st_size
+        record["mtime_ns"] = stat.st_mtime_ns
+    return record
+
+
+def _fingerprint(path: os.PathLike, menu: Menu) -> str:
+    """
+    Hash of everything the shortcuts of a menu JSON file are rendered from: its contents,
+    the placeholders and mode of the menu, the conda executable used for activation, the
+    activation mode (static or not), and the versions of menuinst and its schema.
+    """
+    from . import __version__
+
+    fingerprint = sha256(Path(path).read_bytes())
+    fingerprint.update(
+        json.dumps(
+            [
+                dict(menu.placeholders),
+                menu.mode,
+                str(menu.conda_exe),
+                SCHEMA_VERSION,
+                __version__,
+                env_flag("MENUINST_STATIC_ACTIVATION"),
+            ],
+            sort_keys=True,
+        ).encode()
+    )
+    return fingerprint.hexdigest()
+
+
+def _unchanged_shortcuts(prefix: Path, source: str, fingerprint: str) -> list[Path] | None:
+    """
+    Return the shortcuts recorded for ``source`` if they were created with the same
+    ``fingerprint`` and are all still in place and unmodified (same size and modification
+    time), or None otherwise.
+    """
+    try:
+        record = MenuinstToml.open(prefix).sources.get(source)
+    except ValueError:
+        return None
+    if not record or record.get("hash") != fingerprint or not record.get("shortcuts"):
+        return None
+    shortcuts = record["shortcuts"]
+    if any(_output_record(shortcut["path"]) != shortcut for shortcut in shortcuts):
+        return None
+    return [Path(shortcut["path"]) for shortcut in shortcuts]
+
+
 def _load(
     metadata_or_path: os.PathLike | dict,
     target_prefix: str | None = None,
@@ -111,6 +180,8 @@ def _load(
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
     if isinstance(metadata_or_path, (str, Path)):
+        if env_flag("MENUINST_METADATA_CACHE"):
+            return _load_cached(metadata_or_path, target_prefix, base_prefix, _mode)
         with open(metadata_or_path) as f:
             metadata = json.load(f)
     else:
@@ -120,14 +191,126 @@ def _load(
     return menu, menu_items
 
 
+def _load_cached(
+    path: os.PathLike,
+    target_prefix: str,
+    base_prefix: str,
+    _mode: _UserOrSystem = "user",
+) -> tuple[Menu, list[MenuItem]]:
+    """
+    Like ``_load()``, but reuse the merged and flattened metadata stored in
+    ``$PREFIX/Menu/.cache/`` by a previous call for a file with the same contents,
+    schema version and platform. Opt-in with ``MENUINST_METADATA_CACHE=1``.
+    The entries of a file are deleted when its shortcuts are removed.
+    """
+    path = Path(path)
+    content = path.read_bytes()
+    key = sha256(content)
+    for part in (SCHEMA_VERSION, platform_key(), _METADATA_CACHE_VERSION):
+        key.update(b"\0" + part.encode())
+    cache_dir = Path(target_prefix, "Menu", ".cache")
+    cache_path = cache_dir / f"{path.name}.{key.hexdigest()}.json"
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        metadata = json.loads(content)
+        cached = {
+            "menu_name": metadata["menu_name"],
+            "menu_items": [
+                dict(MenuItem._merge_on_defaults(item)) for item in metadata["menu_items"]
+            ],
+        }
+        _write_metadata_cache(cache_path, cached)
+    menu = Menu(cached["menu_name"], target_prefix, base_prefix, _mode)
+    menu_items = [MenuItem._from_flattened(menu, item) for item in cached["menu_items"]]
+    return menu, menu_items
+
+
+def _write_metadata_cache(cache_path: Path, cached: dict[str, Any]):
+    """
+    Atomically write a metadata cache entry, and remove the stale entries for the same file.
+    The cache is an optimization only: errors are logged and ignored. Nothing is written
+    during a dry run.
+    """
+    if active_plan() is not None:
+        return
+    stale = _metadata_cache_entry_re(cache_path.name.rsplit(".", 2)[0])
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, cache_path)
+        for entry in os.scandir(cache_path.parent):
+            if entry.name != cache_path.name and stale.fullmatch(entry.name):
+                os.unlink(entry.path)
+    except OSError as exc:
+        log.debug("Could not write metadata cache %s: %s", cache_path, exc)
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def _metadata_cache_entry_re(source: str) -> re.Pattern:
+    return re.compile(rf"{re.escape(source)}\.[0-9a-f]{{64}}\.json")
+
+
+def _delete_metadata_cache(target_prefix: os.PathLike, source: str) -> None:
+    """
+    Delete the metadata cache entries of ``source`` (see ``_load_cached()``), and the cache
+    directory if nothing is left in it. Errors are logged and ignored.
+    """
+    cache_dir = Path(target_prefix, "Menu", ".cache")
+    entry_re = _metadata_cache_entry_re(source)
+    try:
+        entries = [entry.path for entry in os.scandir(cache_dir) if entry_re.fullmatch(entry.name)]
+    except OSError:
+        return
+    for path in entries:
+        if planned("delete", path):
+            continue
+        try:
+            os.unlink(path)
+        except OSError as exc:
+            log.debug("Could not delete metadata cache %s: %s", path, exc)
+    if entries and active_plan() is None:
+        with suppress(OSError):
+            cache_dir.rmdir()  # only if empty
+
+
 @elevate_as_needed
 def install(
     metadata_or_path: Union[os.PathLike, dict],
     *,
     target_prefix: str | None = None,
     base_prefix: str | None = None,
+    dry_run: bool = False,
     _mode: _UserOrSystem = "user",
+) -> list[os.PathLike] | Plan:
+    """
+    Create the shortcuts defined in ``metadata_or_path``.
+
+    With ``dry_run=True``, nothing is changed; the ``Plan`` of the changes is returned.
+    """
+    return _maybe_plan(
+        dry_run, _install, metadata_or_path, target_prefix, base_prefix, True, _mode
+    )
+
+
+def _install(
+    metadata_or_path: Union[os.PathLike, dict],
+    target_prefix: str | None,
+    base_prefix: str | None,
+    force: bool,
+    _mode: _UserOrSystem,
 ) -> list[os.PathLike]:
+    """
+    Unless ``force``, a metadata file is skipped if its shortcuts were already created from
+    the same inputs (see ``_fingerprint()``) and are still in place, unmodified; the recorded
+    paths are returned instead. Metadata passed as a dict is always installed.
+    """
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
     menu, menu_items = _load(metadata_or_path, target_prefix, base_prefix, _mode)
@@ -136,127 +319,504 @@ def install(
         warnings.warn(f"Metadata for {menu.name} is not enabled for {sys.platform}")
         return []
 
-    paths = []
-    paths += menu.create()
-    for menu_item in menu_items:
-        paths += menu_item.create()
-
-    # Record shortcuts to menuinst.toml
     if isinstance(metadata_or_path, (str, Path)):
         source = Path(metadata_or_path).name
+        fingerprint = _fingerprint(metadata_or_path, menu)
     else:
         source = f"{menu.name}.json"
+        fingerprint = None
+    if fingerprint and not force:
+        paths = _unchanged_shortcuts(Path(target_prefix), source, fingerprint)
+        if paths is not None:
+            log.debug("Shortcuts for %s are up to date", source)
+            _refresh_static_activation(menu, menu_items)
+            return paths
+
+    paths = []
+    with Menu.batch():
+        paths += menu.create()
+        for menu_item in menu_items:
+            paths += menu_item.create()
+
+    # Record shortcuts to menuinst.toml
     record_shortcuts(
         Path(target_prefix),
         Path(base_prefix),
         source,
         paths,
         distribution_name=menu.placeholders.get("DISTRIBUTION_NAME"),
+        fingerprint=fingerprint,
+        mode=_mode,
+        menu=menu.name,
     )
 
     return paths
 
 
+def _refresh_static_activation(menu: Menu, menu_items: list[MenuItem]) -> None:
+    """
+    Launchers only source the static activation script while it is newer than the prefix
+    history, so it is regenerated after conda transactions even if the items are skipped.
+    The activation is computed once per prefix and process (see ``activation_snapshot()``).
+    """
+    if os.name == "nt" or not env_flag("MENUINST_STATIC_ACTIVATION"):
+        return
+    if any(item.metadata.get("activate") for item in menu_items):
+        menu._activation_command()
+
+
 @elevate_as_needed
 def remove(
     metadata_or_path: Union[os.PathLike, dict],
     *,
     target_prefix: str | None = None,
     base_prefix: str | None = None,
+    dry_run: bool = False,
     _mode: _UserOrSystem = "user",
+) -> list[os.PathLike] | Plan:
+    """
+    Remove the shortcuts defined in ``metadata_or_path``.
+
+    With ``dry_run=True``, nothing is changed; the ``Plan`` of the changes is returned.
+    """
+    return _maybe_plan(dry_run, _remove, metadata_or_path, target_prefix, base_prefix, _mode)
+
+
+def _remove(
+    metadata_or_path: Union[os.PathLike, dict],
+    target_prefix: str | None,
+    base_prefix: str | None,
+    _mode: _UserOrSystem,
+    source: str | None = None,
 ) -> list[os.PathLike]:
+    """
+    The shortcuts recorded in menuinst.toml for ``metadata_or_path`` are removed too, even
+    if the metadata no longer defines them (e.g. it changed since they were created).
+    With ``source``, the records and cached metadata of that file name are removed,
+    instead of those of ``metadata_or_path``.
+    """
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
     menu, menu_items = _load(metadata_or_path, target_prefix, base_prefix, _mode)
+    cached = source is not None or isinstance(metadata_or_path, (str, Path))
+    if source is None:
+        if isinstance(metadata_or_path, (str, Path)):
+            source = Path(metadata_or_path).name
+        else:
+            source = f"{menu.name}.json"
     menu_items = [item for item in menu_items if item.enabled_for_platform()]
     if not menu_items:
         warnings.warn(f"Metadata for {menu.name} is not enabled for {sys.platform}")
-        return []
+        paths = _delete_recorded(target_prefix, source, menu)
+        remove_shortcut_records(Path(target_prefix), source)
+        return paths
 
     paths = []
-    for menu_item in menu_items:
-        paths += menu_item.remove()
-    paths += menu.remove()
-
-    if not paths and _maybe_try_user(target_prefix, base_prefix):
-        menu, menu_items = _load(metadata_or_path, target_prefix, base_prefix, "user")
-        menu_items = [item for item in menu_items if item.enabled_for_platform()]
+    with Menu.batch():
         for menu_item in menu_items:
             paths += menu_item.remove()
+        paths += _delete_recorded(target_prefix, source, menu)
         paths += menu.remove()
 
+        if not paths and _maybe_try_user(target_prefix, base_prefix):
+            menu, menu_items = _load(metadata_or_path, target_prefix, base_prefix, "user")
+            menu_items = [item for item in menu_items if item.enabled_for_platform()]
+            for menu_item in menu_items:
+                paths += menu_item.remove()
+            paths += menu.remove()
+
     # Remove shortcut records from menuinst.toml
-    if isinstance(metadata_or_path, (str, Path)):
-        source = Path(metadata_or_path).name
-    else:
-        source = f"{menu.name}.json"
+    if cached:
+        _delete_metadata_cache(target_prefix, source)
     remove_shortcut_records(Path(target_prefix), source)
 
     return paths
 
 
-@elevate_as_needed
 def install_all(
     *,
     target_prefix: str | None = None,
     base_prefix: str | None = None,
     filter: Callable | None = None,
+    max_workers: int | None = 1,
+    force: bool = False,
+    dry_run: bool = False,
     _mode: _UserOrSystem = "user",
-) -> list[tuple[os.PathLike]]:
+) -> list[tuple[os.PathLike]] | Plan:
+    """
+    Create the shortcuts of all metadata files in ``$PREFIX/Menu`` accepted by ``filter``.
+    Unless ``force``, files whose shortcuts were already created from the same inputs and
+    are still in place, unmodified, are skipped.
+    With ``dry_run=True``, nothing is changed; the ``Plan`` of the changes is returned.
+    """
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
-    return _process_all(install, target_prefix, base_prefix, filter, _mode)
+    return _install_all(
+        _menu_jsons(target_prefix, filter),
+        target_prefix=target_prefix,
+        base_prefix=base_prefix,
+        max_workers=max_workers,
+        force=force,
+        dry_run=dry_run,
+        _mode=_mode,
+    )
 
 
-@elevate_as_needed
 def remove_all(
     *,
     target_prefix: str | None = None,
     base_prefix: str | None = None,
     filter: Callable | None = None,
+    max_workers: int | None = 1,
+    dry_run: bool = False,
     _mode: _UserOrSystem = "user",
-) -> list[tuple[os.PathLike]]:
+) -> list[tuple[os.PathLike]] | Plan:
+    """
+    Remove the shortcuts of all metadata files in ``$PREFIX/Menu`` accepted by ``filter``.
+    With ``dry_run=True``, nothing is changed; the ``Plan`` of the changes is returned.
+    """
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
-    return _process_all(remove, target_prefix, base_prefix, filter, _mode)
+    return _remove_all(
+        _menu_jsons(target_prefix, filter),
+        target_prefix=target_prefix,
+        base_prefix=base_prefix,
+        max_workers=max_workers,
+        dry_run=dry_run,
+        _mode=_mode,
+    )
+
+
+def _menu_jsons(target_prefix: str, filter: Callable | None) -> list[Path]:
+    """
+    The metadata files in ``$PREFIX/Menu`` accepted by ``filter``. They are listed before
+    elevating, because ``filter`` cannot be passed to the elevated process.
+    """
+    return sorted(
+        path
+        for path in (Path(target_prefix) / "Menu").glob("*.json")
+        if filter is not None and filter(path)
+    )
+
+
+@elevate_as_needed
+def _install_all(
+    paths: list[Path],
+    *,
+    target_prefix: str | None = None,
+    base_prefix: str | None = None,
+    max_workers: int | None = 1,
+    force: bool = False,
+    dry_run: bool = False,
+    _mode: _UserOrSystem = "user",
+) -> list[tuple[os.PathLike]] | Plan:
+    "``install_all()`` for the metadata files in ``paths``, in one elevated process if needed"
+    return _maybe_plan(
+        dry_run,
+        _process_all,
+        _install,
+        paths,
+        target_prefix,
+        base_prefix,
+        _mode,
+        max_workers,
+        force=force,
+    )
+
+
+@elevate_as_needed
+def _remove_all(
+    paths: list[Path],
+    *,
+    target_prefix: str | None = None,
+    base_prefix: str | None = None,
+    max_workers: int | None = 1,
+    dry_run: bool = False,
+    _mode: _UserOrSystem = "user",
+) -> list[tuple[os.PathLike]] | Plan:
+    "``remove_all()`` for the metadata files in ``paths``, in one elevated process if needed"
+    return _maybe_plan(
+        dry_run, _process_all, _remove, paths, target_prefix, base_prefix, _mode, max_workers
+    )
+
+
+def needs_admin(
+    *,
+    target_prefix: str | None = None,
+    base_prefix: str | None = None,
+    refresh: bool = False,
+) -> bool:
+    """
+    Whether the functions in this module would elevate to change the shortcuts of
+    ``target_prefix``. Nothing is written to the prefixes to find out, and the verdict is
+    cached for the rest of the process; ``refresh=True`` probes their permissions again.
+    """
+    if refresh:
+        _needs_admin.cache_clear()
+    return _utils_needs_admin(target_prefix or DEFAULT_PREFIX, base_prefix or DEFAULT_BASE_PREFIX)
+
+
+def _maybe_plan(dry_run: bool, function: Callable, *args, **kwargs) -> Any:
+    """
+    Call ``function``, or with ``dry_run``, return the ``Plan`` of the changes it would make.
+    """
+    if not dry_run:
+        return function(*args, **kwargs)
+    with planning() as plan:
+        function(*args, **kwargs)
+    return plan
 
 
 def _process_all(
     function: Callable[
         [Union[os.PathLike, dict], str | None, str | None, _UserOrSystem], list[os.PathLike]
     ],
+    jsons: list[Path],
     target_prefix: str | None = None,
     base_prefix: str | None = None,
-    filter: Callable | None = None,
     _mode: _UserOrSystem = "user",
+    max_workers: int | None = 1,
+    **kwargs,
 ) -> list[tuple[os.PathLike]]:
     target_prefix = target_prefix or DEFAULT_PREFIX
     base_prefix = base_prefix or DEFAULT_BASE_PREFIX
-    jsons = (Path(target_prefix) / "Menu").glob("*.json")
-    results = []
-    for path in jsons:
-        if filter is not None and filter(path):
-            try:
-                results.append(
-                    function(
-                        path,
-                        target_prefix=target_prefix,
-                        base_prefix=base_prefix,
-                        _mode=_mode,
-                    )
+    skipped = object()
+
+    def process(path: Path) -> list[os.PathLike]:
+        try:
+            return function(
+                path,
+                target_prefix=target_prefix,
+                base_prefix=base_prefix,
+                _mode=_mode,
+                **kwargs,
+            )
+        except json.JSONDecodeError as exc:
+            log.warning(f"Skipping {path}: malformed JSON ({exc})")
+            return skipped
+
+    results = _process_batch(process, jsons, max_workers=max_workers)
+    return [result for result in results if result is not skipped]
+
+
+def _process_batch(
+    function: Callable[[Any], Any], items: Iterable[Any], max_workers: int | None = 1
+) -> list[Any]:
+    """
+    Call ``function`` on each item within a single ``Menu.batch()`` and
+    ``MenuinstToml.batch()``, so shared files are written once at the end.
+
+    With ``max_workers`` other than 1, items are processed concurrently in a thread pool
+    (``None`` lets ``ThreadPoolExecutor`` pick the size). Results are returned in the same
+    order as ``items`` regardless of completion order. The batches are context-local, so
+    each worker runs in a copy of the caller's context to join them.
+    """
+    items = list(items)
+    # in the elevated worker, the result of each item is streamed to the caller
+    process = report_items(function)
+    with Menu.batch(), MenuinstToml.batch():
+        if max_workers == 1 or len(items) < 2:
+            return [process(position, item) for position, item in enumerate(items)]
+        contexts = [copy_context() for _ in items]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda ctx, position, item: ctx.run(process, position, item),
+                    contexts,
+                    range(len(items)),
+                    items,
                 )
+            )
+
+
+@elevate_as_needed
+def sync(
+    *,
+    target_prefix: str | None = None,
+    base_prefix: str | None = None,
+    sources: Iterable[str] | None = None,
+    force: bool = False,
+    max_workers: int | None = 1,
+    _mode: _UserOrSystem = "user",
+) -> tuple[list[os.PathLike], list[os.PathLike]]:
+    """
+    Bring the shortcuts of ``target_prefix`` in line with the metadata files in
+    ``$PREFIX/Menu``, using the shortcuts recorded in ``menuinst.toml`` as the current state:
+
+    - Files whose shortcuts are up to date are skipped, unless ``force``.
+    - New and changed files are (re)installed. For changed files, the shortcuts created
+      from their previous contents are removed first.
+    - The shortcuts of files that no longer exist are removed. If a file was only
+      renamed (same contents), its records are renamed and nothing else happens.
+
+    Changed files are removed with their new contents and the recorded shortcuts (see
+    ``remove()``). For missing files, the recorded shortcuts are deleted and their menu is
+    removed if it is left empty (e.g. from ``applications.menu`` on Linux); other
+    registrations of the shortcuts, like file associations, cannot be undone without the
+    metadata. Records written by menuinst versions that did not store the menu name only
+    allow deleting the shortcut files.
+
+    With ``sources``, only the metadata files with these names (e.g. those added or deleted
+    by a conda transaction) are considered, and ``$PREFIX/Menu`` is not listed.
+    ``max_workers`` is used to install the files as in ``install_all()``.
+
+    Returns the paths of the shortcuts that exist after syncing and of the deleted ones.
+    """
+    target_prefix = target_prefix or DEFAULT_PREFIX
+    base_prefix = base_prefix or DEFAULT_BASE_PREFIX
+    prefix = Path(target_prefix)
+    if sources is None:
+        jsons = sorted((prefix / "Menu").glob("*.json"))
+    else:
+        sources = set(sources)
+        jsons = sorted(
+            path for path in (prefix / "Menu" / source for source in sources) if path.is_file()
+        )
+    with Menu.batch(), MenuinstToml.batch():
+        toml = MenuinstToml.open(prefix)
+        records = deepcopy(toml.sources)
+        stale = [
+            source
+            for source in records
+            if source not in {p.name for p in jsons} and (sources is None or source in sources)
+        ]
+
+        # first pass: detect renamed and changed files
+        valid, changed = [], []
+        for path in jsons:
+            try:
+                menu, _ = _load(path, target_prefix, base_prefix, _mode)
             except json.JSONDecodeError as exc:
                 log.warning(f"Skipping {path}: malformed JSON ({exc})")
-    return results
+                continue
+            except KeyError:
+                log.warning(f"Skipping {path}: legacy metadata cannot be synced")
+                continue
+            valid.append(path)
+            fingerprint = _fingerprint(path, menu)
+            if path.name in records:
+                if records[path.name].get("hash") != fingerprint:
+                    changed.append(path.name)
+                continue
+            renamed_from = next(
+                (s for s in stale if records[s].get("hash") == fingerprint),
+                None,
+            )
+            if renamed_from is not None:
+                stale.remove(renamed_from)
+                _rename_shortcut_records(toml, renamed_from, path.name)
+
+        # then remove what changed files and missing files had installed...
+        removed = []
+        for source in changed:
+            removed += _remove(prefix / "Menu" / source, target_prefix, base_prefix, _mode)
+        for source in stale:
+            removed += _remove_recorded(target_prefix, base_prefix, source, records[source], _mode)
+
+        # ...and install the rest; files sharing a removed shortcut are reinstalled too
+        results = _process_batch(
+            lambda path: _install(path, target_prefix, base_prefix, force, _mode),
+            valid,
+            max_workers=max_workers,
+        )
+    installed = [path for paths in results for path in paths]
+    present = set(map(Path, installed))
+    return installed, [path for path in map(Path, removed) if path not in present]
+
+
+def _remove_recorded(
+    target_prefix: str,
+    base_prefix: str,
+    source: str,
+    record: dict[str, Any],
+    _mode: _UserOrSystem,
+) -> list[os.PathLike]:
+    """
+    Remove the shortcuts recorded for ``source`` in menuinst.toml once the metadata file is
+    gone, and forget them. The recorded menu is removed too if no shortcuts are left in it.
+    """
+    menu = Menu(record["menu"], target_prefix, base_prefix, _mode) if "menu" in record else None
+    with Menu.batch():
+        deleted = _delete_recorded(target_prefix, source, menu)
+        if menu is not None:
+            deleted += menu.remove()
+    _delete_metadata_cache(target_prefix, source)
+    remove_shortcut_records(Path(target_prefix), source)
+    return deleted
+
+
+def _delete_recorded(target_prefix: str, source: str, menu: Menu | None) -> list[Path]:
+    """
+    Delete the shortcuts recorded for ``source`` and for no other metadata file, except
+    the paths of ``menu`` itself (e.g. a Start Menu folder), which ``Menu.remove()`` only
+    deletes once it is empty.
+    """
+    try:
+        toml = MenuinstToml.open(target_prefix)
+        recorded = toml.shortcuts(source)
+    except (OSError, ValueError) as exc:
+        log.debug("Cannot read the shortcuts recorded for %s: %s", source, exc)
+        return []
+    menu_paths = {str(path) for path in menu._paths()} if menu is not None else set()
+    return _delete_shortcuts(
+        path for path in recorded if path not in menu_paths and toml.owners(path) <= {source}
+    )
+
+
+def _rename_shortcut_records(toml: MenuinstToml, old_source: str, new_source: str) -> None:
+    try:
+        with MenuinstToml.edit(toml.prefix):
+            toml.rename(old_source, new_source)
+    except PermissionError:
+        log.debug("Cannot update menuinst.toml at %s (permission denied).", toml.prefix / "Menu")
+
+
+def _delete_shortcuts(paths: Iterable[str]) -> list[Path]:
+    """
+    Delete shortcut files and macOS app bundles; return the deleted ones. Other directories
+    are only deleted if empty.
+    """
+    deleted = []
+    for path in sorted(map(Path, paths)):
+        if not os.path.lexists(path):
+            continue
+        if planned("delete", path):
+            deleted.append(path)
+            continue
+        try:
+            if path.is_dir() and not path.is_symlink():
+                if path.suffix == ".app":
+                    shutil.rmtree(path)
+                else:
+                    path.rmdir()
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            log.warning("Could not delete %s: %s", path, exc)
+            continue
+        log.debug("Deleted %s", path)
+        deleted.append(path)
+    return deleted
 
 
 _api_remove = remove  # alias to prevent shadowing in the function below
 
 
-def _install_adapter(path: str, remove: bool = False, prefix: str = DEFAULT_PREFIX, **kwargs):
+def _install_adapter(
+    path: str,
+    remove: bool = False,
+    prefix: str = DEFAULT_PREFIX,
+    _mode: _UserOrSystem | None = None,
+    **kwargs,
+):
     """
     This function is only here as a legacy adapter for menuinst v1.x.
     Please use `menuinst.api` functions instead.
+
+    With ``_mode``, the caller already elevated as needed (see ``_install_adapter_all()``):
+    new-style metadata is processed in that mode and the created or removed paths are returned.
     """
     if os.name == "nt":
         path = path.replace("/", "\\")
@@ -266,6 +826,10 @@ def _install_adapter(path: str, remove: bool = False, prefix: str = DEFAULT_PREF
     if "$schema" not in metadata and "$id" not in metadata:  # old style JSON
         from ._legacy import install as _legacy_install
 
+        kwargs.pop("force", None)
+        if kwargs.pop("dry_run", False):
+            log.warning("Cannot plan the changes of legacy metadata %s; skipping", json_path)
+            return
         if os.name == "nt":
             kwargs.setdefault("root_prefix", kwargs.pop("base_prefix", DEFAULT_BASE_PREFIX))
             if kwargs["root_prefix"] is None:
@@ -283,7 +847,44 @@ def _install_adapter(path: str, remove: bool = False, prefix: str = DEFAULT_PREF
         if kwargs["base_prefix"] is None:
             kwargs["base_prefix"] = DEFAULT_BASE_PREFIX
         # Pass path so install/remove records the actual filename in menuinst.toml
+        if _mode is not None:
+            base_prefix = kwargs["base_prefix"]
+            if remove:
+                return _remove(json_path, prefix, base_prefix, _mode)
+            return _install(json_path, prefix, base_prefix, kwargs.get("force", False), _mode)
+        kwargs.pop("force", None)
         if remove:
             _api_remove(json_path, target_prefix=prefix, **kwargs)
         else:
             install(json_path, target_prefix=prefix, **kwargs)
+
+
+@elevate_as_needed
+def _install_adapter_all(
+    paths: list[str],
+    *,
+    remove: bool = False,
+    target_prefix: str | None = None,
+    base_prefix: str | None = None,
+    force: bool = False,
+    max_workers: int | None = 1,
+    dry_run: bool = False,
+    _mode: _UserOrSystem = "user",
+) -> list[list[os.PathLike] | None] | Plan:
+    """
+    Call ``_install_adapter()`` on each of ``paths`` in a single batch, with one elevation
+    decision (and at most one elevated process) for all of them.
+    """
+
+    def process(path: str) -> list[os.PathLike] | None:
+        return _install_adapter(
+            path,
+            remove=remove,
+            prefix=target_prefix,
+            base_prefix=base_prefix,
+            force=force,
+            dry_run=dry_run,
+            _mode=_mode,
+        )
+
+    return _maybe_plan(dry_run, _process_batch, process, paths, max_workers=max_workers)
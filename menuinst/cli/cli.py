@@ -4,11 +4,9 @@ import argparse
 import os
 import re
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 
-from ..api import _install_adapter
-from ..utils import read_menuinst_toml, write_menuinst_toml
-
 _MENU_RE = re.compile(r"(?:[-\._]menu)?\.json$", re.IGNORECASE)
 
 
@@ -30,6 +28,12 @@ def _add_install_group(parser: argparse.ArgumentParser) -> None:
         "if none are given, remove menu items for all packages "
         "in the prefix",
     )
+    install_group.add_argument(
+        "--sync",
+        action="store_true",
+        help="create, update and delete menu items so that they match the metadata JSON files "
+        "in the prefix",
+    )
 
 
 def _add_prefix(parser: argparse.ArgumentParser):
@@ -47,10 +51,60 @@ def _add_root_prefix(parser: argparse.ArgumentParser):
     )
 
 
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, not {value!r}")
+    return number
+
+
+def _add_max_workers(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--max-workers",
+        type=_positive_int,
+        default=1,
+        metavar="N",
+        help="process up to N metadata JSON files concurrently (default: 1)",
+    )
+
+
+def _add_static_activation(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--static-activation",
+        action="store_true",
+        help="activate the environment in the shortcuts with a script generated at install "
+        "time instead of running conda on each launch (Linux and macOS only)",
+    )
+
+
+def _add_force(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="recreate menu items even if they are up to date",
+    )
+
+
+def _add_dry_run(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print the files that would be written, deleted and edited, and the "
+        "commands that would run (not available with --sync)",
+    )
+
+
 def configure_parser(parser: argparse.ArgumentParser) -> None:
     _add_prefix(parser)
     _add_install_group(parser)
     _add_root_prefix(parser)
+    _add_max_workers(parser)
+    _add_static_activation(parser)
+    _add_force(parser)
+    _add_dry_run(parser)
 
 
 def install(
@@ -58,6 +112,11 @@ def install(
     root_prefix: str | None = None,
     install_shortcuts: list[str] | None = None,
     remove_shortcuts: list[str] | None = None,
+    max_workers: int | None = 1,
+    static_activation: bool = False,
+    force: bool = False,
+    sync_shortcuts: bool = False,
+    dry_run: bool = False,
 ):
     packages = None
     if install_shortcuts is not None:
@@ -66,33 +125,80 @@ def install(
     elif remove_shortcuts is not None:
         packages = remove_shortcuts
         remove = True
-    else:
-        raise argparse.ArgumentError(None, "Must select shortcuts to install or remove.")
+    elif not sync_shortcuts:
+        raise argparse.ArgumentError(None, "Must select shortcuts to install, remove or sync.")
+    if sync_shortcuts and dry_run:
+        raise argparse.ArgumentError(None, "--dry-run cannot be used with --sync.")
+
+    # The conda plugin imports this module for every conda command: only import the
+    # machinery when shortcuts are actually processed
+    from ..api import sync
+    from ..plan import planning
+    from ..utils import MenuinstToml
 
     if root_prefix:
         root_prefix = str(Path(root_prefix).expanduser().resolve())
 
+    if static_activation:
+        # read by the platform backends (and forwarded to elevated processes)
+        os.environ["MENUINST_STATIC_ACTIVATION"] = "1"
+
     # Persist distribution_name from env var before processing shortcuts.
     # The env var allows installers to set distribution_name dynamically at
     # install time. We must persist it here because the env var is transient
     # and may not be set when packages with shortcuts are installed later.
-    if distribution_name := os.environ.get("MENUINST_DISTRIBUTION_NAME"):
-        base = Path(root_prefix) if root_prefix else prefix
-        data = read_menuinst_toml(base)
-        if "distribution_name" not in data:
-            data["distribution_name"] = distribution_name
-            write_menuinst_toml(base, data)
-
-    for json_path in (prefix / "Menu").glob("*.json"):
+    with planning() if dry_run else nullcontext() as plan:
+        if distribution_name := os.environ.get("MENUINST_DISTRIBUTION_NAME"):
+            base = Path(root_prefix) if root_prefix else prefix
+            with MenuinstToml.edit(base) as toml:
+                if "distribution_name" not in toml.data:
+                    toml.data["distribution_name"] = distribution_name
+                    toml.mark_dirty()
+
+        if sync_shortcuts:
+            sync(
+                target_prefix=str(prefix),
+                base_prefix=root_prefix,
+                force=force,
+                max_workers=max_workers,
+            )
+            return
+
+        _process_packages(prefix, root_prefix, packages, remove, max_workers, force, dry_run)
+    if dry_run:
+        print(plan if plan else "Nothing to do.")
+
+
+def _process_packages(
+    prefix: Path,
+    root_prefix: str | None,
+    packages: list[str] | None,
+    remove: bool,
+    max_workers: int | None,
+    force: bool,
+    dry_run: bool,
+):
+    from ..api import _install_adapter_all
+
+    json_paths = []
+    for json_path in sorted((prefix / "Menu").glob("*.json")):
         if (
             packages
             and json_path.name not in packages
             and _MENU_RE.sub("", json_path.name) not in packages
         ):
             continue
-        _install_adapter(
-            str(json_path), remove=remove, prefix=str(prefix), root_prefix=root_prefix
-        )
+        json_paths.append(json_path)
+
+    _install_adapter_all(
+        [str(json_path) for json_path in json_paths],
+        remove=remove,
+        target_prefix=str(prefix),
+        base_prefix=root_prefix,
+        force=force,
+        max_workers=max_workers,
+        dry_run=dry_run,
+    )
 
 
 def main(argv: list[str] | None = None):
@@ -105,6 +211,11 @@ def main(argv: list[str] | None = None):
         root_prefix=args.root_prefix,
         install_shortcuts=args.install,
         remove_shortcuts=args.remove,
+        max_workers=args.max_workers,
+        static_activation=args.static_activation,
+        force=args.force,
+        sync_shortcuts=args.sync,
+        dry_run=args.dry_run,
     )
 
 
@@ -4,7 +4,15 @@ import os
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from .cli.cli import _add_install_group, _add_root_prefix, install
+from .cli.cli import (
+    _add_dry_run,
+    _add_force,
+    _add_install_group,
+    _add_max_workers,
+    _add_root_prefix,
+    _add_static_activation,
+    install,
+)
 
 try:
     from conda.base.context import context, locate_prefix_by_name, reset_context
@@ -14,6 +22,11 @@ try:
 except ImportError as e:
     raise ImportError("Plugin requires `conda` to be installed.") from e
 
+try:
+    from conda.plugins.types import CondaPostTransactionAction
+except ImportError:  # conda without transaction action hooks
+    CondaPostTransactionAction = None
+
 if TYPE_CHECKING:
     from argparse import ArgumentParser, Namespace
     from collections.abc import Iterator
@@ -23,6 +36,10 @@ def configure_parser(parser: ArgumentParser):
     _add_install_group(parser)
     add_parser_prefix(parser)
     _add_root_prefix(parser)
+    _add_max_workers(parser)
+    _add_static_activation(parser)
+    _add_force(parser)
+    _add_dry_run(parser)
 
 
 def execute(args: Namespace):
@@ -45,6 +62,11 @@ def execute(args: Namespace):
         install_shortcuts=args.install,
         remove_shortcuts=args.remove,
         root_prefix=root_prefix,
+        max_workers=args.max_workers,
+        static_activation=args.static_activation,
+        force=args.force,
+        sync_shortcuts=args.sync,
+        dry_run=args.dry_run,
     )
 
 
@@ -57,3 +79,13 @@ def conda_subcommands() -> Iterator[CondaSubcommand]:
         summary="A subcommand for installing and removing shortcuts via menuinst.",
         configure_parser=configure_parser,
     )
+
+
+if CondaPostTransactionAction is not None:
+
+    @hookimpl
+    def conda_post_transaction_actions() -> Iterator[CondaPostTransactionAction]:
+        """Sync the shortcuts of the packages linked and unlinked by a transaction."""
+        from ._conda_actions import SyncShortcutsAction
+
+        yield CondaPostTransactionAction(name="menuinst", action=SyncShortcutsAction)
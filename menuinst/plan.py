@@ -0,0 +1,122 @@
+"""
+Dry runs: record the changes menuinst would make to the system instead of making them.
+
+Code with side effects checks ``planned()`` right before each change. While a
+``planning()`` context is active, the change is recorded in the active ``Plan`` and
+skipped; otherwise ``planned()`` returns False and the change goes ahead.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Literal
+
+#: ``write``: create or overwrite a file (or a macOS app bundle)
+#: ``delete``: delete a file or directory
+#: ``edit``: change a shared file in place (XML menus, INI/JSON/TOML configs, the registry)
+#: ``run``: run an external command
+Action = Literal["write", "delete", "edit", "run"]
+
+
+@dataclass(frozen=True)
+class Change:
+    action: Action
+    #: the path of the affected file, or the command line
+    target: str
+    description: str = ""
+
+    def __str__(self) -> str:
+        if self.description:
+            return f"{self.action:<6} {self.target} ({self.description})"
+        return f"{self.action:<6} {self.target}"
+
+
+@dataclass
+class Plan:
+    """
+    Changes in the order they would be made. Repeated changes are only recorded once.
+    """
+
+    changes: list[Change] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._seen = set(self.changes)
+
+    def add(self, action: Action, target: os.PathLike | str, description: str = "") -> Change:
+        change = Change(action, os.fspath(target), description)
+        with self._lock:
+            if change not in self._seen:
+                self._seen.add(change)
+                self.changes.append(change)
+        return change
+
+    def _targets(self, action: Action) -> list[str]:
+        return [change.target for change in self.changes if change.action == action]
+
+    @property
+    def files_to_write(self) -> list[str]:
+        return self._targets("write")
+
+    @property
+    def files_to_delete(self) -> list[str]:
+        return self._targets("delete")
+
+    @property
+    def edits(self) -> list[Change]:
+        return [change for change in self.changes if change.action == "edit"]
+
+    @property
+    def commands(self) -> list[str]:
+        return self._targets("run")
+
+    def __iter__(self) -> Iterator[Change]:
+        return iter(self.changes)
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __str__(self) -> str:
+        return "\n".join(map(str, self.changes))
+
+
+# Plan of the planning() context of the caller, shared with the threads of its batch
+# (see ``menuinst.api._process_batch()``). None means changes are made.
+_active_plan: ContextVar[Plan | None] = ContextVar("menuinst_active_plan", default=None)
+
+
+@contextmanager
+def planning() -> Iterator[Plan]:
+    """
+    Record changes instead of making them in this context. Nested contexts share the
+    outermost plan.
+    """
+    plan = _active_plan.get()
+    if plan is not None:
+        yield plan
+        return
+    plan = Plan()
+    token = _active_plan.set(plan)
+    try:
+        yield plan
+    finally:
+        _active_plan.reset(token)
+
+
+def active_plan() -> Plan | None:
+    return _active_plan.get()
+
+
+def planned(action: Action, target: os.PathLike | str, description: str = "") -> bool:
+    """
+    Record a change if a dry run is active. Return True if the caller must skip it.
+    """
+    plan = _active_plan.get()
+    if plan is None:
+        return False
+    plan.add(action, target, description)
+    return True
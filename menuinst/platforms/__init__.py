@@ -1,8 +1,11 @@
+from __future__ import annotations
+
 import sys
-from typing import Tuple
+from typing import TYPE_CHECKING, Tuple
 
-from .base import Menu as BaseMenu
-from .base import MenuItem as BaseMenuItem
+if TYPE_CHECKING:
+    from .base import Menu as BaseMenu
+    from .base import MenuItem as BaseMenuItem
 
 
 def menu_api_for_platform(platform: str = sys.platform) -> Tuple[BaseMenu, BaseMenuItem]:
@@ -24,4 +27,10 @@ def menu_api_for_platform(platform: str = sys.platform) -> Tuple[BaseMenu, BaseM
     return Menu, MenuItem
 
 
-Menu, MenuItem = menu_api_for_platform()
+def __getattr__(name: str):
+    # Menu and MenuItem import the backend of this platform on first access
+    if name in ("Menu", "MenuItem"):
+        Menu, MenuItem = menu_api_for_platform()
+        globals().update(Menu=Menu, MenuItem=MenuItem)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
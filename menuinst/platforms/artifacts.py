@@ -0,0 +1,208 @@
+"""
+In-memory representation of the files menuinst writes for a menu item.
+
+The platform backends render their files as artifacts first, without touching the
+filesystem, and write them in a separate step. Rendering can then be inspected,
+compared or benchmarked on any platform, e.g. the Windows batch script on Linux.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import plistlib
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ClassVar
+from xml.etree import ElementTree
+
+
+@dataclass(frozen=True)
+class Artifact:
+    path: Path
+    #: set the executable bits after writing
+    executable: ClassVar[bool] = False
+
+    def content(self) -> str | bytes:
+        """
+        Contents of the file. Text is written with the platform line endings.
+        """
+        raise NotImplementedError
+
+    def write(self) -> Path:
+        """
+        Write the file, unless it already has the same contents: files shared by several
+        menus (e.g. the ``.directory`` entry of a Linux menu) then keep the modification
+        time recorded for the others in menuinst.toml.
+        """
+        content = self.content()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._written(content):
+            if isinstance(content, bytes):
+                self.path.write_bytes(content)
+            else:
+                with open(self.path, "w") as f:
+                    f.write(content)
+        if self.executable:
+            os.chmod(self.path, 0o755)
+        return self.path
+
+    def _written(self, content: str | bytes) -> bool:
+        "Whether the file on disk has ``content``"
+        try:
+            if isinstance(content, bytes):
+                return self.path.read_bytes() == content
+            with open(self.path, newline="") as f:
+                return f.read() == content.replace("\n", os.linesep)
+        except (OSError, ValueError):
+            return False
+
+
+@dataclass(frozen=True)
+class TextFile(Artifact):
+    text: str
+
+    def content(self) -> str:
+        return self.text
+
+
+@dataclass(frozen=True)
+class ShellScript(TextFile):
+    executable: ClassVar[bool] = True
+
+
+@dataclass(frozen=True)
+class BatchScript(TextFile):
+    """
+    A cmd.exe script. ``text`` already uses CRLF line endings.
+    """
+
+
+@dataclass(frozen=True)
+class CopiedFile(Artifact):
+    "A copy of ``source``, e.g. an icon"
+
+    source: Path
+
+    def content(self) -> bytes:
+        return Path(self.source).read_bytes()
+
+    def write(self) -> Path:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(self.source, self.path)
+        if self.executable:
+            os.chmod(self.path, 0o755)
+        return self.path
+
+
+@dataclass(frozen=True)
+class CopiedExecutable(CopiedFile):
+    executable: ClassVar[bool] = True
+
+
+def _escape_desktop_string(value: str) -> str:
+    """
+    Escape a string value per the freedesktop.org Desktop Entry spec.
+    https://specifications.freedesktop.org/desktop-entry-spec/latest/value-types.html
+    """
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    )
+
+
+@dataclass(frozen=True)
+class DesktopEntry(Artifact):
+    """
+    A ``.desktop`` or ``.directory`` file. Booleans and lists in ``entries`` are
+    formatted and strings are escaped as the Desktop Entry spec requires.
+    """
+
+    entries: dict[str, Any] = field(default_factory=dict)
+
+    def content(self) -> str:
+        lines = ["[Desktop Entry]"]
+        for key, value in self.entries.items():
+            if isinstance(value, bool):
+                value = str(value).lower()
+            elif isinstance(value, (list, tuple)):
+                value = ";".join(value) + ";"
+            elif isinstance(value, str):
+                value = _escape_desktop_string(value)
+            lines.append(f"{key}={value}")
+        return "\n".join(lines) + "\n"
+
+
+@dataclass(frozen=True)
+class PropertyList(Artifact):
+    "A macOS property list, such as ``Info.plist``"
+
+    data: dict[str, Any] = field(default_factory=dict)
+
+    def content(self) -> bytes:
+        return plistlib.dumps(self.data)
+
+
+@dataclass(frozen=True)
+class MimeXml(Artifact):
+    "A shared-mime-info package binding ``mime_type`` to ``glob_pattern``"
+
+    mime_type: str
+    glob_pattern: str
+
+    def content(self) -> bytes:
+        xmlns = "http://www.freedesktop.org/standards/shared-mime-info"
+        mime_info = ElementTree.Element("mime-info", xmlns=xmlns)
+        mime_type_tag = ElementTree.SubElement(mime_info, "mime-type", type=self.mime_type)
+        ElementTree.SubElement(mime_type_tag, "glob", pattern=self.glob_pattern)
+        ElementTree.SubElement(mime_type_tag, "comment").text = (
+            f"Custom MIME type {self.mime_type} for '{self.glob_pattern}' files "
+            "(registered by menuinst)"
+        )
+        return ElementTree.tostring(mime_info, encoding="UTF-8", xml_declaration=True)
+
+
+@dataclass(frozen=True)
+class Shortcut(Artifact):
+    "A Windows ``.lnk`` file"
+
+    target: str
+    arguments: str
+    working_dir: str
+    icon: str
+    app_user_model_id: str
+
+    def content(self) -> str:
+        """
+        The properties of the shortcut as sorted JSON, so that any change shows in
+        comparisons. The ``.lnk`` file itself is binary and only made by ``write()``.
+        """
+        return json.dumps(
+            {
+                "target": self.target,
+                "arguments": self.arguments,
+                "working_dir": self.working_dir,
+                "icon": self.icon,
+                "app_user_model_id": self.app_user_model_id,
+            },
+            sort_keys=True,
+        )
+
+    def write(self) -> Path:
+        from .win_utils.winshortcut import create_shortcut
+
+        # winshortcut is a windows-only C extension! create_shortcut has this API
+        # Notice args must be passed as positional, no keywords allowed!
+        # winshortcut.create_shortcut(path, description, filename, arguments="",
+        #                             workdir=None, iconpath=None, iconindex=0, app_id="")
+        create_shortcut(
+            self.target,
+            self.path.stem,
+            str(self.path),
+            self.arguments,
+            self.working_dir,
+            self.icon,
+            0,
+            self.app_user_model_id,
+        )
+        return self.path
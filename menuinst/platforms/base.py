@@ -4,30 +4,93 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import sys
-from copy import deepcopy
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from logging import getLogger
 from pathlib import Path
-from subprocess import check_output
+from subprocess import CalledProcessError, check_output
 from tempfile import NamedTemporaryFile
-from typing import Any, Iterable, Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Iterator, Mapping
 
+from ..plan import planned
 from ..utils import (
     DEFAULT_BASE_PREFIX,
     DEFAULT_PREFIX,
+    MenuinstToml,
     _UserOrSystem,
-    data_path,
-    deep_update,
+    env_flag,
     logged_run,
-    read_menuinst_toml,
     slugify,
 )
+from .artifacts import Artifact
 
 log = getLogger(__name__)
 SCHEMA_VERSION = "1-1-3"
+_PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+
+
+class Template:
+    """
+    A metadata string compiled into a token list. Literal text sits at even indices
+    and placeholder names at odd indices, so rendering is a single pass over the tokens.
+    Use ``compile_template()`` to get a cached instance.
+    """
+
+    __slots__ = ("source", "tokens", "_warned")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = tuple(_PLACEHOLDER_RE.split(source))
+        self._warned = False
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        "Names of the placeholders used in this template, in order of appearance"
+        return self.tokens[1::2]
+
+    def render(self, *placeholders: Mapping[str, str], strict: bool = True) -> str:
+        """
+        Substitute each placeholder with its value in the first mapping that defines it.
+        Replacement values are inserted verbatim; they are never rendered again.
+
+        Unknown placeholders raise ``ValueError`` if ``strict``. Otherwise they are
+        logged (once per template) and left untouched.
+        """
+        if len(self.tokens) == 1:
+            return self.source
+        parts = list(self.tokens)
+        unknown = []
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            for mapping in placeholders:
+                if name in mapping:
+                    parts[i] = mapping[name]
+                    break
+            else:
+                unknown.append(name)
+                parts[i] = "{{ " + name + " }}"
+        if unknown:
+            if strict:
+                raise ValueError(f"Unknown placeholder(s) {unknown} in {self.source!r}")
+            if not self._warned:
+                self._warned = True
+                log.warning("Unknown placeholder(s) %s in %r left as-is", unknown, self.source)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=4096)
+def compile_template(source: str) -> Template:
+    return Template(source)
 
 
 class Menu:
+    # (prefix, base_prefix, mode) the cached placeholders were computed for, and the placeholders
+    _placeholders_cache: tuple[tuple, Mapping[str, str]] | None = None
+
     def __init__(
         self,
         name: str,
@@ -52,15 +115,20 @@ class Menu:
     def remove(self) -> tuple[os.PathLike]:
         raise NotImplementedError
 
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Iterator[None]:
+        """
+        Group several create() / remove() calls (of this and other menus)
+        so that subclasses can defer updates to shared files until exit.
+        """
+        yield
+
     def render(self, value: Any, slug: bool = False, extra: dict | None = None) -> Any:
-        if not hasattr(value, "replace"):
+        if not isinstance(value, str):
             return value
-        if extra:
-            placeholders = {**self.placeholders, **extra}
-        else:
-            placeholders = self.placeholders
-        for placeholder, replacement in placeholders.items():
-            value = value.replace("{{ " + placeholder + " }}", replacement)
+        # unknown placeholders are not fatal here, to keep accepting existing metadata
+        value = compile_template(value).render(extra or {}, self.placeholders, strict=False)
         if slug:
             value = slugify(value)
         return value
@@ -75,18 +143,31 @@ class Menu:
         if name := os.environ.get("MENUINST_DISTRIBUTION_NAME"):
             return name
 
-        data = read_menuinst_toml(self.base_prefix)
+        data = MenuinstToml.open(self.base_prefix).data
         if name := data.get("distribution_name"):
             return name
 
         return self.base_prefix.name
 
     @property
-    def placeholders(self) -> dict[str, str]:
+    def placeholders(self) -> Mapping[str, str]:
         """
         Additional placeholders added at runtime:
         - MENU_ITEM_LOCATION -> *MenuItem().location
 
+        Computed once and cached until ``prefix``, ``base_prefix`` or ``mode`` change,
+        or ``invalidate_placeholders()`` is called.
+        """
+        key = (self.prefix, self.base_prefix, self.mode)
+        if self._placeholders_cache is None or self._placeholders_cache[0] != key:
+            self._placeholders_cache = (key, MappingProxyType(self._placeholders()))
+        return self._placeholders_cache[1]
+
+    def invalidate_placeholders(self):
+        self._placeholders_cache = None
+
+    def _placeholders(self) -> dict[str, str]:
+        """
         Subclasses may extend this dictionary!
         """
         return {
@@ -121,19 +202,145 @@ class Menu:
             # This is the case with `constructor` calls
             return Path(sys.executable)
 
-        for path in self._conda_exe_path_candidates():
-            if path.is_file():
-                return path
-
-        return Path("conda")
+        return _find_conda_exe(self._conda_exe_path_candidates())
 
     def _is_micromamba(self, exe: Path) -> bool:
+        return self._conda_exe_flavor(exe)[0] == "micromamba"
+
+    def _conda_exe_flavor(self, exe: Path) -> tuple[str, str | None]:
+        """
+        Return whether ``exe`` is ``conda`` or ``micromamba``, and its version if known.
+        Standalone executables (``conda.exe``) need to run ``info``; that result is cached
+        for the process lifetime and recorded in the ``menuinst.toml`` of the target prefix.
+        In dry runs, ``info`` is not run: without a cached result, ``conda`` is assumed.
+        """
         if "micromamba" in exe.name:
-            return True
+            return "micromamba", None
         if exe.name in ("conda.exe", "_conda.exe"):
-            out = check_output([str(exe), "info"], universal_newlines=True)
-            return "micromamba version" in out
-        return False
+            return _standalone_conda_exe_flavor(exe, self.prefix)
+        return "conda", None
+
+    def _activation_command(self) -> str:
+        """
+        Shell code that activates the prefix in the launchers of Unix platforms.
+
+        By default, this runs ``conda shell.bash activate`` every time the shortcut is clicked.
+        With ``MENUINST_STATIC_ACTIVATION=1``, its output is saved to a script at install time
+        and the launchers source it instead, as long as it is newer than the prefix history
+        (``conda-meta/history``).
+        """
+        conda_exe = self.conda_exe
+        if self._is_micromamba(conda_exe):
+            activate = ("shell", "activate")
+        else:
+            activate = ("shell.bash", "activate")
+        command = f'eval "$("{conda_exe}" {" ".join(activate)} "{self.prefix}")"'
+        if not env_flag("MENUINST_STATIC_ACTIVATION"):
+            return command
+        script = self._write_static_activation_script(
+            [str(conda_exe), *activate, str(self.prefix)]
+        )
+        if script is None:
+            return command
+        history = self.prefix / "conda-meta" / "history"
+        return f'if [ "{script}" -nt "{history}" ]; then . "{script}"; else {command}; fi'
+
+    def _write_static_activation_script(self, activator: list[str]) -> Path | None:
+        """
+        Write the output of ``activator`` to ``$PREFIX/Menu/.cache/activate.sh``, computed once per
+        process (see ``activation_snapshot()``). Return None if that fails.
+
+        The activator runs without the variables of any active environment, and with a
+        placeholder ``PATH`` that is replaced by the ``PATH`` of the launcher.
+        """
+        path = self.prefix / "Menu" / ".cache" / "activate.sh"
+        if planned("write", path, "static activation script"):
+            return path
+
+        def compute() -> str:
+            env = {
+                key: value
+                for key, value in os.environ.items()
+                if not key.startswith(_ACTIVE_ENV_VARS)
+            }
+            env["PATH"] = _LAUNCH_PATH
+            output = logged_run(activator, check=True, log=False, env=env).stdout
+            return "\n".join(_unfreeze_path(line) for line in output.splitlines()) + "\n"
+
+        try:
+            script = self.activation_snapshot("bash", compute)
+            history = self.prefix / "conda-meta" / "history"
+            if (
+                path.is_file()
+                and path.read_text() == script
+                and (not history.exists() or path.stat().st_mtime > history.stat().st_mtime)
+            ):
+                return path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+            ) as tmp:
+                tmp.write(script)
+            os.replace(tmp.name, path)
+        except (OSError, CalledProcessError) as exc:
+            log.warning("Could not write static activation script %s: %s", path, exc)
+            return None
+        return path
+
+    def activation_snapshot(self, shell: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the activation data of this prefix for ``shell``, as returned by ``compute()``
+        (e.g. the variables set by ``conda shell.<shell> activate``). It must be JSON serializable.
+
+        ``compute()`` runs once per (conda_exe, prefix, shell) and process, so all items share it.
+        With ``MENUINST_ACTIVATION_CACHE=1``, the result is also stored in ``$PREFIX/Menu/.cache/``
+        and reused by later processes while the conda executable and the prefix history
+        (``conda-meta/history``) are unchanged.
+        """
+        key = (str(self.conda_exe), str(self.prefix), shell)
+        with _activation_snapshots_lock:
+            if key in _activation_snapshots:
+                return _activation_snapshots[key]
+            # only callers of the same key wait for each other
+            key_lock = _activation_snapshot_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in _activation_snapshots:
+                if env_flag("MENUINST_ACTIVATION_CACHE"):
+                    snapshot = self._cached_activation_snapshot(shell, compute)
+                else:
+                    snapshot = compute()
+                with _activation_snapshots_lock:
+                    _activation_snapshots[key] = snapshot
+            return _activation_snapshots[key]
+
+    def _cached_activation_snapshot(self, shell: str, compute: Callable[[], Any]) -> Any:
+        fingerprint = [str(self.conda_exe)]
+        for path in (self.conda_exe, self.prefix / "conda-meta" / "history"):
+            try:
+                stat = path.stat()
+                fingerprint += [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                fingerprint += [None, None]
+        cache_path = self.prefix / "Menu" / ".cache" / f"activation-{shell}.json"
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached["fingerprint"] == fingerprint:
+                return cached["snapshot"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        snapshot = compute()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                "w", dir=cache_path.parent, prefix=f".{cache_path.name}.", delete=False
+            ) as tmp:
+                json.dump({"fingerprint": fingerprint, "snapshot": snapshot}, tmp)
+            os.replace(tmp.name, cache_path)
+        except OSError as exc:
+            log.debug("Could not write activation cache %s: %s", cache_path, exc)
+        return snapshot
 
     def _site_packages(self, prefix: Path | str | None = None) -> Path:
         """
@@ -156,10 +363,30 @@ class Menu:
 
 
 class MenuItem:
+    _placeholders_cache: tuple[tuple, Mapping[str, str]] | None = None
+    # platform whose overrides are merged into the metadata; subclasses set their own,
+    # so that items of any platform can be rendered anywhere
+    _platform: str = sys.platform
+
     def __init__(self, menu: Menu, metadata: Mapping[str, Any]):
         self.menu = menu
-        self._data = self._initialize_on_defaults(metadata)
-        self.metadata = self._flatten_for_platform(self._data)
+        self._data = metadata
+        self.metadata = self._merge_on_defaults(metadata, self._platform)
+        self._resolve_name()
+
+    @classmethod
+    def _from_flattened(cls, menu: Menu, metadata: dict[str, Any]) -> MenuItem:
+        """
+        Build an item from metadata that was already merged and flattened
+        by ``_merge_on_defaults()`` (e.g. loaded from the metadata cache).
+        """
+        item = cls.__new__(cls)
+        item.menu = menu
+        item._data = item.metadata = metadata
+        item._resolve_name()
+        return item
+
+    def _resolve_name(self):
         if isinstance(self.metadata["name"], dict):
             if self.menu.prefix.samefile(self.menu.base_prefix):
                 name = self.metadata["name"].get("target_environment_is_base", "")
@@ -180,8 +407,26 @@ class MenuItem:
     def remove(self) -> Iterable[os.PathLike]:
         raise NotImplementedError
 
+    def artifacts(self) -> list[Artifact]:
+        """
+        The files written by ``create()``, rendered in memory. Nothing is written to disk.
+        """
+        raise NotImplementedError
+
     @property
-    def placeholders(self) -> dict[str, str]:
+    def placeholders(self) -> Mapping[str, str]:
+        """
+        Placeholders specific to this item. Cached like ``Menu.placeholders``.
+        """
+        key = (self.menu.prefix, self.menu.base_prefix, self.menu.mode)
+        if self._placeholders_cache is None or self._placeholders_cache[0] != key:
+            self._placeholders_cache = (key, MappingProxyType(self._placeholders()))
+        return self._placeholders_cache[1]
+
+    def invalidate_placeholders(self):
+        self._placeholders_cache = None
+
+    def _placeholders(self) -> dict[str, str]:
         return {
             "MENU_ITEM_LOCATION": str(self.location),
         }
@@ -199,17 +444,22 @@ class MenuItem:
         return self.render(value, slug=slug, extra=extra)
 
     def render(self, value: Any, slug: bool = False, extra: dict[str, str] | None = None) -> Any:
-        if value in (None, True, False):
-            return value
-        kwargs = {
-            "slug": slug,
-            "extra": extra if extra is not None else self.placeholders,
-        }
+        """
+        Render strings, and the strings nested in lists and dicts, in a single call.
+        Other values are returned unchanged.
+        """
+        if extra is None:
+            extra = self.placeholders
+        return self._render(value, slug, extra)
+
+    def _render(self, value: Any, slug: bool, extra: Mapping[str, str]) -> Any:
         if isinstance(value, str):
-            return self.menu.render(value, **kwargs)
-        if hasattr(value, "items"):
-            return {key: self.menu.render(value, **kwargs) for key, value in value.items()}
-        return [self.menu.render(item, **kwargs) for item in value]
+            return self.menu.render(value, slug=slug, extra=extra)
+        if isinstance(value, Mapping):
+            return {key: self._render(item, slug, extra) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._render(item, slug, extra) for item in value]
+        return value
 
     def _precreate(self):
         """
@@ -219,7 +469,7 @@ class MenuItem:
             raise NotImplementedError
 
         precreate_code = self.render_key("precreate")
-        if not precreate_code:
+        if not precreate_code or planned("run", precreate_code, "precreate"):
             return
         with NamedTemporaryFile(delete=False, mode="w") as tmp:
             tmp.write(precreate_code)
@@ -231,6 +481,11 @@ class MenuItem:
         logged_run(cmd, check=True)
         os.unlink(tmp.name)
 
+    def _create_working_dir(self):
+        working_dir = self.render_key("working_dir")
+        if working_dir:
+            Path(os.path.expandvars(working_dir)).mkdir(parents=True, exist_ok=True)
+
     def _paths(self) -> Iterable[os.PathLike]:
         """
         This method should return the paths created by the item
@@ -239,51 +494,75 @@ class MenuItem:
         raise NotImplementedError
 
     @staticmethod
-    def _initialize_on_defaults(data) -> Mapping[str, Any]:
-        with open(data_path(f"menuinst-{SCHEMA_VERSION}.default.json")) as f:
-            defaults = json.load(f)["menu_items"][0]
-        original = deepcopy(data.copy())
-        data = deep_update(defaults, data)
-        # remove platforms that were not originally in 'data'
-        data["platforms"] = {
-            platform: value
-            for platform, value in data.get("platforms", {}).items()
-            if original.get("platforms", {}).get(platform) not in (None, False)
-        }
-        return data
+    def _merge_on_defaults(data: Mapping[str, Any], platform: str = sys.platform) -> MetadataView:
+        """
+        Merge ``data`` onto the defaults for ``platform``, and its platform-specific keys
+        onto the global ones (overriding them only if not None).
+        """
+        return MetadataView(data, platform_key(platform))
 
-    @staticmethod
-    def _flatten_for_platform(
-        data: Mapping[str, Any], platform: str = sys.platform
-    ) -> Mapping[str, Any]:
-        """
-        Merge platform keys with global keys, overwriting if needed.
-        """
-        flattened = deepcopy(data)
-        all_platforms = flattened.pop("platforms", {})
-        this_platform = all_platforms.pop(platform_key(platform), None)
-        if this_platform:
-            for key, value in this_platform.items():
-                if key not in flattened:
-                    # bring missing keys, since they are platform specific
-                    flattened[key] = value
-                elif value is not None:
-                    # if the key was in global, it was not platform specific
-                    # this is an override and we only do so if is not None
-                    log.debug("Platform value %s=%s overrides global value", key, value)
-                    flattened[key] = value
-        else:  # restore
-            flattened["platforms"] = all_platforms
-
-        # in the merged metadata, platforms becomes a list of str stating which
-        # platforms are enabled for this item
-        flattened["platforms"] = [
-            key for key, value in data["platforms"].items() if value is not None
+    def enabled_for_platform(self, platform: str = sys.platform) -> bool:
+        return platform_key(platform) in self.metadata["platforms"]
+
+
+class MetadataView(Mapping):
+    """
+    Copy-on-write view of the metadata of a menu item, flattened for one platform.
+
+    Lookups are resolved in order: values set on the view, the (non-None) platform
+    override, the global value in the item metadata, the defaults. Nothing is copied and
+    neither the item metadata nor the defaults are ever modified: ``view[key] = value``
+    only stores ``value`` in the view.
+
+    ``view["platforms"]`` is the list of platforms enabled for the item.
+    """
+
+    __slots__ = ("_local", "_data", "_platform", "_defaults", "_enabled")
+
+    def __init__(self, data: Mapping[str, Any], platform: str):
+        all_platforms = data.get("platforms") or {}
+        this_platform = all_platforms.get(platform)
+        if this_platform is False:
+            this_platform = None
+        self._local: dict[str, Any] = {}
+        self._data = data
+        self._platform: Mapping[str, Any] = this_platform or {}
+        self._defaults = _defaults_for_platform(platform if this_platform is not None else None)
+        self._enabled = [
+            name for name, value in all_platforms.items() if value not in (None, False)
         ]
-        return flattened
 
-    def enabled_for_platform(self, platform: str = sys.platform) -> bool:
-        return self._data["platforms"].get(platform_key(platform)) is not None
+    def __getitem__(self, key: str) -> Any:
+        if key in self._local:
+            return self._local[key]
+        if key == "platforms":
+            return self._enabled
+        if key in self._platform:
+            value = self._platform[key]
+            # if the key was in global, it was not platform specific;
+            # this is an override and we only do so if is not None
+            if value is not None or (key not in self._data and key not in menuitem_defaults):
+                return value
+        if key in self._data:
+            return self._data[key]
+        return self._defaults[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._local[key] = value
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for layer in (self._local, ("platforms",), self._platform, self._data, self._defaults):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({dict(self)!r})"
 
 
 def platform_key(platform: str = sys.platform) -> str:
@@ -297,6 +576,133 @@ def platform_key(platform: str = sys.platform) -> str:
     raise ValueError(f"Platform {platform} is not supported")
 
 
-menuitem_defaults = json.loads(
-    (Path(__file__).parents[1] / "data" / f"menuinst-{SCHEMA_VERSION}.default.json").read_text()
-)["menu_items"][0]
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Variables of an active environment, which must not leak into the static activation script
+_ACTIVE_ENV_VARS = ("CONDA_PREFIX", "CONDA_SHLVL", "CONDA_DEFAULT_ENV", "CONDA_PROMPT_MODIFIER")
+# Placeholder for the PATH of the launcher in the output of `conda shell.bash activate`
+_LAUNCH_PATH = "__MENUINST_LAUNCH_PATH__"
+
+
+def _unfreeze_path(line: str) -> str:
+    """
+    Replace the placeholder PATH in a (single or double quoted) shell assignment
+    with a reference to the PATH at launch time.
+    """
+    if _LAUNCH_PATH not in line:
+        return line
+    if "='" in line:
+        return line.replace(_LAUNCH_PATH, "'\"${PATH}\"'")
+    return line.replace(_LAUNCH_PATH, "${PATH}")
+
+
+# Activation snapshots computed in this process, keyed by (conda_exe, prefix, shell)
+_activation_snapshots: dict[tuple[str, str, str], Any] = {}
+# guards both dicts; the per-key locks are held while a snapshot is computed
+_activation_snapshots_lock = threading.Lock()
+_activation_snapshot_locks: dict[tuple[str, str, str], threading.Lock] = {}
+
+
+# Conda executables found in this process, keyed by their candidates (see _find_conda_exe)
+_conda_exes: dict[tuple[Path, ...], Path] = {}
+
+
+def _find_conda_exe(candidates: tuple[Path, ...]) -> Path:
+    """
+    First existing file in ``candidates``. The candidates depend on the base prefix and
+    the environment variables, so they are the cache key. Misses are not cached: the
+    executable may be created later (e.g. by ``constructor``) and found then.
+    """
+    if candidates in _conda_exes:
+        return _conda_exes[candidates]
+    for path in candidates:
+        if path.is_file():
+            _conda_exes[candidates] = path
+            return path
+    return Path("conda")
+
+
+_STANDALONE_VERSION_RE = re.compile(r"^\s*(micromamba|conda) version\s*:\s*(\S+)", re.MULTILINE)
+# (flavor, version) of standalone executables found in this process
+_standalone_flavors: dict[Path, tuple[str, str | None]] = {}
+_standalone_flavors_lock = threading.Lock()
+
+
+def _standalone_conda_exe_flavor(exe: Path, prefix: Path) -> tuple[str, str | None]:
+    with _standalone_flavors_lock:
+        if exe not in _standalone_flavors:
+            flavor = _read_standalone_conda_exe_flavor(exe, prefix)
+            if flavor is None:
+                # dry run: guess without caching, the real run will detect it
+                return "conda", None
+            _standalone_flavors[exe] = flavor
+        return _standalone_flavors[exe]
+
+
+def _read_standalone_conda_exe_flavor(exe: Path, prefix: Path) -> tuple[str, str | None] | None:
+    """
+    Use the record in the menuinst.toml of ``prefix`` if it matches the executable (path,
+    size and mtime); otherwise run ``exe info`` and update the record. ``prefix`` is the
+    target prefix, whose menuinst.toml is written anyway when its shortcuts change; nothing
+    is recorded if it has no ``Menu`` directory. Returns None if ``info`` would run in a
+    dry run.
+    """
+    try:
+        stat = exe.stat()
+        fingerprint = {"path": str(exe), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    except OSError:
+        fingerprint = None
+    try:
+        record = MenuinstToml.open(prefix).data.get("conda_exe") or {}
+    except ValueError as exc:
+        log.debug("Ignoring conda_exe record: %s", exc)
+        record = {}
+    if fingerprint and all(record.get(k) == v for k, v in fingerprint.items()):
+        return record["flavor"], record.get("version")
+
+    if planned("run", f'"{exe}" info', "detect conda flavor"):
+        return None
+    out = check_output([str(exe), "info"], universal_newlines=True)
+    match = _STANDALONE_VERSION_RE.search(out)
+    flavor = "micromamba" if "micromamba version" in out else "conda"
+    version = match.group(2) if match else None
+    if fingerprint and (prefix / "Menu").is_dir():
+        try:
+            with MenuinstToml.edit(prefix) as toml:
+                toml.data["conda_exe"] = {
+                    **fingerprint,
+                    "flavor": flavor,
+                    **({"version": version} if version else {}),
+                }
+                toml.mark_dirty()
+        except (OSError, ValueError) as exc:
+            log.debug("Could not record conda_exe in menuinst.toml: %s", exc)
+    return flavor, version
+
+
+#: Read-only default values for every menu item key, loaded once at import time
+menuitem_defaults: Mapping[str, Any] = _freeze(
+    json.loads(
+        (
+            Path(__file__).parents[1] / "data" / f"menuinst-{SCHEMA_VERSION}.default.json"
+        ).read_text()
+    )["menu_items"][0]
+)
+
+
+@lru_cache(maxsize=None)
+def _defaults_for_platform(platform: str | None) -> Mapping[str, Any]:
+    """
+    The global defaults merged with the defaults specific to ``platform`` (a ``platform_key()``),
+    or just the global defaults if ``platform`` is None. Computed once per process.
+    """
+    defaults = {key: value for key, value in menuitem_defaults.items() if key != "platforms"}
+    if platform is not None:
+        defaults.update(menuitem_defaults["platforms"][platform])
+    return MappingProxyType(defaults)
@@ -5,29 +5,268 @@ from __future__ import annotations
 import os
 import shlex
 import shutil
+import threading
 import time
 from configparser import ConfigParser
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from glob import escape as glob_escape
 from logging import getLogger
 from pathlib import Path
 from subprocess import CalledProcessError
 from tempfile import TemporaryDirectory
-from typing import Iterable
+from typing import Callable, Iterable, Iterator
 from xml.etree import ElementTree
 
-from ..utils import UnixLex, add_xml_child, indent_xml_tree, logged_run, unlink
+from ..plan import active_plan, planned
+from ..utils import (
+    UnixLex,
+    _UserOrSystem,
+    add_xml_child,
+    atomic_write,
+    env_flag,
+    file_lock,
+    indent_xml_tree,
+    logged_run,
+    unlink,
+)
+from .artifacts import DesktopEntry, MimeXml
 from .base import Menu, MenuItem, menuitem_defaults
 
 log = getLogger(__name__)
 
+# State shared by the LinuxMenu / LinuxMenuItem instances of the caller's batch (and the
+# threads it spawns, see ``menuinst.api._process_batch()``). None means no batch is active.
+_active_batch: ContextVar[_Batch | None] = ContextVar("menuinst_linux_batch", default=None)
+# Timestamped backups of the menu config file: applications.menu.2024-01-31_12h00m00.bak
+# (older versions did not add the .bak suffix; those backups are never pruned)
+_BACKUP_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]_[0-9][0-9]h[0-9][0-9]m[0-9][0-9].bak"
+# Serializes read-modify-write cycles of mimeapps.list across threads (file_lock() only
+# serializes processes)
+_mimeapps_lock = threading.Lock()
+
+
+class _Batch:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # keyed by the location of the XML config file
+        self.menu_configs: dict[Path, MenuConfigTransaction] = {}
+        # post-install hooks (database refresh commands) to run once on exit; insertion ordered
+        self.post_install_hooks: dict[tuple[str, ...], None] = {}
+
+    def commit(self):
+        for transaction in self.menu_configs.values():
+            transaction.commit()
+        for command in self.post_install_hooks:
+            _run_post_install_hook(command)
+
+
+def _queue_post_install_hook(*command: str | os.PathLike):
+    """
+    Run a command that refreshes a desktop database (``update-desktop-database``,
+    ``update-mime-database``...). Within a batch, identical commands are only
+    run once, when the batch exits.
+
+    Set ``MENUINST_SKIP_POST_INSTALL_HOOKS=1`` to skip these commands completely,
+    e.g. when building images where the databases are refreshed later anyway.
+    """
+    if env_flag("MENUINST_SKIP_POST_INSTALL_HOOKS"):
+        log.debug("Skipping post-install hook %s", command)
+        return
+    command = tuple(str(arg) for arg in command)
+    batch = _active_batch.get()
+    if batch is not None:
+        with batch.lock:
+            batch.post_install_hooks[command] = None
+    else:
+        _run_post_install_hook(command)
+
+
+def _run_post_install_hook(command: tuple[str, ...]):
+    exe = shutil.which(command[0])
+    if exe and not planned("run", shlex.join([exe, *command[1:]])):
+        logged_run([exe, *command[1:]], check=False)
+
 
-def _escape_desktop_string(value: str) -> str:
+class MenuConfigTransaction:
     """
-    Escape a string value per the freedesktop.org Desktop Entry spec.
-    https://specifications.freedesktop.org/desktop-entry-spec/latest/value-types.html
+    In-memory editor for an XDG menu config file (``applications.menu``).
+
+    The file is parsed at most once; menus are added and removed in memory and
+    the result is written back on ``commit()`` with a single atomic write, after
+    taking a single backup of the previous contents (see ``_backup()``).
+
+    ``commit()`` holds a lock on the file against other processes. If the file changed
+    since it was parsed, it is parsed again and the edits of this transaction are replayed
+    on top, so concurrent installs keep each other's menus.
     """
-    return (
-        value.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
-    )
+
+    def __init__(self, location: Path, system_location: Path, mode: _UserOrSystem = "user"):
+        self.location = Path(location)
+        self.system_location = Path(system_location)
+        self.mode = mode
+        # hold it while reading and editing the tree from several threads
+        self.lock = threading.RLock()
+        self._tree: ElementTree.ElementTree | None = None
+        self._existed = False
+        # stat of the file when it was parsed
+        self._stat: tuple[int, int] | None = None
+        # edits to replay if the file changed on disk before commit
+        self._edits: list[tuple[str, Callable[[], bool]]] = []
+
+    @property
+    def tree(self) -> ElementTree.ElementTree:
+        if self._tree is None:
+            self._stat = self._stat_key()
+            self._tree = self._load()
+        return self._tree
+
+    def _stat_key(self) -> tuple[int, int] | None:
+        try:
+            stat = self.location.stat()
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self) -> ElementTree.ElementTree:
+        # ensure any existing version is a file
+        if self.location.exists() and not self.location.is_file():
+            raise RuntimeError(f"Menu config location {self.location} is not a file!")
+        self._existed = self.location.is_file()
+        if self._existed:
+            try:
+                tree = ElementTree.parse(self.location)
+            except ElementTree.ParseError:
+                log.debug("%s is not a valid menu file; replacing it", self.location)
+            else:
+                if tree.getroot().tag == "Menu":
+                    return tree
+                log.debug("%s is not a valid menu file; replacing it", self.location)
+            # an invalid file is replaced as soon as something is written
+        log.debug("Creating %s", self.location)
+        root = ElementTree.Element("Menu")
+        add_xml_child(root, "Name", "Applications")
+        if self.mode == "user":
+            add_xml_child(root, "MergeFile", str(self.system_location)).set("type", "parent")
+        return ElementTree.ElementTree(root)
+
+    def has_menu(self, name: str) -> bool:
+        return any(e.text == name for e in self.tree.getroot().findall("Menu/Name"))
+
+    def add_menu(self, name: str, directory: str):
+        log.debug("Editing %s to add %s config", self.location, name)
+        self._edit(f"add menu {name}", self._add_menu, name, directory)
+
+    def remove_menu(self, name: str):
+        if self._tree is None and not self.location.exists():
+            return
+        log.debug("Editing %s to remove %s config", self.location, name)
+        self._edit(f"remove menu {name}", self._remove_menu, name)
+
+    def _edit(self, description: str, edit: Callable[..., bool], *args):
+        def apply() -> bool:
+            return edit(*args)
+
+        if apply():
+            self._edits.append((description, apply))
+
+    def _add_menu(self, name: str, directory: str) -> bool:
+        if self.has_menu(name):
+            return False
+        menu_elt = add_xml_child(self.tree.getroot(), "Menu")
+        add_xml_child(menu_elt, "Name", name)
+        add_xml_child(menu_elt, "Directory", directory)
+        inc_elt = add_xml_child(menu_elt, "Include")
+        add_xml_child(inc_elt, "Category", name)
+        return True
+
+    def _remove_menu(self, name: str) -> bool:
+        root = self.tree.getroot()
+        removed = False
+        for elt in root.findall("Menu"):
+            if elt.find("Name").text == name:
+                root.remove(elt)
+                removed = True
+        return removed
+
+    def commit(self):
+        with self.lock:
+            self._commit()
+
+    def _commit(self):
+        if not self._edits:
+            return
+        if planned("edit", self.location, ", ".join(d for d, _ in self._edits)):
+            self._edits = []
+            return
+        with file_lock(self.location):
+            if self._stat_key() != self._stat:
+                log.debug("%s changed since it was read; merging edits", self.location)
+                self._tree = None
+                for _, apply in self._edits:
+                    apply()
+            self._write()
+        self._stat = self._stat_key()
+        self._edits = []
+
+    def _write(self):
+        indent_xml_tree(self.tree.getroot())  # inplace!
+        contents = b"".join(
+            [
+                b'<!DOCTYPE Menu PUBLIC "-//freedesktop//DTD Menu 1.0//EN"\n',
+                b' "http://standards.freedesktop.org/menu-spec/menu-1.0.dtd">\n',
+                ElementTree.tostring(self.tree.getroot()),
+                b"\n",
+            ]
+        )
+        if self._existed and self.location.is_file():
+            previous = self.location.read_bytes()
+            if previous == contents:
+                log.debug("%s is unchanged", self.location)
+                return
+            self._backup(previous)
+        log.debug("Writing %s", self.location)
+        with atomic_write(self.location) as f:
+            f.write(contents)
+        self._existed = True
+
+    def _backup(self, contents: bytes):
+        """
+        Back up the previous contents of the menu file, per ``MENUINST_MENU_BACKUPS``:
+
+        - a number N (default: 10): keep the last N timestamped backups; 0 deletes them all.
+        - ``rolling``: keep a single ``.bak`` backup.
+        - ``all``: keep every timestamped backup.
+
+        Contents identical to the latest backup are not backed up again. Only backups with
+        the ``.bak`` suffix are pruned, not those left by older versions of menuinst.
+        """
+        policy = os.environ.get("MENUINST_MENU_BACKUPS", "").strip().lower() or "10"
+        if policy == "rolling":
+            with atomic_write(f"{self.location}.bak") as f:
+                f.write(contents)
+            return
+        if policy == "all":
+            keep = None
+        else:
+            try:
+                keep = max(int(policy), 0)
+            except ValueError:
+                log.warning("Invalid MENUINST_MENU_BACKUPS=%r; keeping 10 backups", policy)
+                keep = 10
+        backups = sorted(
+            self.location.parent.glob(f"{glob_escape(self.location.name)}.{_BACKUP_GLOB}")
+        )
+        if keep != 0 and (not backups or backups[-1].read_bytes() != contents):
+            cur_time = time.strftime("%Y-%m-%d_%Hh%Mm%S")
+            backup = Path(f"{self.location}.{cur_time}.bak")
+            backup.write_bytes(contents)
+            if backup not in backups:
+                backups.append(backup)
+        if keep is not None:
+            for backup in backups[: len(backups) - keep]:
+                unlink(backup, missing_ok=True)
 
 
 class LinuxMenu(Menu):
@@ -69,28 +308,28 @@ class LinuxMenu(Menu):
     def create(self) -> tuple[os.PathLike]:
         self._ensure_directories_exist()
         path = self._write_directory_entry()
-        if self._is_valid_menu_file() and self._has_this_menu():
-            return (path,)
-        self._ensure_menu_file()
         self._add_this_menu()
         return (path,)
 
     def remove(self) -> tuple[os.PathLike]:
         if not Path(self.desktop_entries_location).exists():
             return tuple()
+        plan = active_plan()
         for fn in os.listdir(self.desktop_entries_location):
+            if plan and str(self.desktop_entries_location / fn) in plan.files_to_delete:
+                continue
             if fn.startswith(f"{self.render(self.name, slug=True)}_"):
                 # found one shortcut, so don't remove the name from menu
                 return tuple()
         self._remove_this_menu()
         if self.directory_entry_location.exists():
-            unlink(self.directory_entry_location, missing_ok=True)
+            if not planned("delete", self.directory_entry_location):
+                unlink(self.directory_entry_location, missing_ok=True)
             return (self.directory_entry_location,)
         return tuple()
 
-    @property
-    def placeholders(self) -> dict[str, str]:
-        placeholders = super().placeholders
+    def _placeholders(self) -> dict[str, str]:
+        placeholders = super()._placeholders()
         placeholders["SP_DIR"] = str(self._site_packages())
         return placeholders
 
@@ -100,6 +339,8 @@ class LinuxMenu(Menu):
             self.data_directory / "desktop-directories",
             self.data_directory / "applications",
         ]
+        if active_plan() is not None:
+            return
         for path in paths:
             log.debug("Ensuring path %s exists", path)
             path.mkdir(parents=True, exist_ok=True)
@@ -108,98 +349,84 @@ class LinuxMenu(Menu):
     # .directory stuff methods
     #
 
+    def _directory_entry(self) -> DesktopEntry:
+        return DesktopEntry(
+            self.directory_entry_location,
+            {"Type": "Directory", "Encoding": "UTF-8", "Name": self.render(self.name)},
+        )
+
     def _write_directory_entry(self) -> Path:
-        lines = [
-            "[Desktop Entry]",
-            "Type=Directory",
-            "Encoding=UTF-8",
-            f"Name={self.render(self.name)}",
-        ]
+        if planned("write", self.directory_entry_location):
+            return self.directory_entry_location
         log.debug("Writing directory entry at %s", self.directory_entry_location)
-        with open(self.directory_entry_location, "w") as f:
-            f.write("\n".join(lines))
-
-        return self.directory_entry_location
+        return self._directory_entry().write()
 
     #
     # XML config stuff methods
     #
 
-    def _remove_this_menu(self):
-        if not Path(self.menu_config_location).exists():
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Iterator[None]:
+        """
+        Share one MenuConfigTransaction per XML config file across all the
+        menus created or removed in this context, and commit them on exit.
+        Post-install hooks are also deferred until then, and run once each.
+        """
+        if _active_batch.get() is not None:
+            # nested batch; the outermost one commits
+            yield
             return
-        log.debug(
-            "Editing %s to remove %s config", self.menu_config_location, self.render(self.name)
-        )
-        tree = ElementTree.parse(self.menu_config_location)
-        root = tree.getroot()
-        for elt in root.findall("Menu"):
-            if elt.find("Name").text == self.render(self.name):
-                root.remove(elt)
-        self._write_menu_file(tree)
-
-    def _has_this_menu(self) -> bool:
-        root = ElementTree.parse(self.menu_config_location).getroot()
-        return any(e.text == self.render(self.name) for e in root.findall("Menu/Name"))
-
-    def _add_this_menu(self):
-        log.debug("Editing %s to add %s config", self.menu_config_location, self.render(self.name))
-        tree = ElementTree.parse(self.menu_config_location)
-        root = tree.getroot()
-        menu_elt = add_xml_child(root, "Menu")
-        add_xml_child(menu_elt, "Name", self.render(self.name))
-        add_xml_child(menu_elt, "Directory", f"{self.render(self.name, slug=True)}.directory")
-        inc_elt = add_xml_child(menu_elt, "Include")
-        add_xml_child(inc_elt, "Category", self.render(self.name))
-        self._write_menu_file(tree)
-
-    def _is_valid_menu_file(self) -> bool:
+        batch = _Batch()
+        token = _active_batch.set(batch)
         try:
-            root = ElementTree.parse(self.menu_config_location).getroot()
-            return root is not None and root.tag == "Menu"
-        except Exception:
-            return False
-
-    def _write_menu_file(self, tree: ElementTree.ElementTree):
-        log.debug("Writing %s", self.menu_config_location)
-        indent_xml_tree(tree.getroot())  # inplace!
-        with open(self.menu_config_location, "wb") as f:
-            f.write(b'<!DOCTYPE Menu PUBLIC "-//freedesktop//DTD Menu 1.0//EN"\n')
-            f.write(b' "http://standards.freedesktop.org/menu-spec/menu-1.0.dtd">\n')
-            tree.write(f)
-            f.write(b"\n")
+            yield
+        finally:
+            _active_batch.reset(token)
+            batch.commit()
 
-    def _ensure_menu_file(self):
-        # ensure any existing version is a file
-        if self.menu_config_location.exists() and not self.menu_config_location.is_file():
-            raise RuntimeError(f"Menu config location {self.menu_config_location} is not a file!")
-            # shutil.rmtree(self.menu_config_location)
-
-        # ensure any existing file is actually a menu file
-        if self.menu_config_location.is_file():
-            # make a backup of the menu file to be edited
-            cur_time = time.strftime("%Y-%m-%d_%Hh%Mm%S")
-            backup_menu_file = f"{self.menu_config_location}.{cur_time}"
-            shutil.copyfile(self.menu_config_location, backup_menu_file)
+    @contextmanager
+    def _menu_config(self) -> Iterator[MenuConfigTransaction]:
+        """
+        Yield the transaction for this menu's XML config file. Outside of a batch,
+        a fresh transaction is committed right away.
+        """
+        batch = _active_batch.get()
+        if batch is not None:
+            with batch.lock:
+                menu_configs = batch.menu_configs
+                if self.menu_config_location not in menu_configs:
+                    menu_configs[self.menu_config_location] = MenuConfigTransaction(
+                        self.menu_config_location, self.system_menu_config_location, self.mode
+                    )
+                transaction = menu_configs[self.menu_config_location]
+            with transaction.lock:
+                yield transaction
+            return
+        transaction = MenuConfigTransaction(
+            self.menu_config_location, self.system_menu_config_location, self.mode
+        )
+        with transaction.lock:
+            yield transaction
+            transaction.commit()
 
-            if not self._is_valid_menu_file():
-                os.remove(self.menu_config_location)
-        else:
-            self._new_menu_file()
+    def _remove_this_menu(self):
+        with self._menu_config() as config:
+            config.remove_menu(self.render(self.name))
 
-    def _new_menu_file(self):
-        log.debug("Creating %s", self.menu_config_location)
-        with open(self.menu_config_location, "w") as f:
-            f.write("<Menu><Name>Applications</Name>")
-            if self.mode == "user":
-                f.write(f'<MergeFile type="parent">{self.system_menu_config_location}</MergeFile>')
-            f.write("</Menu>\n")
+    def _add_this_menu(self):
+        name = self.render(self.name)
+        with self._menu_config() as config:
+            if not config.has_menu(name):
+                config.add_menu(name, f"{self.render(self.name, slug=True)}.directory")
 
     def _paths(self) -> tuple[Path]:
         return (self.directory_entry_location,)
 
 
 class LinuxMenuItem(MenuItem):
+    _platform = "linux"
+
     @property
     def location(self) -> Path:
         menu_prefix = self.render(self.menu.name, slug=True, extra={})
@@ -217,22 +444,18 @@ class LinuxMenuItem(MenuItem):
         return self._paths()
 
     def remove(self) -> Iterable[os.PathLike]:
-        paths = (path for path in self._paths() if Path(path).is_file())
+        paths = [path for path in self._paths() if Path(path).is_file()]
         self._maybe_register_mime_types(register=False)
         if paths:
             for path in paths:
                 log.debug("Removing %s", path)
-                unlink(path)
+                if not planned("delete", path):
+                    unlink(path)
             self._update_desktop_database()
         return paths
 
     def _update_desktop_database(self):
-        exe = shutil.which("update-desktop-database")
-        if exe:
-            logged_run(
-                [exe, str(self.menu.desktop_entries_location)],
-                check=False,
-            )
+        _queue_post_install_hook("update-desktop-database", self.menu.desktop_entries_location)
 
     def _command(self) -> str:
         parts = []
@@ -240,40 +463,33 @@ class LinuxMenuItem(MenuItem):
         if precommand:
             parts.append(precommand)
         if self.metadata["activate"]:
-            conda_exe = self.menu.conda_exe
-            if self.menu._is_micromamba(conda_exe):
-                activate = "shell activate"
-            else:
-                activate = "shell.bash activate"
-            parts.append(f'eval "$("{conda_exe}" {activate} "{self.menu.prefix}")"')
+            parts.append(self.menu._activation_command())
         parts.append(" ".join(UnixLex.quote_args(self.render_key("command"))))
         return "bash -c " + shlex.quote(" && ".join(parts))
 
-    def _write_desktop_file(self):
-        if self.location.exists():
-            log.warning("%s: Overwriting existing file at %s.", self._log_name, self.location)
+    def artifacts(self) -> list[DesktopEntry]:
+        return [self._desktop_entry()]
 
-        lines = [
-            "[Desktop Entry]",
-            "Type=Application",
-            "Encoding=UTF-8",
-            f"Name={_escape_desktop_string(self.render_key('name'))}",
-            f"Exec={_escape_desktop_string(self._command())}",
-            f"Terminal={str(self.render_key('terminal')).lower()}",
-        ]
+    def _desktop_entry(self) -> DesktopEntry:
+        entries = {
+            "Type": "Application",
+            "Encoding": "UTF-8",
+            "Name": self.render_key("name"),
+            "Exec": self._command(),
+            "Terminal": str(self.render_key("terminal")).lower(),
+        }
 
         icon = self.render_key("icon")
         if icon:
-            lines.append("Icon={_escape_desktop_string(self.render_key('icon')}")
+            entries["Icon"] = icon
 
         description = self.render_key("description")
         if description:
-            lines.append(f"Comment={_escape_desktop_string(self.render_key('description'))}")
+            entries["Comment"] = description
 
         working_dir = self.render_key("working_dir")
         if working_dir:
-            Path(os.path.expandvars(working_dir)).mkdir(parents=True, exist_ok=True)
-            lines.append(f"Path={_escape_desktop_string(str(working_dir))}")
+            entries["Path"] = str(working_dir)
 
         for key in menuitem_defaults["platforms"]["linux"]:
             if key in (*menuitem_defaults, "glob_patterns"):
@@ -281,16 +497,17 @@ class LinuxMenuItem(MenuItem):
             value = self.render_key(key)
             if value is None:
                 continue
-            if isinstance(value, bool):
-                value = str(value).lower()
-            elif isinstance(value, (list, tuple)):
-                value = ";".join(value) + ";"
-            value = _escape_desktop_string(value) if isinstance(value, str) else value
-            lines.append(f"{key}={value}")
+            entries[key] = value
 
-        with open(self.location, "w") as f:
-            f.write("\n".join(lines))
-            f.write("\n")
+        return DesktopEntry(self.location, entries)
+
+    def _write_desktop_file(self):
+        if planned("write", self.location):
+            return
+        if self.location.exists():
+            log.warning("%s: Overwriting existing file at %s.", self._log_name, self.location)
+        self._create_working_dir()
+        self._desktop_entry().write()
 
     def _maybe_register_mime_types(self, register: bool = True):
         mime_types = self.render_key("MimeType")
@@ -305,6 +522,15 @@ class LinuxMenuItem(MenuItem):
             if glob_pattern:
                 self._glob_pattern_for_mime_type(mime_type, glob_pattern, install=register)
 
+        mimeapps = self.menu.config_directory / "mimeapps.list"
+        action = "register" if register else "deregister"
+        if not planned("edit", mimeapps, f"{action} {', '.join(mime_types)}"):
+            with _mimeapps_lock, file_lock(mimeapps):
+                self._update_mimeapps(mime_types, register=register)
+
+        _queue_post_install_hook("update-mime-database", "-V", self.menu.data_directory / "mime")
+
+    def _update_mimeapps(self, mime_types: Iterable[str], register: bool = True):
         mimeapps = self.menu.config_directory / "mimeapps.list"
         if register:
             config = ConfigParser(default_section=None)
@@ -325,7 +551,7 @@ class LinuxMenuItem(MenuItem):
                     added[mime_type] = f"{added[mime_type]};{self.location.name}"
                 else:
                     added[mime_type] = self.location.name
-            with open(mimeapps, "w") as f:
+            with atomic_write(mimeapps, "w") as f:
                 config.write(f, space_around_delimiters=False)
         elif mimeapps.is_file():
             # Remove entries
@@ -345,16 +571,9 @@ class LinuxMenuItem(MenuItem):
                         )
                 if not section.keys():
                     config.remove_section(section_name)
-            with open(mimeapps, "w") as f:
+            with atomic_write(mimeapps, "w") as f:
                 config.write(f, space_around_delimiters=False)
 
-        update_mime_database = shutil.which("update-mime-database")
-        if update_mime_database:
-            logged_run(
-                [update_mime_database, "-V", self.menu.data_directory / "mime"],
-                check=False,
-            )
-
     def _xml_path_for_mime_type(self, mime_type: str) -> tuple[Path, bool]:
         basename = mime_type.replace("/", "-")
         xml_files = list(
@@ -381,27 +600,35 @@ class LinuxMenuItem(MenuItem):
         if exists:
             return xml_path
 
-        # Write the XML that binds our current mime type to the glob pattern
-        xmlns = "http://www.freedesktop.org/standards/shared-mime-info"
-        mime_info = ElementTree.Element("mime-info", xmlns=xmlns)
-        mime_type_tag = ElementTree.SubElement(mime_info, "mime-type", type=mime_type)
-        ElementTree.SubElement(mime_type_tag, "glob", pattern=glob_pattern)
-        descr = f"Custom MIME type {mime_type} for '{glob_pattern}' files (registered by menuinst)"
-        ElementTree.SubElement(mime_type_tag, "comment").text = descr
-        tree = ElementTree.ElementTree(mime_info)
+        # The XML that binds our current mime type to the glob pattern
+        mime_xml = MimeXml(xml_path, mime_type, glob_pattern)
 
         subcommand = "install" if install else "uninstall"
+        if active_plan() is not None:
+            xdg_mime = shutil.which("xdg-mime")
+            if xdg_mime:
+                command = [xdg_mime, subcommand, "--mode", self.menu.mode, "--novendor"]
+                planned("run", shlex.join([*command, xml_path.name]), mime_type)
+            else:
+                planned("write", xml_path, mime_type)
+            return
         # Install the XML file and register it as default for our app
         use_fallback = False
         try:
             with TemporaryDirectory() as tmp:
-                with open(os.path.join(tmp, os.path.basename(xml_path)), "wb") as f:
-                    tree.write(f, encoding="UTF-8", xml_declaration=True)
+                tmp_xml = replace(mime_xml, path=Path(tmp, xml_path.name)).write()
 
                 xdg_mime = shutil.which("xdg-mime")
                 if xdg_mime:
                     logged_run(
-                        [xdg_mime, subcommand, "--mode", self.menu.mode, "--novendor", f.name],
+                        [
+                            xdg_mime,
+                            subcommand,
+                            "--mode",
+                            self.menu.mode,
+                            "--novendor",
+                            str(tmp_xml),
+                        ],
                         check=True,
                     )
                 else:
@@ -421,7 +648,7 @@ class LinuxMenuItem(MenuItem):
 
         if use_fallback:
             log.debug("Writing to '%s' as a fallback.", xml_path)
-            tree.write(xml_path, encoding="UTF-8", xml_declaration=True)
+            mime_xml.write()
 
     def _paths(self) -> Iterable[os.PathLike]:
         paths = [self.location]
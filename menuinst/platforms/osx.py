@@ -4,14 +4,23 @@ from __future__ import annotations
 
 import os
 import platform
-import plistlib
+import shlex
 import shutil
 from hashlib import sha1
 from logging import getLogger
 from pathlib import Path
 
 from .. import data as _menuinst_data
+from ..plan import active_plan, planned
 from ..utils import UnixLex, logged_run
+from .artifacts import (
+    Artifact,
+    CopiedExecutable,
+    CopiedFile,
+    PropertyList,
+    ShellScript,
+    TextFile,
+)
 from .base import Menu, MenuItem, menuitem_defaults
 
 log = getLogger(__name__)
@@ -24,9 +33,8 @@ class MacOSMenu(Menu):
     def remove(self) -> tuple[os.PathLike]:
         return self._paths()
 
-    @property
-    def placeholders(self) -> dict[str, str]:
-        placeholders = super().placeholders
+    def _placeholders(self) -> dict[str, str]:
+        placeholders = super()._placeholders()
         placeholders.update(
             {
                 "SP_DIR": str(self._site_packages()),
@@ -41,6 +49,8 @@ class MacOSMenu(Menu):
 
 
 class MacOSMenuItem(MenuItem):
+    _platform = "darwin"
+
     @property
     def location(self) -> Path:
         "Path to the .app directory defining the menu item"
@@ -62,6 +72,9 @@ class MacOSMenuItem(MenuItem):
 
     def _precreate(self):
         super()._precreate()
+        if active_plan() is not None:
+            # the links are part of the planned bundle
+            return
         for src, dest in (self.metadata["link_in_bundle"] or {}).items():
             rendered_dest: Path = (self.location / self.render(dest)).resolve()
             if not rendered_dest.is_relative_to(self.location):
@@ -83,15 +96,16 @@ class MacOSMenuItem(MenuItem):
             )
             raise RuntimeError(message)
         log.debug("Creating %s", self.location)
+        if planned("write", self.location, "application bundle"):
+            self._precreate()
+            self._maybe_register_with_launchservices()
+            self._sign_with_entitlements()
+            return (self.location,)
         self._create_application_tree()
         self._precreate()
-        self._copy_icon()
-        self._write_pkginfo()
-        self._write_plistinfo()
-        self._write_appkit_launcher()
-        self._write_launcher()
-        self._write_script()
-        self._write_event_handler()
+        self._create_working_dir()
+        for artifact in self.artifacts():
+            artifact.write()
         self._maybe_register_with_launchservices()
         self._sign_with_entitlements()
         return (self.location,)
@@ -100,7 +114,8 @@ class MacOSMenuItem(MenuItem):
         log.debug("Removing %s", self.location)
         self._maybe_register_with_launchservices(register=False)
         if self.location.exists():
-            shutil.rmtree(self.location, ignore_errors=True)
+            if not planned("delete", self.location):
+                shutil.rmtree(self.location, ignore_errors=True)
             return (self.location,)
         return tuple()
 
@@ -118,22 +133,36 @@ class MacOSMenuItem(MenuItem):
             path.mkdir(parents=True, exist_ok=False)
         return tuple(paths)
 
-    def _copy_icon(self):
+    def artifacts(self) -> list[Artifact]:
+        bundles = [self.location]
+        if self._needs_appkit_launcher:
+            bundles.append(self._nested_location)
         icon = self.render_key("icon")
-        if icon:
-            shutil.copy(icon, self.location / "Contents" / "Resources")
-            if self._needs_appkit_launcher:
-                shutil.copy(icon, self._nested_location / "Contents" / "Resources")
+        pkginfo = f"APPL{self.render_key('name', slug=True)[:8]}"
 
-    def _write_pkginfo(self):
-        app_bundles = [self.location]
+        artifacts = []
+        for bundle in bundles:
+            if icon:
+                artifacts.append(
+                    CopiedFile(bundle / "Contents" / "Resources" / Path(icon).name, Path(icon))
+                )
+            artifacts.append(TextFile(bundle / "Contents" / "PkgInfo", pkginfo))
+        artifacts += self._info_plists()
         if self._needs_appkit_launcher:
-            app_bundles.append(self._nested_location)
-        for app in app_bundles:
-            with open(app / "Contents" / "PkgInfo", "w") as f:
-                f.write(f"APPL{self.render_key('name', slug=True)[:8]}")
-
-    def _write_plistinfo(self):
+            artifacts.append(
+                CopiedExecutable(
+                    self._default_appkit_launcher_path(), self._find_appkit_launcher()
+                )
+            )
+        artifacts.append(CopiedExecutable(self._default_launcher_path(), self._find_launcher()))
+        artifacts.append(self._script())
+        event_handler = self._event_handler()
+        if event_handler:
+            artifacts.append(event_handler)
+        return artifacts
+
+    def _info_plists(self) -> list[PropertyList]:
+        "Info.plist of the nested bundle (if any) and of the main one, in that order"
         name = self.render_key("name")
         slugname = self.render_key("name", slug=True)
         if len(slugname) > 16:
@@ -155,10 +184,12 @@ class MacOSMenuItem(MenuItem):
         if icon:
             pl["CFBundleIconFile"] = Path(icon).name
 
+        plists = []
         if self._needs_appkit_launcher:
-            # write only the basic plist info into the nested bundle
-            with open(self._nested_location / "Contents" / "Info.plist", "wb") as f:
-                plistlib.dump(pl, f)
+            # only the basic plist info goes into the nested bundle
+            plists.append(
+                PropertyList(self._nested_location / "Contents" / "Info.plist", dict(pl))
+            )
             # the *outer* bundle is background-only and needs a different ID
             pl["LSBackgroundOnly"] = True
             pl["CFBundleIdentifier"] = f"com.{slugname}-appkit-launcher"
@@ -182,10 +213,9 @@ class MacOSMenuItem(MenuItem):
                 pl["CFBundleShortVersionString"] = value
                 pl["CFBundleGetInfoString"] = f"{slugname}-{value}"
             pl[key] = value
-        for key, value in info_plist_extra.items():
-            pl[key] = self.render(value)
-        with open(self.location / "Contents" / "Info.plist", "wb") as f:
-            plistlib.dump(pl, f)
+        pl.update(self.render(info_plist_extra))
+        plists.append(PropertyList(self.location / "Contents" / "Info.plist", pl))
+        return plists
 
     def _command(self) -> str:
         lines = ["#!/bin/sh"]
@@ -203,7 +233,6 @@ class MacOSMenuItem(MenuItem):
 
         working_dir = self.render_key("working_dir")
         if working_dir:
-            Path(os.path.expandvars(working_dir)).mkdir(parents=True, exist_ok=True)
             lines.append(f'cd "{working_dir}"')
 
         precommand = self.render_key("precommand")
@@ -211,51 +240,30 @@ class MacOSMenuItem(MenuItem):
             lines.append(precommand)
 
         if self.metadata["activate"]:
-            conda_exe = self.menu.conda_exe
-            if self.menu._is_micromamba(conda_exe):
-                activate = "shell activate"
-            else:
-                activate = "shell.bash activate"
-            lines.append(f'eval "$("{conda_exe}" {activate} "{self.menu.prefix}")"')
+            lines.append(self.menu._activation_command())
 
         lines.append(" ".join(UnixLex.quote_args(self.render_key("command"))))
 
         return "\n".join(lines)
 
-    def _write_appkit_launcher(self, launcher_path: os.PathLike | None = None) -> os.PathLike:
-        if launcher_path is None:
-            launcher_path = self._default_appkit_launcher_path()
-        shutil.copy(self._find_appkit_launcher(), launcher_path)
-        os.chmod(launcher_path, 0o755)
-        return launcher_path
-
-    def _write_launcher(self, launcher_path: os.PathLike | None = None) -> os.PathLike:
-        if launcher_path is None:
-            launcher_path = self._default_launcher_path()
-        shutil.copy(self._find_launcher(), launcher_path)
-        os.chmod(launcher_path, 0o755)
-        return launcher_path
-
-    def _write_script(self, script_path: os.PathLike | None = None) -> os.PathLike:
+    def _script(self, script_path: os.PathLike | None = None) -> ShellScript:
         if script_path is None:
             script_path = self._default_launcher_path(suffix="-script")
-        with open(script_path, "w") as f:
-            f.write(self._command())
-        os.chmod(script_path, 0o755)
-        return script_path
+        return ShellScript(Path(script_path), self._command())
+
+    def _write_script(self, script_path: os.PathLike | None = None) -> os.PathLike:
+        return self._script(script_path).write()
 
-    def _write_event_handler(self, script_path: os.PathLike | None = None) -> os.PathLike:
+    def _event_handler(self) -> ShellScript | None:
         if not self._needs_appkit_launcher:
-            return
+            return None
         event_handler_logic = self.render_key("event_handler")
         if event_handler_logic is None:
-            return
-        if script_path is None:
-            script_path = self.location / "Contents" / "Resources" / "handle-event"
-        with open(script_path, "w") as f:
-            f.write(f"#!/bin/bash\n{event_handler_logic}\n")
-        os.chmod(script_path, 0o755)
-        return script_path
+            return None
+        return ShellScript(
+            self.location / "Contents" / "Resources" / "handle-event",
+            f"#!/bin/bash\n{event_handler_logic}\n",
+        )
 
     def _paths(self) -> tuple[os.PathLike]:
         return (self.location,)
@@ -303,27 +311,26 @@ class MacOSMenuItem(MenuItem):
         slugname = self.render_key("name", slug=True)
         plist = {key: True for key in entitlement_keys}
         entitlements_path = self.location / "Contents" / "Entitlements.plist"
-        with open(entitlements_path, "wb") as f:
-            plistlib.dump(plist, f)
-        logged_run(
-            [
-                # hardcode to system location to avoid accidental clobber in PATH
-                "/usr/bin/codesign",
-                "--verbose",
-                "--sign",
-                "-",
-                "--prefix",
-                f"com.{slugname}",
-                "--options",
-                "runtime",
-                "--force",
-                "--deep",
-                "--entitlements",
-                entitlements_path,
-                self.location,
-            ],
-            check=True,
-        )
+        command = [
+            # hardcode to system location to avoid accidental clobber in PATH
+            "/usr/bin/codesign",
+            "--verbose",
+            "--sign",
+            "-",
+            "--prefix",
+            f"com.{slugname}",
+            "--options",
+            "runtime",
+            "--force",
+            "--deep",
+            "--entitlements",
+            str(entitlements_path),
+            str(self.location),
+        ]
+        if planned("run", shlex.join(command)):
+            return
+        PropertyList(entitlements_path, plist).write()
+        logged_run(command, check=True)
 
     @property
     def _needs_appkit_launcher(self) -> bool:
@@ -347,4 +354,6 @@ def _lsregister(*args, check=True, **kwargs):
         "/System/Library/Frameworks/CoreServices.framework"
         "/Frameworks/LaunchServices.framework/Support/lsregister"
     )
+    if planned("run", shlex.join([exe, *args])):
+        return None
     return logged_run([exe, *args], check=check, **kwargs)
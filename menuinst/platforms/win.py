@@ -12,24 +12,35 @@ from subprocess import CompletedProcess
 from tempfile import NamedTemporaryFile
 from typing import Any
 
+from ..plan import active_plan, planned
 from ..utils import WinLex, logged_run, unlink
+from .artifacts import Artifact, BatchScript, Shortcut
 from .base import Menu, MenuItem
-from .win_utils.knownfolders import folder_path as windows_folder_path
-from .win_utils.knownfolders import windows_terminal_settings_files
-from .win_utils.registry import (
-    notify_shell_changes,
-    register_file_extension,
-    register_url_protocol,
-    unregister_file_extension,
-    unregister_url_protocol,
-)
 
 log = getLogger(__name__)
 
 
+# The win_utils modules need ctypes.windll and winreg: they are imported on first use, so
+# that Windows items can be rendered on other platforms too
+
+
+def windows_folder_path(preferred_mode: str, check_other_mode: bool, key: str) -> str:
+    from .win_utils.knownfolders import folder_path
+
+    return folder_path(preferred_mode, check_other_mode, key)
+
+
+def windows_terminal_settings_files(mode: str) -> list[Path]:
+    from .win_utils.knownfolders import windows_terminal_settings_files
+
+    return windows_terminal_settings_files(mode)
+
+
 class WindowsMenu(Menu):
     def create(self) -> tuple[Path]:
         log.debug("Creating %s", self.start_menu_location)
+        if active_plan() is not None:
+            return (self.start_menu_location,)
         self.start_menu_location.mkdir(parents=True, exist_ok=True)
         if self.quick_launch_location:
             self.quick_launch_location.mkdir(parents=True, exist_ok=True)
@@ -41,13 +52,19 @@ class WindowsMenu(Menu):
         # Only remove if the Start Menu directory is empty in case applications share a folder.
         menu_location = Path(self.start_menu_location)
         if menu_location.exists():
+            plan = active_plan()
             try:
                 # Check directory contents. If empty, it will raise StopIteration
                 # and only in that case we delete the directory.
-                next(menu_location.iterdir())
+                next(
+                    path
+                    for path in menu_location.iterdir()
+                    if not plan or str(path) not in plan.files_to_delete
+                )
             except StopIteration:
                 log.debug("Removing %s", self.start_menu_location)
-                shutil.rmtree(self.start_menu_location, ignore_errors=True)
+                if not planned("delete", self.start_menu_location):
+                    shutil.rmtree(self.start_menu_location, ignore_errors=True)
                 return (self.start_menu_location,)
         return tuple()
 
@@ -92,9 +109,8 @@ class WindowsMenu(Menu):
             return []
         return windows_terminal_settings_files(self.mode)
 
-    @property
-    def placeholders(self) -> dict[str, str]:
-        placeholders = super().placeholders
+    def _placeholders(self) -> dict[str, str]:
+        placeholders = super()._placeholders()
         placeholders.update(
             {
                 "SCRIPTS_DIR": str(self.prefix / "Scripts"),
@@ -148,6 +164,8 @@ class WindowsMenu(Menu):
 
 
 class WindowsMenuItem(MenuItem):
+    _platform = "win32"
+
     @property
     def location(self) -> Path:
         """
@@ -158,52 +176,28 @@ class WindowsMenuItem(MenuItem):
         return self.menu.start_menu_location / self._shortcut_filename()
 
     def create(self) -> tuple[Path, ...]:
-        from .win_utils.winshortcut import create_shortcut
-
         self._precreate()
         paths = self._paths()
 
-        for path in paths:
-            if not path.suffix == ".lnk":
-                continue
-
-            target_path, *arguments = self._process_command()
-            working_dir = self.render_key("working_dir")
-            if working_dir:
-                Path(os.path.expandvars(working_dir)).mkdir(parents=True, exist_ok=True)
-            # There are two possible interpretations of HOME on Windows:
-            # `%USERPROFILE%` and `%HOMEDRIVE%%HOMEPATH%`.
-            # Follow os.path.expanduser logic here, but keep the variables
-            # so that Windows can resolve them at runtime in case the drives change.
-            elif "USERPROFILE" in os.environ:
-                working_dir = "%USERPROFILE%"
-            else:
-                working_dir = "%HOMEDRIVE%%HOMEPATH%"
-
-            icon = self.render_key("icon") or ""
-
-            # winshortcut is a windows-only C extension! create_shortcut has this API
-            # Notice args must be passed as positional, no keywords allowed!
-            # winshortcut.create_shortcut(path, description, filename, arguments="",
-            #                             workdir=None, iconpath=None, iconindex=0, app_id="")
-            if Path(path).exists():
-                log.warning("%s: Overwriting existing link at %s.", self._log_name, path)
-            create_shortcut(
-                target_path,
-                self._shortcut_filename(ext=""),
-                str(path),
-                " ".join(arguments),
-                working_dir,
-                icon,
-                0,
-                self._app_user_model_id(),
-            )
+        if active_plan() is not None:
+            for path in paths:
+                planned("write", path)
+        else:
+            self._create_working_dir()
+            for artifact in self.artifacts():
+                if isinstance(artifact, Shortcut) and artifact.path.exists():
+                    log.warning(
+                        "%s: Overwriting existing link at %s.", self._log_name, artifact.path
+                    )
+                artifact.write()
 
         for location in self.menu.terminal_profile_locations:
             self._add_remove_windows_terminal_profile(location, remove=False)
         changed_extensions = self._register_file_extensions()
         changed_protocols = self._register_url_protocols()
-        if changed_extensions or changed_protocols:
+        if (changed_extensions or changed_protocols) and active_plan() is None:
+            from .win_utils.registry import notify_shell_changes
+
             notify_shell_changes()
 
         return paths
@@ -211,7 +205,9 @@ class WindowsMenuItem(MenuItem):
     def remove(self) -> tuple[Path, ...]:
         changed_extensions = self._unregister_file_extensions()
         changed_protocols = self._unregister_url_protocols()
-        if changed_extensions or changed_protocols:
+        if (changed_extensions or changed_protocols) and active_plan() is None:
+            from .win_utils.registry import notify_shell_changes
+
             notify_shell_changes()
 
         for location in self.menu.terminal_profile_locations:
@@ -220,7 +216,8 @@ class WindowsMenuItem(MenuItem):
         paths = tuple(path for path in self._paths() if Path(path).is_file())
         for path in paths:
             log.debug("Removing %s", path)
-            unlink(path)
+            if not planned("delete", path):
+                unlink(path)
 
         return paths
 
@@ -251,7 +248,7 @@ class WindowsMenuItem(MenuItem):
 
     def _precreate(self):
         precreate_code = self.render_key("precreate")
-        if not precreate_code:
+        if not precreate_code or planned("run", precreate_code, "precreate"):
             return
         with NamedTemporaryFile(delete=False, mode="w") as tmp:
             tmp.write(precreate_code)
@@ -284,16 +281,8 @@ class WindowsMenuItem(MenuItem):
                 # conda/shell/condabin/_conda_activate.bat. There is no direct activator for this
                 # filetype, so menuinst has to parse the file and add the activator to the
                 # activation script directly.
-                activator_cmd = [
-                    str(self.menu.conda_exe),
-                    "shell.cmd.exe",
-                    "activate",
-                    str(self.menu.prefix),
-                ]
-                activator_run = logged_run(activator_cmd, check=True, log=False)
-                activation_file = Path(activator_run.stdout.strip())
-                filetype = activation_file.suffix
-                if filetype == ".bat":
+                snapshot = self.menu.activation_snapshot("cmd.exe", self._activation_snapshot)
+                if snapshot["filetype"] == ".bat":
                     activator = (
                         f'"{self.menu.conda_exe}" shell.cmd.exe activate "{self.menu.prefix}"'
                     )
@@ -301,19 +290,13 @@ class WindowsMenuItem(MenuItem):
                         f'@FOR /F "usebackq tokens=*" %%i IN (`{activator}`) do set "ACTIVATOR=%%i"',  # noqa
                         "@CALL %ACTIVATOR%",
                     ]
-                elif filetype == ".env":
+                else:
                     activation_lines = []
-                    for line in activation_file.read_text().splitlines():
-                        keyword, value = line.strip().split("=", 1)
+                    for keyword, value in snapshot["variables"]:
                         if keyword == "_CONDA_SCRIPT":
                             activation_lines.append(f'@CALL "{value}"')
                         else:
                             activation_lines.append(f'@SET "{keyword}={value}"')
-                else:
-                    raise NotImplementedError(
-                        f"Menuinst cannot parse activation scripts of type '{filetype}': '{activation_file}'"  # noqa
-                    )
-                activation_file.unlink()
             lines += [
                 "@SETLOCAL ENABLEDELAYEDEXPANSION",
                 *activation_lines,
@@ -324,25 +307,84 @@ class WindowsMenuItem(MenuItem):
 
         return "\r\n".join(lines)
 
-    def _write_script(self, script_path: os.PathLike | None = None) -> Path:
+    def _activation_snapshot(self) -> dict[str, Any]:
         """
-        This method generates the batch script that will be called by the shortcut
+        Run ``conda shell.cmd.exe activate`` once; see ``Menu.activation_snapshot()``.
         """
-        if script_path is None:
-            script_path = self._path_for_script()
+        activator_cmd = [
+            str(self.menu.conda_exe),
+            "shell.cmd.exe",
+            "activate",
+            str(self.menu.prefix),
+        ]
+        activator_run = logged_run(activator_cmd, check=True, log=False)
+        activation_file = Path(activator_run.stdout.strip())
+        filetype = activation_file.suffix
+        if filetype == ".bat":
+            variables = []
+        elif filetype == ".env":
+            variables = []
+            for line in activation_file.read_text().splitlines():
+                keyword, value = line.strip().split("=", 1)
+                variables.append([keyword, value])
         else:
-            script_path = Path(script_path)
+            raise NotImplementedError(
+                f"Menuinst cannot parse activation scripts of type '{filetype}': '{activation_file}'"  # noqa
+            )
+        activation_file.unlink()
+        return {"filetype": filetype, "variables": variables}
+
+    def artifacts(self) -> list[Artifact]:
+        artifacts = []
+        if self.metadata["activate"]:
+            artifacts.append(self._batch_script())
+        artifacts += self._shortcuts()
+        return artifacts
+
+    def _shortcuts(self) -> list[Shortcut]:
+        target_path, *arguments = self._process_command()
+        working_dir = self.render_key("working_dir")
+        if not working_dir:
+            # There are two possible interpretations of HOME on Windows:
+            # `%USERPROFILE%` and `%HOMEDRIVE%%HOMEPATH%`.
+            # Follow os.path.expanduser logic here, but keep the variables
+            # so that Windows can resolve them at runtime in case the drives change.
+            if "USERPROFILE" in os.environ:
+                working_dir = "%USERPROFILE%"
+            else:
+                working_dir = "%HOMEDRIVE%%HOMEPATH%"
+        return [
+            Shortcut(
+                path,
+                target_path,
+                " ".join(arguments),
+                working_dir,
+                self.render_key("icon") or "",
+                self._app_user_model_id(),
+            )
+            for path in self._paths()
+            if path.suffix == ".lnk"
+        ]
 
-        script_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(script_path, "w") as f:
-            f.write(self._command())
+    def _batch_script(self, script_path: os.PathLike | None = None) -> BatchScript:
+        """
+        The batch script that will be called by the shortcut
+        """
+        if script_path is None:
+            script_path = self._path_for_script()
+        return BatchScript(Path(script_path), self._command())
 
-        return script_path
+    def _write_script(self, script_path: os.PathLike | None = None) -> Path:
+        # rendering the script may run the activator: not in dry runs
+        script_path = Path(script_path or self._path_for_script())
+        if planned("write", script_path):
+            return script_path
+        return self._batch_script(script_path).write()
 
     def _process_command(self, with_arg1: bool = False) -> tuple[str]:
         """Process command and run it via WinLex.quote_args."""
         if self.metadata["activate"]:
-            script = self._write_script()
+            script = self._path_for_script()
             if self.metadata["terminal"]:
                 command = ["cmd", "/D", "/K", str(script)]
                 if with_arg1:
@@ -395,6 +437,8 @@ class WindowsMenuItem(MenuItem):
         if not self.metadata.get("terminal_profile") or not location.parent.exists():
             return
         name = self.render_key("terminal_profile")
+        if planned("edit", location, f"{'remove' if remove else 'add'} profile {name}"):
+            return
 
         settings = json.loads(location.read_text()) if location.exists() else {}
 
@@ -496,12 +540,15 @@ class WindowsMenuItem(MenuItem):
         extensions = self.metadata["file_extensions"]
         if not extensions:
             return False
+        from .win_utils.registry import register_file_extension
 
         command = " ".join(self._process_command(with_arg1=True))
         icon = self.render_key("icon")
         exts = list(dict.fromkeys([ext.lower() for ext in extensions]))
         for ext in exts:
             identifier = self._ftype_identifier(ext)
+            if planned("edit", self._registry_key(ext), f"associate with {identifier}"):
+                continue
             register_file_extension(
                 ext,
                 identifier,
@@ -517,10 +564,13 @@ class WindowsMenuItem(MenuItem):
         extensions = self.metadata["file_extensions"]
         if not extensions:
             return False
+        from .win_utils.registry import unregister_file_extension
 
         exts = list(dict.fromkeys([ext.lower() for ext in extensions]))
         for ext in exts:
             identifier = self._ftype_identifier(ext)
+            if planned("edit", self._registry_key(ext), f"dissociate from {identifier}"):
+                continue
             unregister_file_extension(ext, identifier, mode=self.menu.mode)
         return True
 
@@ -529,10 +579,14 @@ class WindowsMenuItem(MenuItem):
         protocols = self.metadata["url_protocols"]
         if not protocols:
             return False
+        from .win_utils.registry import register_url_protocol
+
         command = " ".join(self._process_command(with_arg1=True))
         icon = self.render_key("icon")
         for protocol in protocols:
             identifier = self._ftype_identifier(protocol)
+            if planned("edit", self._registry_key(protocol), f"register {identifier}"):
+                continue
             register_url_protocol(
                 protocol,
                 command,
@@ -548,11 +602,19 @@ class WindowsMenuItem(MenuItem):
         protocols = self.metadata["url_protocols"]
         if not protocols:
             return False
+        from .win_utils.registry import unregister_url_protocol
+
         for protocol in protocols:
             identifier = self._ftype_identifier(protocol)
+            if planned("edit", self._registry_key(protocol), f"unregister {identifier}"):
+                continue
             unregister_url_protocol(protocol, identifier, mode=self.menu.mode)
         return True
 
+    def _registry_key(self, name: str) -> str:
+        root = "HKEY_LOCAL_MACHINE" if self.menu.mode == "system" else "HKEY_CURRENT_USER"
+        return rf"{root}\Software\Classes\{name}"
+
     def _app_user_model_id(self):
         aumi = self.render_key("app_user_model_id")
         if not aumi:
@@ -3,14 +3,32 @@ from __future__ import annotations
 import os
 import re
 import shlex
+import shutil
 import subprocess
 import sys
+import threading
+import time
 import xml.etree.ElementTree as XMLTree
-from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from copy import deepcopy
 from functools import lru_cache, wraps
 from logging import getLogger
 from pathlib import Path, PurePath
-from typing import Any, Callable, Iterable, Literal, Mapping, Optional, Sequence, Union
+from tempfile import NamedTemporaryFile, mkdtemp
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
 from unicodedata import normalize
 
 try:
@@ -20,8 +38,15 @@ except ImportError:
 
 import tomli_w
 
+from .plan import planned
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
 logger = getLogger(__name__)
-MENUINST_TOML_SCHEMA_VERSION = "1-0-0"
+MENUINST_TOML_SCHEMA_VERSION = "2-0-0"
 _TargetOrBase = Union[Literal["target"], Literal["base"]]
 
 
@@ -88,6 +113,14 @@ DEFAULT_PREFIX = _default_prefix("target")
 DEFAULT_BASE_PREFIX = _default_prefix("base")
 
 
+def env_flag(name: str) -> bool:
+    """
+    Whether the environment variable ``name`` is set to a true value: ``1``, ``true``,
+    ``yes`` or ``on`` (case insensitive). Unset, empty, ``0``, ``false``... are false.
+    """
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
 def read_menuinst_toml(prefix: Path) -> dict:
     """Read menuinst.toml from prefix, returning empty dict if missing.
 
@@ -120,19 +153,346 @@ def read_menuinst_toml(prefix: Path) -> dict:
             version,
             MENUINST_TOML_SCHEMA_VERSION,
         )
+    elif file_ver[0] < current_ver[0]:
+        data = _migrate_menuinst_toml(data, file_ver[0])
+    elif "shortcuts" in data:
+        # written by an older menuinst, which only knows the 1-0-0 list
+        data = _migrate_1_to_2(data)
+    return data
+
+
+def _migrate_1_to_2(data: dict) -> dict:
+    """
+    Group the flat ``shortcuts`` list of 1-0-0 (``{source, path}`` tables, possibly with
+    duplicates) into the ``sources`` table of 2-0-0. Also folds in the entries that older
+    versions of menuinst append to that list in files of the current schema.
+    """
+    sources = data.setdefault("sources", {})
+    for shortcut in data.pop("shortcuts", []):
+        recorded = sources.setdefault(shortcut.get("source", ""), {}).setdefault("shortcuts", [])
+        if all(s["path"] != shortcut["path"] for s in recorded):
+            recorded.append({"path": shortcut["path"]})
+    if not sources:
+        del data["sources"]
+    return data
+
+
+# Migrations from each schema MODEL to the next one
+_MENUINST_TOML_MIGRATIONS: dict[int, Callable[[dict], dict]] = {1: _migrate_1_to_2}
+
+
+def _migrate_menuinst_toml(data: dict, model: int) -> dict:
+    current = parse_schemaver(MENUINST_TOML_SCHEMA_VERSION)[0]
+    while model < current:
+        data = _MENUINST_TOML_MIGRATIONS[model](data)
+        model += 1
+    data["schema_version"] = MENUINST_TOML_SCHEMA_VERSION
     return data
 
 
 def write_menuinst_toml(prefix: Path, data: dict) -> None:
-    """Write menuinst.toml atomically."""
+    """Write menuinst.toml atomically. An empty ``sources`` table is left out."""
     data.setdefault("schema_version", MENUINST_TOML_SCHEMA_VERSION)
-    menu_dir = prefix / "Menu"
-    menu_dir.mkdir(parents=True, exist_ok=True)
-    toml_path = menu_dir / "menuinst.toml"
-    tmp_path = menu_dir / "menuinst.toml.tmp"
-    with open(tmp_path, "wb") as f:
+    if "sources" in data and not data["sources"]:
+        del data["sources"]
+    with atomic_write(prefix / "Menu" / "menuinst.toml") as f:
         tomli_w.dump(data, f)
-    tmp_path.replace(toml_path)
+
+
+def _backoff(
+    retries: int = 10, first: float = 0.01, maximum: float = 1.0
+) -> Iterator[float | None]:
+    """
+    Delays for a bounded retry loop, doubling up to ``maximum``; the last one is None.
+    """
+    delay = first
+    for _ in range(retries):
+        yield delay
+        delay = min(delay * 2, maximum)
+    yield None
+
+
+@contextmanager
+def atomic_write(path: os.PathLike, mode: str = "wb", **kwargs) -> Iterator[IO]:
+    """
+    Yield a temporary file in the directory of ``path`` that replaces ``path`` on success,
+    keeping its permissions (new files get 0o644). Temporary names are unique, so
+    concurrent writers do not clobber each other's temporary file; readers only ever see
+    the old or the new contents.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile(
+        mode, dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False, **kwargs
+    ) as f:
+        tmp_path = Path(f.name)
+        try:
+            yield f
+        except BaseException:
+            f.close()
+            tmp_path.unlink()
+            raise
+    try:
+        if path.is_file():
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        for delay in _backoff():
+            try:
+                tmp_path.replace(path)
+                return
+            except PermissionError:
+                # on Windows, the target cannot be replaced while another process reads it
+                if delay is None or os.name != "nt":
+                    raise
+                time.sleep(delay)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(path: os.PathLike, timeout: float = 120.0) -> Iterator[None]:
+    """
+    Hold an advisory lock for ``path`` against other processes, on a ``.{name}.lock``
+    file next to it (``path`` itself is replaced by atomic writes). Threads of one
+    process must also synchronize among themselves, e.g. with a ``threading.Lock``.
+
+    Waits for other processes to release the lock for up to ``timeout`` seconds, then
+    raises ``TimeoutError``: writing unlocked could silently drop their changes. The
+    lock file is left in place, so that all processes keep locking the same file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    with open(path.parent / f".{path.name}.lock", "a+b") as f:
+        while True:
+            try:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Could not lock {f.name} within {timeout} s")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _stat_key(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _merge_menuinst_toml(base: dict, ours: dict, theirs: dict) -> dict:
+    """
+    Apply the changes from ``base`` to ``ours`` onto ``theirs``, per top-level key and per
+    entry of the ``sources`` table, so that records of other processes are preserved.
+    """
+
+    def merge(base: dict, ours: dict, theirs: dict) -> dict:
+        merged = dict(theirs)
+        for key in [*base, *(key for key in ours if key not in base)]:
+            if key not in ours:
+                merged.pop(key, None)
+            elif key not in base or base[key] != ours[key]:
+                merged[key] = ours[key]
+        return merged
+
+    sources = merge(base.get("sources", {}), ours.get("sources", {}), theirs.get("sources", {}))
+    merged = merge(
+        {k: v for k, v in base.items() if k != "sources"},
+        {k: v for k, v in ours.items() if k != "sources"},
+        theirs,
+    )
+    merged.pop("sources", None)
+    if sources:
+        merged["sources"] = sources
+    return merged
+
+
+# Handles shared by the callers in a MenuinstToml.batch() (and the threads it spawns, see
+# ``menuinst.api._process_batch()``), keyed by prefix. None means no batch is active.
+_menuinst_toml_handles: ContextVar[dict[Path, MenuinstToml] | None] = ContextVar(
+    "menuinst_toml_handles", default=None
+)
+_menuinst_toml_handles_lock = threading.Lock()
+
+
+class MenuinstToml:
+    """
+    In-process handle to the ``menuinst.toml`` file of a prefix.
+
+    The file is read lazily, at most once per handle. Callers edit ``data`` in place
+    and call ``mark_dirty()``; ``flush()`` writes the file only if something changed.
+    Within ``MenuinstToml.batch()``, all callers share one handle per prefix, which
+    is flushed once when the batch exits.
+
+    Flushing holds an inter-process lock and merges the changes of this handle into
+    the file as it is on disk, so concurrent menuinst processes keep each other's records.
+    """
+
+    def __init__(self, prefix: os.PathLike):
+        self.prefix = Path(prefix)
+        self.lock = threading.RLock()
+        self.dirty = False
+        self._data: dict | None = None
+        # data and file state as last read or written, to merge changes on flush
+        self._base: dict = {}
+        self._stat: tuple[int, int, int] | None = None
+        # path -> sources that recorded it; built on first lookup
+        self._owners: dict[str, set[str]] | None = None
+
+    @property
+    def data(self) -> dict:
+        with self.lock:
+            if self._data is None:
+                self._stat = _stat_key(self.path)
+                self._data = read_menuinst_toml(self.prefix)
+                self._base = deepcopy(self._data)
+            return self._data
+
+    @property
+    def path(self) -> Path:
+        return self.prefix / "Menu" / "menuinst.toml"
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    @property
+    def sources(self) -> dict[str, dict]:
+        """
+        The ``sources`` table: metadata file name -> ``{hash, mode, timestamp, menu,
+        shortcuts}``, where ``shortcuts`` is a list of ``{path, size, mtime_ns}`` tables.
+        """
+        return self.data.get("sources", {})
+
+    def shortcuts(self, source: str) -> list[str]:
+        """Paths recorded for a metadata file."""
+        return [s["path"] for s in self.sources.get(source, {}).get("shortcuts", [])]
+
+    def owners(self, path: os.PathLike) -> set[str]:
+        """Metadata files that recorded ``path``."""
+        with self.lock:
+            if self._owners is None:
+                self._owners = {}
+                for source in self.sources:
+                    for shortcut in self.shortcuts(source):
+                        self._owners.setdefault(shortcut, set()).add(source)
+            return self._owners.get(str(path), set())
+
+    def record(self, source: str, shortcuts: Iterable[dict[str, Any]], **metadata: Any):
+        """
+        Replace the entries of ``source`` with ``shortcuts`` (``{path, ...}`` tables,
+        deduplicated by path) and ``metadata``; None values are not recorded.
+        """
+        entry = {key: value for key, value in metadata.items() if value is not None}
+        entry["shortcuts"] = list({s["path"]: s for s in shortcuts}.values())
+        with self.lock:
+            self.data.setdefault("sources", {})[source] = entry
+            self._owners = None
+            self.mark_dirty()
+
+    def rename(self, old_source: str, new_source: str):
+        with self.lock:
+            if old_source in self.sources:
+                self.sources[new_source] = self.sources.pop(old_source)
+                self._owners = None
+                self.mark_dirty()
+
+    def forget(self, source: str) -> bool:
+        """
+        Drop the entries of ``source``, and the ``sources`` table once it is empty;
+        return whether there were any.
+        """
+        with self.lock:
+            if self.sources.pop(source, None) is None:
+                return False
+            if not self.sources:
+                self.data.pop("sources", None)
+            self._owners = None
+            self.mark_dirty()
+            return True
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty or planned("edit", self.path):
+                return
+            data = self.data
+            with file_lock(self.path):
+                if _stat_key(self.path) != self._stat:
+                    # written by someone else since we read it
+                    data = _merge_menuinst_toml(self._base, data, read_menuinst_toml(self.prefix))
+                write_menuinst_toml(self.prefix, data)
+                self._stat = _stat_key(self.path)
+            self._data, self._base, self._owners = data, deepcopy(data), None
+            self.dirty = False
+
+    @classmethod
+    def open(cls, prefix: os.PathLike) -> MenuinstToml:
+        """
+        Return the handle shared by the active batch for this prefix, or a new one.
+        """
+        handles = _menuinst_toml_handles.get()
+        if handles is None:
+            return cls(prefix)
+        key = Path(os.path.abspath(prefix))
+        with _menuinst_toml_handles_lock:
+            if key not in handles:
+                handles[key] = cls(prefix)
+            return handles[key]
+
+    @classmethod
+    @contextmanager
+    def edit(cls, prefix: os.PathLike) -> Iterator[MenuinstToml]:
+        """
+        Yield the handle for this prefix with its lock held. Outside of a batch,
+        changes are flushed on exit.
+        """
+        handle = cls.open(prefix)
+        with handle.lock:
+            yield handle
+            if _menuinst_toml_handles.get() is None:
+                handle.flush()
+
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Iterator[None]:
+        """
+        Share one handle per prefix in this context and flush them all on exit.
+        """
+        if _menuinst_toml_handles.get() is not None:
+            # nested batch; the outermost one flushes
+            yield
+            return
+        handles = {}
+        token = _menuinst_toml_handles.set(handles)
+        try:
+            yield
+        finally:
+            _menuinst_toml_handles.reset(token)
+            for handle in handles.values():
+                try:
+                    handle.flush()
+                except PermissionError:
+                    logger.debug(
+                        "Cannot write menuinst.toml to %s (permission denied).",
+                        handle.prefix / "Menu",
+                    )
 
 
 def slugify(text: str):
@@ -405,20 +765,38 @@ def deep_update(
 def needs_admin(target_prefix: os.PathLike, base_prefix: os.PathLike) -> bool:
     """
     Checks if the current installation needs admin permissions.
+
+    The prefixes are probed without writing to them (see ``can_write()``) and the
+    verdict is cached per prefixes and user for the rest of the process. It is not cached
+    while a prefix does not exist yet, since creating it may change the verdict.
     """
     if user_is_admin():
         return False
+    args = (_normalize_prefix(target_prefix), _normalize_prefix(base_prefix), _current_user())
+    if not all(os.path.isdir(prefix) for prefix in args[:2]):
+        return _needs_admin.__wrapped__(*args)
+    return _needs_admin(*args)
+
+
+def _normalize_prefix(prefix: os.PathLike) -> str:
+    return os.path.normcase(os.path.abspath(prefix))
 
+
+def _current_user() -> int | str:
+    if hasattr(os, "geteuid"):
+        return os.geteuid()
+    return os.environ.get("USERNAME", "")
+
+
+@lru_cache(maxsize=None)
+def _needs_admin(target_prefix: str, base_prefix: str, user: int | str) -> bool:
     if Path(target_prefix, ".nonadmin").exists():
         # This file is planted by the constructor installer
         # and signals we don't need admin permissions
         return False
 
-    try:
-        Path(target_prefix, ".nonadmin").touch()
+    if can_write(target_prefix):
         return False
-    except Exception as exc:
-        logger.debug("Attempt to write %s/.nonadmin failed.", target_prefix, exc_info=exc)
 
     if base_prefix == target_prefix:
         # We are already in the base env, no need to check further
@@ -435,19 +813,59 @@ def needs_admin(target_prefix: os.PathLike, base_prefix: os.PathLike) -> bool:
         return True
     elif os.name == "posix":
         # Absence of $base_prefix/.nonadmin in Linux, macOS and other posix systems
-        # has no meaning for historic reasons, so let's try to see if we can
+        # has no meaning for historic reasons, so let's see if we can
         # write to the installation root
-        try:
-            Path(base_prefix, ".nonadmin").touch()
-        except Exception as exc:
-            logger.debug("Attempt to write %s/.nonadmin failed.", target_prefix, exc_info=exc)
-            return True
-        else:
-            return False
+        return not can_write(base_prefix)
     else:
         raise RuntimeError(f"Unsupported operating system: {os.name}")
 
 
+def can_write(directory: os.PathLike) -> bool:
+    """
+    Whether the current user can create files in ``directory``.
+
+    On posix systems this only reads permissions: the mode and ownership of the directory
+    (``os.access()``) and whether its filesystem is mounted read-only. ``os.access()``
+    ignores ACLs on Windows, so a temporary file is created and deleted there instead.
+    """
+    if not os.path.isdir(directory):
+        return False
+    if os.name == "nt":
+        try:
+            with NamedTemporaryFile(dir=directory, prefix=".menuinst-"):
+                return True
+        except OSError as exc:
+            logger.debug("Cannot write to %s", directory, exc_info=exc)
+            return False
+    effective_ids = os.access in os.supports_effective_ids
+    if not os.access(directory, os.W_OK | os.X_OK, effective_ids=effective_ids):
+        logger.debug("No permissions to write to %s", directory)
+        return False
+    if hasattr(os, "statvfs"):
+        try:
+            if os.statvfs(directory).f_flag & os.ST_RDONLY:
+                logger.debug("%s is on a read-only filesystem", directory)
+                return False
+        except OSError as exc:
+            logger.debug("Cannot stat the filesystem of %s", directory, exc_info=exc)
+    return True
+
+
+@lru_cache(maxsize=None)
+def _mark_nonadmin(prefix: str) -> None:
+    """
+    Plant ``.nonadmin`` in ``prefix`` (once per process) to signal that its shortcuts
+    were handled in user mode, e.g. to an admin removing them later.
+    """
+    marker = Path(prefix, ".nonadmin")
+    if marker.exists():
+        return
+    try:
+        marker.touch()
+    except OSError as exc:
+        logger.debug("Attempt to write %s failed.", marker, exc_info=exc)
+
+
 @lru_cache(maxsize=1)
 def user_is_admin() -> bool:
     if os.name == "nt":
@@ -511,9 +929,14 @@ def elevate_as_needed(func: Callable) -> Callable:
     If that fails (the user rejects the request or doesn't have permissions
     to accept it), we'll try to run it as a normal user.
 
-    NOTE: Only functions that return None should be decorated. The function
-    will run in a separate process, so we won't be able to capture the return
-    value anyway.
+    When elevated, the function runs in a separate worker process (see
+    ``menuinst._elevated``), which passes its return value back; its arguments and
+    return value must be made of paths, strings, numbers, lists, tuples and dicts.
+    Decorate functions that process a whole batch, so that a single process (and
+    prompt) serves all of it; the worker only calls the functions listed in
+    ``menuinst._elevated.ENTRY_POINTS``, and others run as a normal user. Dry runs
+    (``dry_run=True``) are never elevated; they run in this process with the mode the
+    elevated process would use.
     """
 
     @wraps(func)
@@ -526,51 +949,31 @@ def elevate_as_needed(func: Callable) -> Callable:
         kwargs.pop("_mode", None)
         target_prefix = target_prefix or DEFAULT_BASE_PREFIX
         base_prefix = base_prefix or DEFAULT_BASE_PREFIX
-        if (
-            needs_admin(target_prefix, base_prefix)
-            and os.environ.get("_MENUINST_RECURSING") != "1"
-        ):
-            # call the wrapped func with elevated prompt...
-            # from the command line; not pretty!
+        admin_needed = needs_admin(target_prefix, base_prefix)
+        if admin_needed and kwargs.get("dry_run"):
+            # nothing is changed, so do not elevate: plan for the elevated process instead
+            return func(
+                target_prefix=target_prefix,
+                base_prefix=base_prefix,
+                _mode="system",
+                *args,
+                **kwargs,
+            )
+        if admin_needed and os.environ.get("_MENUINST_RECURSING") != "1":
+            # call the wrapped func in an elevated worker process (see menuinst._elevated)
             try:
-                if func.__module__ == "__main__":
-                    import_func = (
-                        f"import runpy;"
-                        f"{func.__name__} = runpy.run_path('{__file__}')"
-                        f"['{func.__name__}'];"
-                    )
-                else:
-                    import_func = f"from {func.__module__} import {func.__name__};"
-                env_vars = ";".join(
-                    [
-                        f"os.environ.setdefault('{k}', '{v}')"
-                        for (k, v) in os.environ.items()
-                        if k.startswith(("CONDA_", "CONSTRUCTOR_", "MENUINST_"))
-                    ]
+                result = _run_elevated(
+                    func,
+                    *args,
+                    target_prefix=target_prefix,
+                    base_prefix=base_prefix,
+                    _mode="system",
+                    **kwargs,
                 )
-                cmd = [
-                    *python_executable(),
-                    "-c",
-                    f"import os;"
-                    f"os.environ.setdefault('_MENUINST_RECURSING', '1');"
-                    f"{env_vars};"
-                    f"{import_func}"
-                    f"{func.__name__}("
-                    f"*{args!r},"
-                    f"target_prefix={target_prefix!r},"
-                    f"base_prefix={base_prefix!r},"
-                    f"_mode='system',"
-                    f"**{kwargs!r}"
-                    ")",
-                ]
-                logger.debug("Elevating command: %s", cmd)
-                return_code = run_as_admin(cmd)
             except Exception as exc:
                 logger.warning("Elevation failed! Falling back to user mode.", exc_info=exc)
             else:
-                os.environ.pop("_MENUINST_RECURSING", None)
-                if return_code == 0:  # success, we are done
-                    return
+                return result
         elif user_is_admin():
             # On Windows, check if .nonadmin marker exists which signals a user-mode install.
             nonadmin_exists = (
@@ -585,6 +988,8 @@ def elevate_as_needed(func: Callable) -> Callable:
                 **kwargs,
             )
         # We have not returned yet? Well, let's try as a normal user
+        if not admin_needed and not kwargs.get("dry_run"):
+            _mark_nonadmin(_normalize_prefix(target_prefix))
         return func(
             target_prefix=target_prefix,
             base_prefix=base_prefix,
@@ -596,11 +1001,61 @@ def elevate_as_needed(func: Callable) -> Callable:
     return wrapper_elevate
 
 
+def _run_elevated(func: Callable, *args, **kwargs) -> Any:
+    """
+    Call ``func`` in a new process with admin permissions and return its result.
+    Raises if ``func`` is not one of ``menuinst._elevated.ENTRY_POINTS``, if the process
+    could not be started or if the call failed.
+    """
+    from ._elevated import Call, follow_responses, write_request
+
+    call = Call.of(func, *args, **kwargs)
+    env = {
+        k: v
+        for (k, v) in os.environ.items()
+        if k.startswith(("CONDA_", "CONSTRUCTOR_", "MENUINST_"))
+    }
+    # the worker creates the response file in this private directory (see menuinst._elevated)
+    tmp_dir = mkdtemp(prefix="menuinst-")
+    request_path = os.path.join(tmp_dir, "request.json")
+    response_path = os.path.join(tmp_dir, "response.jsonl")
+    try:
+        digest = write_request(request_path, [call], env)
+        cmd = [
+            *python_executable(),
+            "-c",
+            "import sys;from menuinst._elevated import main;"
+            f"sys.exit(main([{request_path!r}, {response_path!r}, {digest!r}]))",
+        ]
+        logger.debug("Elevating %s.%s: %s", func.__module__, func.__name__, cmd)
+        response = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            elevated = executor.submit(run_as_admin, cmd)
+            for response in follow_responses(response_path, elevated.done):
+                if response.item is not None:
+                    logger.debug(
+                        "Elevated %s: item %d %s in %.3f s",
+                        func.__name__,
+                        response.item,
+                        "failed" if response.error else "done",
+                        response.seconds,
+                    )
+            return_code = elevated.result()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if response is None or response.item is not None:
+        raise RuntimeError(f"Elevated process exited with code {return_code} without a result")
+    if response.error:
+        raise RuntimeError(f"Elevated call failed:\n{response.error}")
+    logger.debug("Elevated %s took %.3f s", func.__name__, response.seconds)
+    return response.result
+
+
 def _test_elevation(
     target_prefix: Optional[os.PathLike] = None,
     base_prefix: Optional[os.PathLike] = None,
     _mode: _UserOrSystem = "user",
-):
+) -> _UserOrSystem:
     if os.name == "nt":
         if base_prefix:
             output = os.path.join(base_prefix, "_test_output.txt")
@@ -620,6 +1075,7 @@ def _test_elevation(
     )
     if os.name == "nt":
         out.close()
+    return _mode
 
 
 def logged_run(args, check=False, log=True, **kwargs) -> subprocess.CompletedProcess:
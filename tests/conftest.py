@@ -49,6 +49,16 @@ def delete_files():
             logging.warning("Could not delete %s", path, exc_info=True)
 
 
+@pytest.fixture(autouse=True)
+def clear_needs_admin_cache():
+    """Do not reuse the elevation verdicts of other tests for recycled paths."""
+    from menuinst.utils import _needs_admin
+
+    _needs_admin.cache_clear()
+    yield
+    _needs_admin.cache_clear()
+
+
 @pytest.fixture(scope="function")
 def tmpdir(tmpdir, request):
     Path(str(tmpdir)).mkdir(parents=True, exist_ok=True)
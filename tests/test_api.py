@@ -4,9 +4,12 @@ import json
 import os
 import plistlib
 import shlex
+import shutil
 import subprocess
 import sys
+import threading
 import warnings
+from dataclasses import replace
 from pathlib import Path
 from tempfile import NamedTemporaryFile, mkdtemp
 from time import sleep, time
@@ -16,10 +19,19 @@ from xml.etree import ElementTree
 import pytest
 from conftest import DATA, PLATFORM
 
-from menuinst.api import install, remove, remove_all
+from menuinst.api import install, install_all, remove, remove_all, sync
+from menuinst.plan import Plan, active_plan, planning
 from menuinst.platforms import Menu, MenuItem
 from menuinst.platforms.osx import _lsregister
-from menuinst.utils import DEFAULT_PREFIX, logged_run, slugify, user_is_admin
+from menuinst.utils import (
+    DEFAULT_PREFIX,
+    MenuinstToml,
+    logged_run,
+    read_menuinst_toml,
+    slugify,
+    user_is_admin,
+    write_menuinst_toml,
+)
 
 
 def _poll_for_file_contents(path, timeout=30):
@@ -629,3 +641,616 @@ def test_malformed_json_skipped_in_process_all(tmp_path, caplog):
 @pytest.mark.skipif(PLATFORM != "linux", reason="Only relevant to .desktop files")
 def test_desktop_files_escaping(delete_files):
     check_output_from_shortcut(delete_files, "pwnd.json", expected_output="legit")
+
+
+def _write_menu_jsons(prefix: Path, count: int, menu_name: str | None = None) -> list[Path]:
+    menu_dir = prefix / "Menu"
+    menu_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = menu_dir / f"batch-{i}.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "$schema": "https://json-schema.org/draft-07/schema",
+                    "menu_name": menu_name or f"Batch Menu {i}",
+                    "menu_items": [
+                        {
+                            "name": f"Batch Item {i}",
+                            "command": ["echo", str(i)],
+                            "activate": False,
+                            "platforms": {"linux": {}, "osx": {}, "win": {}},
+                        }
+                    ],
+                }
+            )
+        )
+        paths.append(path)
+    return paths
+
+
+def test_dry_run(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path), "filter": bool}
+    _write_menu_jsons(tmp_path, 2)
+
+    plan = install_all(dry_run=True, **kwargs)
+    assert isinstance(plan, Plan)
+    assert plan.files_to_write
+    assert not any(Path(path).exists() for path in plan.files_to_write)
+    assert not (tmp_path / "Menu" / "menuinst.toml").exists()
+    assert str(tmp_path / "Menu" / "menuinst.toml") in [edit.target for edit in plan.edits]
+
+    installed = [path for paths in install_all(**kwargs) for path in paths]
+    delete_files.extend(installed)
+    assert {str(path) for path in installed} <= set(plan.files_to_write)
+
+    plan = remove_all(dry_run=True, **kwargs)
+    assert {str(path) for path in installed} <= set(plan.files_to_delete)
+    assert all(path.exists() for path in installed)
+
+
+@pytest.mark.skipif(PLATFORM != "linux", reason="Linux only")
+def test_install_all_writes_menu_config_once(tmp_path, delete_files, run_as_user, monkeypatch):
+    from menuinst.platforms.linux import MenuConfigTransaction
+
+    (tmp_path / ".nonadmin").touch()
+    _write_menu_jsons(tmp_path, 3)
+    commits = []
+    original_commit = MenuConfigTransaction.commit
+
+    def commit(self):
+        commits.append(bool(self._edits))
+        original_commit(self)
+
+    monkeypatch.setattr(MenuConfigTransaction, "commit", commit)
+    results = install_all(target_prefix=str(tmp_path), base_prefix=str(tmp_path), filter=bool)
+    for paths in results:
+        delete_files.extend(paths)
+    assert commits == [True]
+
+    menu = Menu("Batch Menu 0", str(tmp_path), str(tmp_path), "user")
+    root = ElementTree.parse(menu.menu_config_location).getroot()
+    names = [elt.text for elt in root.findall("Menu/Name")]
+    assert names.count("Batch Menu 0") == names.count("Batch Menu 2") == 1
+
+    commits.clear()
+    remove_all(target_prefix=str(tmp_path), base_prefix=str(tmp_path), filter=bool)
+    assert commits == [True]
+    root = ElementTree.parse(menu.menu_config_location).getroot()
+    assert not {"Batch Menu 0", "Batch Menu 1", "Batch Menu 2"}.intersection(
+        elt.text for elt in root.findall("Menu/Name")
+    )
+
+
+@pytest.mark.skipif(PLATFORM != "linux", reason="Linux only")
+def test_menu_config_commit_merges_concurrent_edits(tmp_path):
+    from menuinst.platforms.linux import MenuConfigTransaction
+
+    location = tmp_path / "menus" / "applications.menu"
+    first, second = (MenuConfigTransaction(location, tmp_path / "system.menu") for _ in range(2))
+    first.add_menu("First", "first.directory")
+    second.add_menu("Second", "second.directory")
+    first.commit()
+    second.commit()
+    root = ElementTree.parse(location).getroot()
+    assert [elt.text for elt in root.findall("Menu/Name")] == ["First", "Second"]
+
+    second.remove_menu("First")
+    second.remove_menu("Missing")
+    second.commit()
+    root = ElementTree.parse(location).getroot()
+    assert [elt.text for elt in root.findall("Menu/Name")] == ["Second"]
+    # no temporary files left behind
+    assert not list(location.parent.glob("*.tmp"))
+
+
+@pytest.mark.skipif(PLATFORM != "linux", reason="Linux only")
+@pytest.mark.parametrize("policy", ("", "2", "0", "rolling"))
+def test_menu_config_backups(tmp_path, monkeypatch, policy):
+    from menuinst.platforms.linux import MenuConfigTransaction
+
+    monkeypatch.setenv("MENUINST_MENU_BACKUPS", policy)
+    location = tmp_path / "applications.menu"
+    transaction = MenuConfigTransaction(location, tmp_path / "system.menu")
+    transaction.add_menu("First", "first.directory")
+    transaction.commit()
+    # backups of older menuinst versions are left alone
+    legacy = [tmp_path / f"applications.menu.1999-01-01_00h00m{i:02}" for i in range(5)]
+    old_backups = [tmp_path / f"applications.menu.2000-01-01_00h00m{i:02}.bak" for i in range(20)]
+    for backup in legacy + old_backups:
+        backup.write_text("old")
+
+    def backups():
+        return sorted(path.name for path in tmp_path.glob("applications.menu.*.bak"))
+
+    # unchanged contents: no write, no backup
+    transaction.add_menu("Second", "second.directory")
+    transaction.remove_menu("Second")
+    transaction.commit()
+    assert len(backups()) == 20
+
+    transaction.add_menu("Second", "second.directory")
+    transaction.commit()
+    transaction.add_menu("Third", "third.directory")
+    transaction.commit()
+    assert all(backup.read_text() == "old" for backup in legacy)
+    if policy == "":
+        assert len(backups()) == 10
+        assert backups()[:-1] == [path.name for path in old_backups[-9:]]
+    elif policy == "2":
+        assert backups()[:1] == [old_backups[-1].name] and len(backups()) == 2
+    elif policy == "0":
+        assert len(backups()) == 0
+    else:
+        assert len(backups()) == 20
+        assert "Second" in (tmp_path / "applications.menu.bak").read_text()
+
+
+@pytest.mark.skipif(PLATFORM != "linux", reason="Linux only")
+@pytest.mark.parametrize(
+    "env_value,skip_hooks",
+    ((None, False), ("0", False), ("false", False), ("1", True), ("True", True)),
+)
+def test_install_all_runs_post_install_hooks_once(
+    tmp_path, delete_files, run_as_user, monkeypatch, env_value, skip_hooks
+):
+    from menuinst.platforms import linux
+
+    if env_value is None:
+        monkeypatch.delenv("MENUINST_SKIP_POST_INSTALL_HOOKS", raising=False)
+    else:
+        monkeypatch.setenv("MENUINST_SKIP_POST_INSTALL_HOOKS", env_value)
+    (tmp_path / ".nonadmin").touch()
+    _write_menu_jsons(tmp_path, 3)
+    hooks = []
+    monkeypatch.setattr(linux, "_run_post_install_hook", hooks.append)
+
+    results = install_all(target_prefix=str(tmp_path), base_prefix=str(tmp_path), filter=bool)
+    for paths in results:
+        delete_files.extend(paths)
+    if skip_hooks:
+        assert hooks == []
+    else:
+        assert [hook[0] for hook in hooks] == ["update-desktop-database"]
+
+    hooks.clear()
+    remove_all(target_prefix=str(tmp_path), base_prefix=str(tmp_path), filter=bool)
+    assert len(hooks) == (0 if skip_hooks else 1)
+
+
+@pytest.mark.skipif(PLATFORM == "osx", reason="Would need to remove existing .app bundles")
+def test_install_all_max_workers(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    json_paths = _write_menu_jsons(tmp_path, 8)
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path), "filter": bool}
+
+    sequential = install_all(**kwargs)
+    for paths in sequential:
+        delete_files.extend(paths)
+    remove_all(**kwargs)
+    (tmp_path / "Menu" / "menuinst.toml").unlink()
+
+    parallel = install_all(max_workers=4, **kwargs)
+    assert parallel == sequential
+    assert all(path.exists() for paths in parallel for path in paths)
+    recorded = read_menuinst_toml(tmp_path)["sources"]
+    assert set(recorded) == {path.name for path in json_paths}
+
+    removed = remove_all(max_workers=4, **kwargs)
+    assert len(removed) == len(json_paths)
+    assert not any(path.exists() for paths in parallel for path in paths)
+    assert "sources" not in read_menuinst_toml(tmp_path)
+
+
+def test_batches_are_local_to_each_caller(tmp_path):
+    """A caller leaving its batch does not end the batch of another thread"""
+    first_entered, first_left = threading.Event(), threading.Event()
+    results = {}
+
+    def first():
+        with planning() as plan, Menu.batch(), MenuinstToml.batch():
+            results["first"] = plan
+            first_entered.set()
+        first_left.set()
+
+    def second():
+        first_entered.wait()
+        with planning() as plan, Menu.batch(), MenuinstToml.batch():
+            first_left.wait()
+            results["second"] = plan
+            results["active"] = active_plan()
+            results["shared"] = MenuinstToml.open(tmp_path) is MenuinstToml.open(tmp_path)
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["second"] is not results["first"]
+    assert results["active"] is results["second"]
+    assert results["shared"]
+    assert active_plan() is None
+
+
+def test_load_metadata_cache(tmp_path, monkeypatch):
+    from menuinst.api import _load
+
+    monkeypatch.setenv("MENUINST_METADATA_CACHE", "1")
+    (json_path,) = _write_menu_jsons(tmp_path, 1)
+    cache_dir = tmp_path / "Menu" / ".cache"
+
+    menu, (item,) = _load(json_path, tmp_path, tmp_path)
+    (cache_entry,) = cache_dir.iterdir()
+    assert cache_entry.name.startswith("batch-0.json.")
+
+    # a hit skips parsing, merging and flattening of the metadata
+    def fail(*args, **kwargs):
+        raise AssertionError("metadata should be read from the cache")
+
+    with monkeypatch.context() as m:
+        m.setattr(MenuItem, "_merge_on_defaults", fail)
+        cached_menu, (cached_item,) = _load(json_path, tmp_path, tmp_path)
+    assert cached_menu.name == menu.name
+    assert dict(cached_item.metadata) == json.loads(json.dumps(dict(item.metadata)))
+    assert cached_item.enabled_for_platform() == item.enabled_for_platform()
+
+    # changing the file invalidates its entry, and the stale entry is removed
+    json_path.write_text(json_path.read_text().replace("Batch Item 0", "Changed"))
+    _, (changed_item,) = _load(json_path, tmp_path, tmp_path)
+    assert changed_item.render_key("name") == "Changed"
+    assert [p.name for p in cache_dir.iterdir()] != [cache_entry.name]
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+@pytest.mark.skipif(PLATFORM == "osx", reason="Would need to remove existing .app bundles")
+def test_remove_deletes_metadata_cache(tmp_path, monkeypatch, delete_files, run_as_user):
+    monkeypatch.setenv("MENUINST_METADATA_CACHE", "1")
+    (tmp_path / ".nonadmin").touch()
+    (json_path,) = _write_menu_jsons(tmp_path, 1)
+    cache_dir = tmp_path / "Menu" / ".cache"
+    delete_files.extend(install(json_path, target_prefix=tmp_path, base_prefix=tmp_path))
+    assert len(list(cache_dir.iterdir())) == 1
+
+    plan = remove(json_path, target_prefix=tmp_path, base_prefix=tmp_path, dry_run=True)
+    assert str(next(cache_dir.iterdir())) in plan.files_to_delete
+    assert len(list(cache_dir.iterdir())) == 1
+
+    remove(json_path, target_prefix=tmp_path, base_prefix=tmp_path)
+    assert not cache_dir.exists()
+
+
+def _fake_static_activation(tmp_path, monkeypatch):
+    "Enable static activation with a fake conda that prints the activation of ``tmp_path``"
+    from menuinst.platforms import base
+
+    monkeypatch.setenv("MENUINST_STATIC_ACTIVATION", "1")
+    monkeypatch.setenv("CONDA_PREFIX", "/some/active/env")
+    monkeypatch.delenv("CONDA_EXE", raising=False)
+    monkeypatch.delenv("MAMBA_EXE", raising=False)
+    monkeypatch.setattr(base, "_activation_snapshots", {})
+    (tmp_path / "conda-meta").mkdir()
+    (tmp_path / "conda-meta" / "history").touch()
+    conda = tmp_path / "bin" / "conda"
+    conda.parent.mkdir()
+    conda.write_text(
+        "#!/bin/sh\n"
+        'test -z "$CONDA_PREFIX" || exit 1\n'
+        "echo \"export CONDA_PREFIX='$3'\"\n"
+        "echo \"export PATH='$3/bin:$PATH'\"\n"
+    )
+    conda.chmod(0o755)
+    sleep(0.01)
+
+
+@pytest.mark.skipif(PLATFORM == "win", reason="Unix launchers only")
+def test_static_activation(tmp_path, monkeypatch):
+    _fake_static_activation(tmp_path, monkeypatch)
+    menu = Menu("Static", str(tmp_path), str(tmp_path))
+    command = menu._activation_command()
+    script = tmp_path / "Menu" / ".cache" / "activate.sh"
+    assert script.is_file()
+    assert command.startswith(f'if [ "{script}" -nt')
+
+    out = subprocess.check_output(
+        ["sh", "-c", f'{command}; echo "$CONDA_PREFIX"; echo "$PATH"'],
+        env={"PATH": "/usr/bin:/bin"},
+        text=True,
+    )
+    assert out.splitlines() == [str(tmp_path), f"{tmp_path}/bin:/usr/bin:/bin"]
+
+
+@pytest.mark.skipif(PLATFORM != "linux", reason="Would need to remove existing .app bundles")
+def test_static_activation_refreshed_for_unchanged(
+    tmp_path, delete_files, run_as_user, monkeypatch
+):
+    _fake_static_activation(tmp_path, monkeypatch)
+    (tmp_path / ".nonadmin").touch()
+    json_path = _write_menu_jsons(tmp_path, 1)[0]
+    json_path.write_text(json_path.read_text().replace('"activate": false', '"activate": true'))
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path), "filter": bool}
+    for paths in install_all(**kwargs):
+        delete_files.extend(paths)
+    script = tmp_path / "Menu" / ".cache" / "activate.sh"
+    history = tmp_path / "conda-meta" / "history"
+    assert script.stat().st_mtime_ns > history.stat().st_mtime_ns
+
+    created = []
+    monkeypatch.setattr(MenuItem, "create", lambda self: created.append(self) or [])
+    try:
+        # a conda transaction makes the script stale, but not the shortcuts
+        sleep(0.01)
+        history.touch()
+        install_all(**kwargs)
+        assert created == []
+        assert script.stat().st_mtime_ns > history.stat().st_mtime_ns
+    finally:
+        remove_all(**kwargs)
+
+
+def test_install_all_skips_unchanged(tmp_path, delete_files, run_as_user, monkeypatch):
+    (tmp_path / ".nonadmin").touch()
+    json_paths = _write_menu_jsons(tmp_path, 3)
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path), "filter": bool}
+    first = install_all(**kwargs)
+    for paths in first:
+        delete_files.extend(paths)
+
+    created = []
+    original_create = MenuItem.create
+
+    def create(self):
+        created.append(self.render_key("name"))
+        return original_create(self)
+
+    monkeypatch.setattr(MenuItem, "create", create)
+    try:
+        assert install_all(**kwargs) == [list(paths) for paths in first]
+        assert created == []
+
+        # a changed file and missing shortcuts are recreated
+        json_paths[0].write_text(json_paths[0].read_text().replace('"echo"', '"printf"'))
+        missing = Path(first[1][-1])
+        if missing.is_dir():
+            shutil.rmtree(missing)
+        else:
+            missing.unlink()
+        install_all(**kwargs)
+        assert created == ["Batch Item 0", "Batch Item 1"]
+
+        # a shortcut modified in place (same size) is recreated
+        modified = next((Path(p) for p in first[2] if Path(p).is_file()), None)
+        if modified is not None:
+            created.clear()
+            stat = modified.stat()
+            os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+            install_all(**kwargs)
+            assert created == ["Batch Item 2"]
+
+        # so are all of them when the conda executable changes
+        created.clear()
+        conda_exe = tmp_path / "other-conda"
+        conda_exe.touch()
+        monkeypatch.setenv("CONDA_EXE", str(conda_exe))
+        install_all(**kwargs)
+        assert len(created) == 3
+
+        created.clear()
+        install_all(force=True, **kwargs)
+        assert len(created) == 3
+
+        # install() always creates the shortcuts
+        created.clear()
+        install(json_paths[0], target_prefix=str(tmp_path), base_prefix=str(tmp_path))
+        assert created == ["Batch Item 0"]
+    finally:
+        remove_all(**kwargs)
+
+
+def test_install_all_settles_with_shared_menu(tmp_path, delete_files, run_as_user, monkeypatch):
+    (tmp_path / ".nonadmin").touch()
+    _write_menu_jsons(tmp_path, 3, menu_name="Shared Menu")
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path), "filter": bool}
+    first = install_all(**kwargs)
+    for paths in first:
+        delete_files.extend(paths)
+    mtimes = {path: os.stat(path).st_mtime_ns for paths in first for path in paths}
+
+    created = []
+    original_create = MenuItem.create
+
+    def create(self):
+        created.append(self.render_key("name"))
+        return original_create(self)
+
+    monkeypatch.setattr(MenuItem, "create", create)
+    try:
+        for _ in range(2):
+            assert install_all(**kwargs) == [list(paths) for paths in first]
+            assert created == []
+        assert {path: os.stat(path).st_mtime_ns for path in mtimes} == mtimes
+    finally:
+        remove_all(**kwargs)
+
+
+def test_dry_run_does_not_render_batch_script(tmp_path, monkeypatch):
+    from menuinst.platforms import win
+
+    monkeypatch.setattr(
+        win, "windows_folder_path", lambda mode, check_other_mode, key: str(tmp_path / key)
+    )
+    menu = win.WindowsMenu("Menu", str(tmp_path), str(tmp_path))
+    item = win.WindowsMenuItem(menu, {"name": "Item", "command": ["app"], "activate": True})
+
+    def command():
+        raise AssertionError("the activator ran in a dry run")
+
+    monkeypatch.setattr(item, "_command", command)
+    with planning() as plan:
+        path = item._write_script()
+    assert [(change.action, change.target) for change in plan.changes] == [("write", str(path))]
+    assert not path.exists()
+
+
+def test_sync(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    json_paths = _write_menu_jsons(tmp_path, 4)
+    installed, removed = sync(**kwargs)
+    delete_files.extend(installed)
+    assert removed == []
+    assert all(path.exists() for path in installed)
+
+    def recorded_sources():
+        return set(read_menuinst_toml(tmp_path)["sources"])
+
+    def menu_registered(name):
+        # the <Menu> entries of applications.menu are not shortcut files
+        if PLATFORM != "linux":
+            return None
+        config = Menu(name, str(tmp_path), str(tmp_path)).menu_config_location
+        return f"<Name>{name}</Name>" in config.read_text()
+
+    try:
+        # nothing changed: nothing to do
+        assert sync(**kwargs) == (installed, [])
+        assert menu_registered("Batch Menu 2") in (None, True)
+
+        # renamed, changed and deleted files
+        renamed = json_paths[0].with_name("renamed.json")
+        json_paths[0].rename(renamed)
+        json_paths[1].write_text(json_paths[1].read_text().replace("Batch Item 1", "Updated"))
+        json_paths[2].unlink()
+        synced, removed = sync(**kwargs)
+        delete_files.extend(synced)
+
+        assert recorded_sources() == {"renamed.json", "batch-1.json", "batch-3.json"}
+        assert all(path.exists() for path in synced)
+        assert removed and not any(path.exists() for path in removed)
+        synced_names = [slugify(path.name) for path in synced]
+        assert not any("batch-item-1" in name or "batch-item-2" in name for name in synced_names)
+        assert any("updated" in name for name in synced_names)
+        assert any("batch-item-2" in slugify(path.name) for path in removed)
+        assert menu_registered("Batch Menu 2") in (None, False)
+
+        # force recreates everything, also with several workers
+        assert sync(force=True, max_workers=2, **kwargs) == (synced, [])
+    finally:
+        remove_all(filter=bool, **kwargs)
+
+
+def test_sync_sources(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    json_paths = _write_menu_jsons(tmp_path, 3)
+    try:
+        # only the given files are synced: batch-2.json is not installed
+        installed, _ = sync(sources=["batch-0.json", "batch-1.json"], **kwargs)
+        delete_files.extend(installed)
+        assert set(read_menuinst_toml(tmp_path)["sources"]) == {"batch-0.json", "batch-1.json"}
+
+        # a deleted source is removed, a new one is installed, batch-1.json is left alone
+        json_paths[0].unlink()
+        installed, removed = sync(sources=["batch-0.json", "batch-2.json"], **kwargs)
+        delete_files.extend(installed)
+        assert set(read_menuinst_toml(tmp_path)["sources"]) == {"batch-1.json", "batch-2.json"}
+        assert removed and not any(path.exists() for path in removed)
+    finally:
+        remove_all(filter=bool, **kwargs)
+
+
+def test_sync_records_without_menu(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    (json_path,) = _write_menu_jsons(tmp_path, 1)
+    try:
+        installed, _ = sync(**kwargs)
+        delete_files.extend(installed)
+        data = read_menuinst_toml(tmp_path)
+        assert data["sources"]["batch-0.json"].pop("menu") == "Batch Menu 0"
+        write_menuinst_toml(tmp_path, data)
+
+        # as recorded by older versions: only the shortcut files can be deleted
+        json_path.unlink()
+        _, removed = sync(**kwargs)
+        assert sorted(removed) == sorted(map(Path, installed))
+        assert not any(path.exists() for path in installed)
+        assert "sources" not in read_menuinst_toml(tmp_path)
+    finally:
+        remove_all(filter=bool, **kwargs)
+
+
+def test_remove_uses_recorded_shortcuts(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    kwargs = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    (json_path,) = _write_menu_jsons(tmp_path, 1)
+    installed = install(json_path, **kwargs)
+    delete_files.extend(installed)
+    try:
+        # the item was renamed since it was installed
+        json_path.write_text(json_path.read_text().replace("Batch Item 0", "Renamed"))
+        removed = remove(json_path, **kwargs)
+        assert {Path(path) for path in installed if not Path(path).is_dir()} <= set(removed)
+        assert not any(Path(path).is_file() for path in installed)
+        assert "sources" not in read_menuinst_toml(tmp_path)
+    finally:
+        remove(json_path, **kwargs)
+
+
+def test_render_artifacts_for_any_platform(tmp_path, monkeypatch):
+    from menuinst.platforms import linux, osx, win
+
+    monkeypatch.setattr(
+        win, "windows_folder_path", lambda mode, check_other_mode, key: str(tmp_path / key)
+    )
+    metadata = {
+        "name": "Artifacts",
+        "command": ["{{ PREFIX }}/bin/app", "--flag"],
+        "icon": "{{ MENU_DIR }}/app.icon",
+        "activate": False,
+        "platforms": {
+            "linux": {"Categories": ["Utility"]},
+            "osx": {"event_handler": "echo event"},
+            "win": {"desktop": True},
+        },
+    }
+    before = sorted(tmp_path.rglob("*"))
+
+    # Linux: the .desktop file
+    menu = linux.LinuxMenu("Menu", str(tmp_path), str(tmp_path))
+    (entry,) = linux.LinuxMenuItem(menu, metadata).artifacts()
+    lines = entry.content().splitlines()
+    assert lines[0] == "[Desktop Entry]"
+    assert f"Icon={tmp_path / 'Menu' / 'app.icon'}" in lines
+    assert "Categories=Utility;" in lines
+
+    # macOS: Info.plist of the nested app and of the background-only launcher
+    menu = osx.MacOSMenu("Menu", str(tmp_path), str(tmp_path))
+    item = osx.MacOSMenuItem(menu, metadata)
+    nested, outer = item._info_plists()
+    assert nested.path.parent.parent == item._nested_location
+    assert "LSBackgroundOnly" not in plistlib.loads(nested.content())
+    outer_data = plistlib.loads(outer.content())
+    assert outer_data["LSBackgroundOnly"] is True
+    assert outer_data["CFBundleIconFile"] == "app.icon"
+    assert item._event_handler().content() == "#!/bin/bash\necho event\n"
+
+    # Windows: the batch script and a shortcut per location
+    menu = win.WindowsMenu("Menu", str(tmp_path), str(tmp_path))
+    item = win.WindowsMenuItem(menu, metadata)
+    assert item._batch_script().content().startswith("@ECHO OFF\r\n")
+    shortcuts = item.artifacts()
+    assert [shortcut.path.parent for shortcut in shortcuts] == [
+        tmp_path / "start" / "Menu",
+        tmp_path / "desktop",
+    ]
+    assert all(shortcut.arguments == "--flag" for shortcut in shortcuts)
+    # every property of a shortcut shows in its contents
+    content = json.loads(shortcuts[0].content())
+    assert content["arguments"] == "--flag"
+    assert content["icon"] == str(tmp_path / "Menu" / "app.icon")
+    assert content["working_dir"] and content["app_user_model_id"]
+    assert shortcuts[0].content() != replace(shortcuts[0], working_dir="elsewhere").content()
+
+    # nothing was written
+    assert sorted(tmp_path.rglob("*")) == before
@@ -103,11 +103,37 @@ def test_cli_all(tmp_path: Path, delete_files: list[Path], run_as_user: None) ->
     assert files_found == set()
 
 
+def test_cli_dry_run(
+    tmp_path: Path, delete_files: list[Path], run_as_user: None, capsys: pytest.CaptureFixture
+) -> None:
+    (tmp_path / ".nonadmin").touch()
+    menu_files = _setup_menu_directory(tmp_path)
+    expected_files = {path for files in menu_files.values() for path in files}
+    delete_files.extend(expected_files)
+
+    argv = ["--prefix", str(tmp_path), "--root-prefix", str(tmp_path), "--dry-run"]
+    menuinst_main(["--install", *argv])
+    output = capsys.readouterr().out
+    assert not any(path.exists() for path in expected_files)
+    assert all(f"write  {path}" in output for path in expected_files)
+
+    menuinst_main(["--remove", *argv])
+    assert capsys.readouterr().out == "Nothing to do.\n"
+
+
 @pytest.mark.parametrize(
     "argv",
     (
         pytest.param(["--install"], id="prefix missing"),
         pytest.param(["--prefix", "/tmp/somewhere"], id="install/remove missing"),
+        pytest.param(
+            ["--prefix", "/tmp/somewhere", "--install", "--max-workers", "0"],
+            id="max-workers zero",
+        ),
+        pytest.param(
+            ["--prefix", "/tmp/somewhere", "--install", "--max-workers", "-2"],
+            id="max-workers negative",
+        ),
     ),
 )
 def test_cli_errors(argv: list[str]) -> None:
@@ -144,3 +170,28 @@ def test_cli_env_var_persistence(
         assert 'distribution_name = "TestApp"' in content
     else:
         assert not toml_path.exists(), "menuinst.toml should not be created without env var"
+
+
+def test_cli_single_elevation_decision(
+    tmp_path: Path, delete_files: list[Path], run_as_user: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from menuinst import utils as menuinst_utils
+
+    (tmp_path / ".nonadmin").touch()
+    menu_files = _setup_menu_directory(tmp_path)
+    for files in menu_files.values():
+        delete_files.extend(files)
+
+    calls = []
+
+    def needs_admin(target_prefix, base_prefix):
+        calls.append(target_prefix)
+        return False
+
+    monkeypatch.setattr(menuinst_utils, "needs_admin", needs_admin)
+    menuinst_main(["--install", "--prefix", str(tmp_path), "--root-prefix", str(tmp_path)])
+    assert len(calls) == 1
+    assert all(path.exists() for path in delete_files)
+    menuinst_main(["--remove", "--prefix", str(tmp_path), "--root-prefix", str(tmp_path)])
+    assert len(calls) == 2
+    assert not any(path.exists() for path in delete_files)
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
+import json
 import shutil
+from pathlib import Path
+from types import SimpleNamespace
 from typing import TYPE_CHECKING
+from xml.etree import ElementTree
 
 import pytest
 from conda.base.context import context
-from conftest import DATA
+from conftest import DATA, PLATFORM
 
+from menuinst import _conda_actions
 from menuinst.api import install, remove
-from menuinst.conda_plugin import conda_subcommands
+from menuinst.conda_plugin import CondaPostTransactionAction, conda_subcommands
+from menuinst.platforms import Menu
+from menuinst.utils import read_menuinst_toml
 
 if TYPE_CHECKING:
-    from pathlib import Path
-
     from conda.testing.fixtures import CondaCLIFixture, TmpEnvFixture
 
 
@@ -77,3 +82,64 @@ def test_plugin_cli_error(conda_cli: CondaCLIFixture, monkeypatch: pytest.Monkey
     monkeypatch.delenv("CONDA_PREFIX", raising=False)
     with pytest.raises(ValueError):
         conda_cli("menuinst", "--install")
+
+
+def test_menu_sources():
+    files = ["Menu/a.json", "Menu/sub/b.json", "lib/Menu/c.json", "Menu/d.png", "bin/e.json"]
+    assert _conda_actions.menu_sources(files) == {"a.json"}
+
+
+@pytest.mark.skipif(
+    CondaPostTransactionAction is None, reason="conda without transaction action hooks"
+)
+def test_post_transaction_action_hook():
+    hooks = context.plugin_manager.get_hook_results("post_transaction_actions")
+    assert "menuinst" in {hook.name for hook in hooks}
+
+
+def test_post_transaction_action(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, delete_files: list[Path]
+):
+    monkeypatch.setattr(
+        _conda_actions,
+        "context",
+        SimpleNamespace(shortcuts=True, shortcuts_only=[], root_prefix=str(tmp_path)),
+    )
+    (tmp_path / ".nonadmin").touch()
+    (tmp_path / "Menu").mkdir()
+    (tmp_path / "conda-meta").mkdir()
+    # another package with shortcuts, not part of the transaction
+    shutil.copy(DATA / "jsons" / "precommands.json", tmp_path / "Menu")
+    shutil.copy(DATA / "jsons" / "sys-prefix.json", tmp_path / "Menu")
+    files = ["Menu/sys-prefix.json", "bin/tool"]
+    (tmp_path / "conda-meta" / "pkg-1.0-0.json").write_text(json.dumps({"files": files}))
+
+    linked = SimpleNamespace(name="pkg", version="1.0", build="0")
+    action = _conda_actions.SyncShortcutsAction(None, tmp_path, [], [linked], [], [], [])
+    assert action.sources() == ["sys-prefix.json"]
+    action.verify()
+    action.execute()
+    sources = read_menuinst_toml(tmp_path)["sources"]
+    assert list(sources) == ["sys-prefix.json"]
+    paths = [Path(shortcut["path"]) for shortcut in sources["sys-prefix.json"]["shortcuts"]]
+    delete_files.extend(paths)
+    assert paths and all(path.exists() for path in paths)
+    # the menu is recorded, so it can be removed along with the shortcuts without the file
+    assert sources["sys-prefix.json"]["menu"]
+
+    def menu_names():
+        # the <Menu> entries of applications.menu are not shortcut files
+        config = Menu("Any", str(tmp_path), str(tmp_path)).menu_config_location
+        return [elt.text for elt in ElementTree.parse(config).getroot().findall("Menu/Name")]
+
+    if PLATFORM == "linux":
+        assert menu_names()
+
+    # conda deletes the files of unlinked packages before the action runs
+    (tmp_path / "Menu" / "sys-prefix.json").unlink()
+    unlinked = SimpleNamespace(name="pkg", version="1.0", build="0", files=files)
+    _conda_actions.SyncShortcutsAction(None, tmp_path, [unlinked], [], [], [], []).execute()
+    assert "sys-prefix.json" not in read_menuinst_toml(tmp_path).get("sources", {})
+    assert not any(path.exists() for path in paths)
+    if PLATFORM == "linux":
+        assert not menu_names()
@@ -1,9 +1,21 @@
+import ast
+import hashlib
+import json
 import os
+import subprocess
+import sys
+from pathlib import Path
 
 import pytest
 
+from menuinst import _elevated, api
 from menuinst import utils as menuinst_utils
-from menuinst.utils import _test_elevation, elevate_as_needed, user_is_admin
+from menuinst.utils import (
+    _test_elevation,
+    elevate_as_needed,
+    needs_admin,
+    user_is_admin,
+)
 
 
 def test_elevation(tmp_path, capfd):
@@ -36,6 +48,7 @@ def test_elevation(tmp_path, capfd):
 
         # make tmp_path not writable by the current user to force elevation
         tmp_path.chmod(0o500)
+        api.needs_admin(target_prefix=str(tmp_path), base_prefix=str(tmp_path), refresh=True)
         elevate_as_needed(_test_elevation)(target_prefix=str(tmp_path), base_prefix=str(tmp_path))
         assert (
             capfd.readouterr().out.strip() == "user_is_admin(): True env_var: TEST _mode: system"
@@ -44,6 +57,7 @@ def test_elevation(tmp_path, capfd):
 
         # restore permissions
         tmp_path.chmod(0o700)
+        api.needs_admin(target_prefix=str(tmp_path), base_prefix=str(tmp_path), refresh=True)
         elevate_as_needed(_test_elevation)(target_prefix=str(tmp_path), base_prefix=str(tmp_path))
         assert capfd.readouterr().out.strip() == "user_is_admin(): False env_var: TEST _mode: user"
         assert (tmp_path / ".nonadmin").exists()
@@ -80,3 +94,227 @@ def test_elevation_nonadmin_marker_when_admin(
         # On non-Windows, admin always uses system mode regardless of .nonadmin
         output = capfd.readouterr().out.strip()
         assert "_mode: system" in output
+
+
+def _paths_in_prefix(*names, target_prefix=None, base_prefix=None, _mode="user", **kwargs):
+    return [Path(target_prefix, name) for name in names], _mode
+
+
+def test_elevated_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+    prefixes = {"target_prefix": tmp_path, "base_prefix": tmp_path}
+    calls = [
+        _elevated.Call("menuinst.utils", "_test_elevation", (), {**prefixes, "_mode": "system"}),
+        _elevated.Call("menuinst.api", "remove", (tmp_path / "missing.json",), prefixes),
+        _elevated.Call("menuinst.api", "sync", (), {**prefixes, "sources": []}),
+    ]
+    digest = _elevated.write_request(tmp_path / "request.json", calls, {"MENUINST_TEST": "TEST"})
+    worker = subprocess.run(
+        [sys.executable, "-m", "menuinst._elevated", tmp_path / "request.json", tmp_path / "out"]
+        + [digest],
+        capture_output=True,
+        text=True,
+    )
+    assert worker.returncode == 1
+    if os.name == "nt":
+        assert "env_var: TEST" in (tmp_path / "_test_output.txt").read_text()
+    else:
+        assert "env_var: TEST" in worker.stdout
+
+    responses = _elevated.read_responses(tmp_path / "out")
+    assert [response.index for response in responses] == [0, 1, 2]
+    assert responses[0].result == "system"
+    assert responses[1].error and "FileNotFoundError" in responses[1].error
+    assert responses[2].result == ([], [])
+    assert all(response.seconds >= 0 for response in responses)
+
+
+def test_elevated_worker_round_trip():
+    value = {"paths": [Path("a"), (Path("b"), 1)], "none": None, "flag": True}
+    assert json.loads(json.dumps(_elevated.encode(value)), object_hook=_elevated.decode) == value
+
+
+def test_elevated_worker_rejects_unserializable(tmp_path):
+    call = _elevated.Call("menuinst.api", "_install_all", ([lambda path: True],), {})
+    with pytest.raises(TypeError):
+        _elevated.write_request(tmp_path / "request.json", [call], {})
+
+
+def test_elevated_worker_rejects_tampered_request(tmp_path):
+    request = tmp_path / "request.json"
+    call = _elevated.Call("menuinst.utils", "_test_elevation", (), {})
+    digest = _elevated.write_request(request, [call], {})
+    assert _elevated.read_request(request, digest) == ([call], {})
+
+    request.write_text(request.read_text().replace("{}", '{"_mode": "user"}'))
+    with pytest.raises(ValueError, match="modified"):
+        _elevated.read_request(request, digest)
+
+
+def test_elevated_worker_creates_response_file(tmp_path):
+    call = _elevated.Call("menuinst.utils", "_test_elevation", (), {})
+    target = tmp_path / "target"
+    target.write_text("unchanged")
+    paths = [target]
+    if os.name != "nt":  # creating symlinks needs privileges on Windows
+        (tmp_path / "link").symlink_to(target)
+        paths.append(tmp_path / "link")
+    for path in paths:
+        with pytest.raises(FileExistsError):
+            _elevated.run([call], path)
+    assert target.read_text() == "unchanged"
+    # the caller does not wait for a response file that was never created
+    assert _elevated.read_responses(tmp_path / "missing") == []
+
+
+def test_elevated_worker_only_calls_entry_points(tmp_path):
+    with pytest.raises(ValueError):
+        _elevated.Call("os", "system", ("echo",))
+    with pytest.raises(ValueError):
+        _elevated.Call.of(_paths_in_prefix)
+
+    # even in a request with a valid hash
+    request = tmp_path / "request.json"
+    content = json.dumps(
+        {
+            "version": _elevated.PROTOCOL_VERSION,
+            "env": {},
+            "calls": [{"module": "os", "name": "system", "args": ["echo"], "kwargs": {}}],
+        }
+    ).encode()
+    request.write_bytes(content)
+    with pytest.raises(ValueError):
+        _elevated.read_request(request, hashlib.sha256(content).hexdigest())
+
+
+def _write_jsons(prefix: Path, count: int) -> list[Path]:
+    (prefix / "Menu").mkdir()
+    paths = []
+    for i in range(count):
+        path = prefix / "Menu" / f"item-{i}.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "$schema": "https://json-schema.org/draft-07/schema",
+                    "menu_name": f"Streamed {i}",
+                    "menu_items": [
+                        {
+                            "name": f"Streamed Item {i}",
+                            "command": ["echo", str(i)],
+                            "activate": False,
+                            "platforms": {"linux": {}, "osx": {}, "win": {}},
+                        }
+                    ],
+                }
+            )
+        )
+        paths.append(path)
+    return paths
+
+
+def test_elevated_worker_streams_batch_items(tmp_path, delete_files, run_as_user):
+    (tmp_path / ".nonadmin").touch()
+    json_paths = _write_jsons(tmp_path, 2)
+    prefixes = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    call = _elevated.Call("menuinst.api", "_install_all", (json_paths,), prefixes)
+    try:
+        assert _elevated.run([call], tmp_path / "out")
+        *items, response = _elevated.read_responses(tmp_path / "out")
+        delete_files.extend(path for paths in response.result for path in paths)
+        assert sorted(item.item for item in items) == [0, 1]
+        assert [item.result for item in sorted(items, key=lambda r: r.item)] == response.result
+        assert response.item is None and response.seconds >= max(i.seconds for i in items)
+    finally:
+        api.remove_all(filter=bool, **prefixes)
+
+
+def test_elevation_returns_result(tmp_path, monkeypatch):
+    """The value returned by the elevated process is passed back to the caller"""
+    monkeypatch.setattr(menuinst_utils, "user_is_admin", lambda: False)
+    monkeypatch.setattr(menuinst_utils, "needs_admin", lambda *args: True)
+    # run the "elevated" process without actually elevating
+    monkeypatch.setattr(menuinst_utils, "run_as_admin", subprocess.call)
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+
+    result = elevate_as_needed(_test_elevation)(
+        target_prefix=str(tmp_path), base_prefix=str(tmp_path)
+    )
+    assert result == "system"
+
+    # functions that are not entry points of menuinst run as a normal user
+    result = elevate_as_needed(_paths_in_prefix)(
+        "a", target_prefix=str(tmp_path), base_prefix=str(tmp_path)
+    )
+    assert result == ([tmp_path / "a"], "user")
+
+
+def test_elevation_lists_filtered_files(tmp_path, delete_files, monkeypatch):
+    """install_all() passes the files accepted by its filter to the elevated process"""
+    monkeypatch.setattr(menuinst_utils, "user_is_admin", lambda: False)
+    monkeypatch.setattr(menuinst_utils, "needs_admin", lambda *args: True)
+    monkeypatch.setenv("_MENUINST_RECURSING", "0")
+    requests = []
+
+    def run_as_admin(cmd):
+        # run the "elevated" process in this one, where it cannot elevate any further
+        argv = ast.literal_eval(cmd[-1].split("main(")[-1].rstrip(")"))
+        requests.append(_elevated.read_request(argv[0], argv[2])[0])
+        monkeypatch.setenv("_MENUINST_RECURSING", "1")
+        return _elevated.main(argv)
+
+    monkeypatch.setattr(menuinst_utils, "run_as_admin", run_as_admin)
+    json_paths = _write_jsons(tmp_path, 3)
+    prefixes = {"target_prefix": str(tmp_path), "base_prefix": str(tmp_path)}
+    try:
+        result = api.install_all(filter=lambda path: path.stem != "item-1", **prefixes)
+        delete_files.extend(path for paths in result for path in paths)
+        ((call,),) = requests
+        assert call.name == "_install_all"
+        assert call.args == ([json_paths[0], json_paths[2]],)
+        assert len(result) == 2 and all(paths for paths in result)
+    finally:
+        api.remove_all(filter=bool, **prefixes)
+
+
+def test_needs_admin_probes_without_writing(tmp_path, monkeypatch):
+    monkeypatch.setattr(menuinst_utils, "user_is_admin", lambda: False)
+    probed = []
+
+    def can_write(directory):
+        probed.append(directory)
+        return True
+
+    monkeypatch.setattr(menuinst_utils, "can_write", can_write)
+    assert not needs_admin(tmp_path, tmp_path)
+    assert not needs_admin(str(tmp_path), str(tmp_path))
+    assert len(probed) == 1  # cached
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(menuinst_utils, "can_write", lambda directory: False)
+    assert not api.needs_admin(target_prefix=str(tmp_path), base_prefix=str(tmp_path))
+    assert api.needs_admin(target_prefix=str(tmp_path), base_prefix=str(tmp_path), refresh=True)
+
+
+def test_needs_admin_not_cached_for_missing_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(menuinst_utils, "user_is_admin", lambda: False)
+    prefix = tmp_path / "env"
+    # a prefix probed before it is created needs admin for now...
+    assert needs_admin(prefix, prefix)
+    prefix.mkdir()
+    # ...but not once it exists
+    assert not needs_admin(prefix, prefix)
+    assert menuinst_utils._needs_admin.cache_info().currsize == 1
+
+
+@pytest.mark.skipif(
+    os.name == "nt" or user_is_admin(), reason="needs a posix user without admin permissions"
+)
+def test_can_write(tmp_path):
+    assert menuinst_utils.can_write(tmp_path)
+    assert not menuinst_utils.can_write(tmp_path / "missing")
+    tmp_path.chmod(0o500)
+    try:
+        assert not menuinst_utils.can_write(tmp_path)
+    finally:
+        tmp_path.chmod(0o700)
+    assert list(tmp_path.iterdir()) == []
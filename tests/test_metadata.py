@@ -16,10 +16,16 @@ from menuinst.api import (
     _install_adapter,
     record_shortcuts,
     remove_shortcut_records,
-    write_menuinst_toml,
 )
 from menuinst.platforms import Menu
-from menuinst.utils import MENUINST_TOML_SCHEMA_VERSION, parse_schemaver, read_menuinst_toml
+from menuinst.utils import (
+    MENUINST_TOML_SCHEMA_VERSION,
+    MenuinstToml,
+    file_lock,
+    parse_schemaver,
+    read_menuinst_toml,
+    write_menuinst_toml,
+)
 
 if TYPE_CHECKING:
     from pathlib import Path
@@ -116,8 +122,8 @@ class TestShortcutRecording:
 
         data = read_menuinst_toml(base_prefix)
         assert data["distribution_name"] == DIST_NAME
-        assert len(data["shortcuts"]) == 2
-        assert data["shortcuts"][0]["source"] == "foo.json"
+        assert list(data["sources"]) == ["foo.json"]
+        assert len(data["sources"]["foo.json"]["shortcuts"]) == 2
 
     def test_remove_cleans_toml(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
         """remove() should clean up TOML entries."""
@@ -130,11 +136,12 @@ class TestShortcutRecording:
             base_prefix,
             {
                 "distribution_name": DIST_NAME,
-                "shortcuts": [
-                    {"source": "foo.json", "path": "/path/to/foo.lnk"},
-                    {"source": "foo.json", "path": "/path/to/bar.lnk"},
-                    {"source": "baz.json", "path": "/path/to/baz.lnk"},
-                ],
+                "sources": {
+                    "foo.json": {
+                        "shortcuts": [{"path": "/path/to/foo.lnk"}, {"path": "/path/to/bar.lnk"}]
+                    },
+                    "baz.json": {"shortcuts": [{"path": "/path/to/baz.lnk"}]},
+                },
             },
         )
 
@@ -142,8 +149,7 @@ class TestShortcutRecording:
         remove_shortcut_records(base_prefix, "foo.json")
 
         data = read_menuinst_toml(base_prefix)
-        assert len(data["shortcuts"]) == 1
-        assert data["shortcuts"][0]["source"] == "baz.json"
+        assert list(data["sources"]) == ["baz.json"]
         # distribution_name should be preserved
         assert data["distribution_name"] == DIST_NAME
 
@@ -175,7 +181,7 @@ class TestShortcutRecording:
         )
         data = read_menuinst_toml(env_prefix)
         assert "distribution_name" not in data
-        assert len(data["shortcuts"]) == 1
+        assert list(data["sources"]) == ["bar.json"]
 
     def test_record_shortcuts_handles_permission_error(self, tmp_path: Path, caplog) -> None:
         """record_shortcuts() should not raise when prefix is read-only."""
@@ -209,7 +215,7 @@ class TestShortcutRecording:
 
         write_menuinst_toml(
             prefix,
-            {"shortcuts": [{"source": "test.json", "path": "/fake/path"}]},
+            {"sources": {"test.json": {"shortcuts": [{"path": "/fake/path"}]}}},
         )
 
         with make_readonly(menu_dir), make_readonly(prefix), caplog.at_level(logging.DEBUG):
@@ -218,6 +224,70 @@ class TestShortcutRecording:
 
         assert "permission denied" in caplog.text.lower()
 
+    def test_batch_reads_and_writes_toml_once(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A MenuinstToml batch should read and write menuinst.toml once per prefix."""
+        from menuinst import utils
+
+        reads, writes = [], []
+        monkeypatch.setattr(utils, "read_menuinst_toml", lambda prefix: reads.append(prefix) or {})
+        monkeypatch.setattr(
+            utils, "write_menuinst_toml", lambda prefix, data: writes.append(dict(data))
+        )
+        with MenuinstToml.batch():
+            for i in range(10):
+                record_shortcuts(tmp_path, tmp_path, f"{i}.json", [tmp_path / f"{i}.lnk"])
+            remove_shortcut_records(tmp_path, "0.json")
+            assert not writes
+
+        assert len(reads) == 1
+        assert len(writes) == 1
+        assert list(writes[0]["sources"]) == [f"{i}.json" for i in range(1, 10)]
+
+    def test_flush_merges_concurrent_changes(self, tmp_path: Path) -> None:
+        """Handles flushed one after the other should keep each other's records."""
+        record_shortcuts(tmp_path, tmp_path, "old.json", [tmp_path / "old.lnk"])
+        first, second = MenuinstToml(tmp_path), MenuinstToml(tmp_path)
+        for i, handle in enumerate((first, second)):
+            handle.record(f"{i}.json", [{"path": str(tmp_path / f"{i}.lnk")}])
+        first.data["distribution_name"] = DIST_NAME
+        first.mark_dirty()
+        second.forget("old.json")
+        first.flush()
+        second.flush()
+
+        data = read_menuinst_toml(tmp_path)
+        assert list(data["sources"]) == ["0.json", "1.json"]
+        assert data["distribution_name"] == DIST_NAME
+        assert sorted(p.name for p in (tmp_path / "Menu").iterdir()) == [
+            ".menuinst.toml.lock",
+            "menuinst.toml",
+        ]
+
+    def test_file_lock_does_not_fall_back_to_unlocked(self, tmp_path: Path) -> None:
+        """A lock held elsewhere should make the writer wait, then fail, not write unlocked."""
+        path = tmp_path / "Menu" / "menuinst.toml"
+        with file_lock(path):
+            with pytest.raises(TimeoutError), file_lock(path, timeout=0.2):
+                pytest.fail("ran without the lock")
+        with file_lock(path, timeout=0.2):
+            pass
+
+    def test_concurrent_processes_keep_all_records(self, tmp_path: Path) -> None:
+        """Parallel menuinst processes recording to one prefix should not lose records."""
+        code = (
+            "import sys; from pathlib import Path; from menuinst.api import record_shortcuts\n"
+            "p = Path(sys.argv[1])\n"
+            "for i in range(10):\n"
+            "    record_shortcuts(p, p, f'{sys.argv[2]}-{i}.json', [p / f'{sys.argv[2]}-{i}'])\n"
+        )
+        processes = [
+            subprocess.Popen([sys.executable, "-c", code, str(tmp_path), str(n)]) for n in range(8)
+        ]
+        assert all(process.wait() == 0 for process in processes)
+        assert len(read_menuinst_toml(tmp_path)["sources"]) == 80
+
 
 class TestInstallAdapter:
     """Tests for _install_adapter recording correct source filename."""
@@ -254,7 +324,7 @@ class TestInstallAdapter:
 
         data = read_menuinst_toml(tmp_path)
         # Source should be the filename, not "{{ DISTRIBUTION_NAME }} Foo Bar.json"
-        assert data["shortcuts"][0]["source"] == "test_shortcut.json"
+        assert list(data["sources"]) == ["test_shortcut.json"]
 
 
 class TestSchemaVersion:
@@ -296,3 +366,55 @@ class TestSchemaVersion:
         assert data["schema_version"] == MENUINST_TOML_SCHEMA_VERSION
         # Verify it's a valid SchemaVer string
         parse_schemaver(data["schema_version"])
+
+    def test_toml_migrates_from_1_0_0(self, tmp_path: Path) -> None:
+        """Flat 1-0-0 shortcut lists should be grouped by source and deduplicated."""
+        toml_path = tmp_path / "Menu" / "menuinst.toml"
+        toml_path.parent.mkdir()
+        toml_path.write_text(
+            'schema_version = "1-0-0"\n'
+            'distribution_name = "Test"\n'
+            "shortcuts = [\n"
+            '  {source = "foo.json", path = "/foo.lnk"},\n'
+            '  {source = "bar.json", path = "/bar.lnk"},\n'
+            '  {source = "foo.json", path = "/foo.lnk"},\n'
+            "]\n"
+        )
+        data = read_menuinst_toml(tmp_path)
+        assert data == {
+            "schema_version": MENUINST_TOML_SCHEMA_VERSION,
+            "distribution_name": "Test",
+            "sources": {
+                "foo.json": {"shortcuts": [{"path": "/foo.lnk"}]},
+                "bar.json": {"shortcuts": [{"path": "/bar.lnk"}]},
+            },
+        }
+
+    def test_toml_folds_entries_of_older_writers(self, tmp_path: Path) -> None:
+        """Entries appended to a current file by an older menuinst should not be ignored."""
+        record_shortcuts(tmp_path, tmp_path, "foo.json", [tmp_path / "a"], fingerprint="abc")
+        data = read_menuinst_toml(tmp_path)
+        data["shortcuts"] = [
+            {"source": "foo.json", "path": str(tmp_path / "a")},
+            {"source": "foo.json", "path": str(tmp_path / "b")},
+            {"source": "bar.json", "path": str(tmp_path / "c")},
+        ]
+        write_menuinst_toml(tmp_path, data)
+        toml = MenuinstToml(tmp_path)
+        assert "shortcuts" not in toml.data
+        assert toml.sources["foo.json"]["hash"] == "abc"
+        assert toml.shortcuts("foo.json") == [str(tmp_path / "a"), str(tmp_path / "b")]
+        assert toml.shortcuts("bar.json") == [str(tmp_path / "c")]
+
+    def test_record_shortcuts_replaces_entries(self, tmp_path: Path) -> None:
+        """Reinstalling should replace the entries of a source instead of appending."""
+        for _ in range(3):
+            record_shortcuts(tmp_path, tmp_path, "foo.json", [tmp_path / "a", tmp_path / "a"])
+        record_shortcuts(tmp_path, tmp_path, "bar.json", [tmp_path / "a"], mode="user")
+        toml = MenuinstToml(tmp_path)
+        assert toml.shortcuts("foo.json") == [str(tmp_path / "a")]
+        assert toml.owners(tmp_path / "a") == {"foo.json", "bar.json"}
+        assert toml.sources["bar.json"]["mode"] == "user"
+        assert "hash" not in toml.sources["bar.json"]
+        assert toml.forget("foo.json")
+        assert toml.owners(tmp_path / "a") == {"bar.json"}
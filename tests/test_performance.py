@@ -0,0 +1,321 @@
+"""
+Regression benchmarks: count the filesystem and subprocess operations needed
+for common operations, so accidental O(N) I/O shows up as a test failure.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+from menuinst.plan import planning
+from menuinst.platforms import Menu, MenuItem, base
+from menuinst.platforms.base import compile_template
+from menuinst.utils import read_menuinst_toml
+
+_AUDITED_EVENTS = ("open", "os.listdir", "os.scandir", "subprocess.Popen")
+# Set by count_syscalls() while counting; the audit hook ignores events otherwise
+_syscalls: Counter | None = None
+_audit_hook_installed = False
+
+
+def _audit_hook(event, args):
+    if _syscalls is not None and event in _AUDITED_EVENTS:
+        _syscalls[event] += 1
+
+
+@pytest.fixture
+def count_syscalls(monkeypatch: pytest.MonkeyPatch):
+    """
+    Return a context manager counting opened files, directory listings, stat calls and
+    spawned subprocesses. The audit hook is installed the first time the fixture is used
+    (audit hooks cannot be removed) and only counts inside the context.
+    """
+    global _audit_hook_installed
+
+    if not _audit_hook_installed:
+        sys.addaudithook(_audit_hook)
+        _audit_hook_installed = True
+
+    @contextmanager
+    def counting():
+        global _syscalls
+
+        counter = Counter()
+        real_stat = os.stat
+
+        def stat(*args, **kwargs):
+            counter["os.stat"] += 1
+            return real_stat(*args, **kwargs)
+
+        with monkeypatch.context() as m:
+            m.setattr(os, "stat", stat)
+            _syscalls = counter
+            try:
+                yield counter
+            finally:
+                _syscalls = None
+
+    return counting
+
+
+def _menu_item(prefix: Path) -> MenuItem:
+    menu = Menu("Benchmark", str(prefix), str(prefix))
+    return MenuItem(
+        menu,
+        {
+            "name": "{{ DISTRIBUTION_NAME }} Item",
+            "command": ["{{ PYTHON }}", "{{ SP_DIR }}", "{{ MENU_ITEM_LOCATION }}"],
+            "platforms": {"linux": {}, "osx": {}, "win": {}},
+        },
+    )
+
+
+def test_render_item_syscalls(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, count_syscalls):
+    monkeypatch.delenv("MENUINST_DISTRIBUTION_NAME", raising=False)
+    item = _menu_item(tmp_path)
+    item.render_key("command")
+
+    with count_syscalls() as syscalls:
+        for _ in range(100):
+            item.render_key("command")
+            item.render_key("name")
+    assert sum(syscalls.values()) == 0, syscalls
+
+
+@pytest.mark.parametrize("count", [1, 100, 10_000])
+def test_menu_item_construction(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, count_syscalls, count: int
+):
+    menu = Menu("Benchmark", str(tmp_path), str(tmp_path))
+    metadata = {
+        "name": "Item",
+        "command": ["{{ PYTHON }}"],
+        "platforms": {"linux": {"Categories": ["Science"]}, "osx": {}, "win": {}},
+    }
+    MenuItem(menu, metadata)
+    before = base._defaults_for_platform.cache_info()
+    with count_syscalls() as syscalls:
+        items = [MenuItem(menu, metadata) for _ in range(count)]
+    after = base._defaults_for_platform.cache_info()
+    # defaults are loaded at import time: no I/O per item
+    assert sum(syscalls.values()) == 0, syscalls
+    # the merged defaults are built once and shared by all items
+    assert after.misses == before.misses
+    assert after.hits - before.hits == count
+    assert len({id(item.metadata._defaults) for item in items}) == 1
+
+
+def test_metadata_view_is_copy_on_write():
+    extra = {f"Key{i}": list(range(100)) for i in range(100)}
+    data = {
+        "name": "Item",
+        "command": ["global"],
+        "platforms": {"osx": {"command": ["osx"], "info_plist_extra": extra}, "win": None},
+    }
+    view = MenuItem._merge_on_defaults(data, "darwin")
+    assert view["info_plist_extra"] is extra
+    assert view["command"] == ["osx"]
+    assert view["platforms"] == ["osx"]
+    assert view["CFBundleName"] is None
+    view["name"] = "Renamed"
+    assert view["name"] == "Renamed"
+    assert data["name"] == "Item"
+
+
+def test_placeholders_invalidated_on_prefix_change(tmp_path: Path):
+    other = tmp_path / "other"
+    other.mkdir()
+    item = _menu_item(tmp_path)
+    assert item.menu.placeholders["PREFIX"] == str(tmp_path)
+    item.menu.prefix = other
+    assert item.menu.placeholders["PREFIX"] == str(other)
+    assert item.render("{{ PREFIX }}") == str(other)
+
+
+def test_template_single_pass():
+    template = compile_template("{{ A }}/{{ B }}")
+    assert compile_template("{{ A }}/{{ B }}") is template
+    assert template.names == ("A", "B")
+    # replacements are inserted verbatim, even if they look like placeholders
+    assert template.render({"A": "{{ B }}", "B": "b"}) == "{{ B }}/b"
+    # earlier mappings take precedence
+    assert template.render({"A": "x"}, {"A": "a", "B": "b"}) == "x/b"
+
+
+def test_template_unknown_placeholder():
+    template = compile_template("{{ KNOWN }} {{ UNKNOWN }}")
+    with pytest.raises(ValueError, match="UNKNOWN"):
+        template.render({"KNOWN": "k"})
+    assert template.render({"KNOWN": "k"}, strict=False) == "k {{ UNKNOWN }}"
+
+
+def test_render_nested_containers(tmp_path: Path):
+    item = _menu_item(tmp_path)
+    value = {
+        "str": "{{ PREFIX }}",
+        "list": ["{{ PREFIX }}", {"nested": "{{ ENV_NAME }}"}],
+        "bool": True,
+        "int": 1,
+        "none": None,
+    }
+    assert item.render(value) == {
+        "str": str(tmp_path),
+        "list": [str(tmp_path), {"nested": "base"}],
+        "bool": True,
+        "int": 1,
+        "none": None,
+    }
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a shell script as fake conda.exe")
+def test_standalone_conda_exe_info_runs_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, count_syscalls
+):
+    base_prefix, prefix = tmp_path / "base", tmp_path / "env"
+    (prefix / "Menu").mkdir(parents=True)
+    base_prefix.mkdir()
+    exe = base_prefix / "_conda.exe"
+    exe.write_text("#!/bin/sh\necho '       micromamba version : 1.5.8'\n")
+    exe.chmod(0o755)
+    monkeypatch.setattr(base, "_standalone_flavors", {})
+    menu = Menu("Benchmark", str(prefix), str(base_prefix))
+
+    # dry runs plan the call instead, and do not cache their guess
+    with count_syscalls() as syscalls, planning() as plan:
+        assert menu._conda_exe_flavor(exe) == ("conda", None)
+    assert syscalls["subprocess.Popen"] == 0
+    assert [change.action for change in plan.changes] == ["run"]
+    assert not base._standalone_flavors
+    assert not (prefix / "Menu" / "menuinst.toml").exists()
+
+    with count_syscalls() as syscalls:
+        for _ in range(30):
+            assert menu._is_micromamba(menu.conda_exe)
+    assert syscalls["subprocess.Popen"] == 1
+    assert menu._conda_exe_flavor(exe) == ("micromamba", "1.5.8")
+    # recorded in the target prefix; the base prefix is not written to
+    assert read_menuinst_toml(prefix)["conda_exe"]["flavor"] == "micromamba"
+    assert list(base_prefix.iterdir()) == [exe]
+
+    # a new process reuses the record persisted in menuinst.toml, also in dry runs
+    monkeypatch.setattr(base, "_standalone_flavors", {})
+    with count_syscalls() as syscalls, planning() as plan:
+        assert menu._is_micromamba(menu.conda_exe)
+    assert syscalls["subprocess.Popen"] == 0
+    assert not plan.changes
+    with count_syscalls() as syscalls:
+        assert menu._is_micromamba(menu.conda_exe)
+    assert syscalls["subprocess.Popen"] == 0
+
+
+def test_conda_exe_misses_not_cached(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(base, "_conda_exes", {})
+    monkeypatch.setenv("CONDA_EXE", str(tmp_path / "missing"))
+    monkeypatch.setenv("MAMBA_EXE", str(tmp_path / "missing"))
+    menu = Menu("Benchmark", str(tmp_path), str(tmp_path))
+    assert menu.conda_exe == Path("conda")
+    exe = tmp_path / "_conda.exe"
+    exe.touch()
+    assert menu.conda_exe == exe
+
+
+def test_activation_snapshot_computed_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MENUINST_ACTIVATION_CACHE", "1")
+    monkeypatch.setattr(base, "_activation_snapshots", {})
+    (tmp_path / "conda-meta").mkdir()
+    history = tmp_path / "conda-meta" / "history"
+    history.write_text("")
+    menu = Menu("Benchmark", str(tmp_path), str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(None)
+        return {"variables": [["CONDA_PREFIX", str(tmp_path)]]}
+
+    for _ in range(30):
+        assert menu.activation_snapshot("test", compute)["variables"][0][1] == str(tmp_path)
+    assert len(calls) == 1
+
+    # a new process reuses the snapshot stored on disk...
+    monkeypatch.setattr(base, "_activation_snapshots", {})
+    menu.activation_snapshot("test", compute)
+    assert len(calls) == 1
+
+    # ... until the prefix changes
+    monkeypatch.setattr(base, "_activation_snapshots", {})
+    history.write_text("# new transaction\n")
+    menu.activation_snapshot("test", compute)
+    assert len(calls) == 2
+
+
+def test_activation_snapshots_computed_concurrently(tmp_path: Path, monkeypatch):
+    """Snapshots of different shells or prefixes do not wait for each other"""
+    monkeypatch.delenv("MENUINST_ACTIVATION_CACHE", raising=False)
+    monkeypatch.setattr(base, "_activation_snapshots", {})
+    monkeypatch.setattr(base, "_activation_snapshot_locks", {})
+    menu = Menu("Benchmark", str(tmp_path), str(tmp_path))
+    # each computation only finishes once the other one has started
+    barrier = threading.Barrier(2, timeout=10)
+    calls = []
+
+    def compute():
+        calls.append(None)
+        barrier.wait()
+        return {}
+
+    with ThreadPoolExecutor(4) as executor:
+        shells = ["bash", "zsh", "bash", "zsh"]
+        list(executor.map(lambda shell: menu.activation_snapshot(shell, compute), shells))
+    assert len(calls) == 2
+
+
+# Imported by the conda plugin on every conda command, so they must stay cheap to import
+_EAGER_MODULES = ("menuinst", "menuinst.cli", "menuinst.cli.cli", "menuinst.conda_plugin")
+# Generous bound on the total self time of the menuinst modules (about 5ms are expected)
+_IMPORT_TIME_BUDGET_US = 25_000
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """
+    Self import time of each module imported by ``import module`` in a new interpreter,
+    in microseconds, as reported by ``python -X importtime``.
+    """
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    # the first run compiles the bytecode, which is not part of the budget
+    subprocess.run(command, check=True, capture_output=True)
+    stderr = subprocess.run(command, check=True, capture_output=True, text=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.mark.parametrize("module", ["menuinst", "menuinst.cli", "menuinst.conda_plugin"])
+def test_import_time(module: str):
+    if module == "menuinst.conda_plugin":
+        pytest.importorskip("conda.plugins")
+    times = _import_times(module)
+    menuinst_times = {name: us for name, us in times.items() if name.split(".")[0] == "menuinst"}
+    assert module in menuinst_times
+    # the API and the platform backends are imported when a command runs
+    deferred = [
+        name
+        for name in menuinst_times
+        if name not in _EAGER_MODULES
+        and not name.startswith(("menuinst._version", "menuinst._vendor"))
+    ]
+    assert not deferred
+    assert sum(menuinst_times.values()) < _IMPORT_TIME_BUDGET_US, menuinst_times
@@ -34,7 +34,7 @@ DEFAULT_PATH = Path(os.environ.get("TEMP", os.getcwd()))
 
 
 class DummyWindowsMenuItem(WindowsMenuItem):
-    def _write_script(self, **kwargs) -> Path:
+    def _path_for_script(self) -> Path:
         return DEFAULT_PATH / Path("dummy_script.bat")
 
 